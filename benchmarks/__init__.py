@@ -0,0 +1 @@
+from .synthetic_match import synthesize_tracks, synthesize_frames, synthesize_camera_movement
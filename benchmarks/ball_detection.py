@@ -0,0 +1,80 @@
+import argparse
+import json
+import pickle
+import time
+from itertools import islice
+from utils import read_video_stream
+from trackers import Tracker, compare_tracks
+from trackers.ball_roi import input_pixels
+
+# Ball detection of the single pass (full frames at the default model size, as the stubs were made) and of the
+# two-tier detection, against the track stubs of the sample video. For every mode: time, model input pixels per
+# frame (the inference FLOPs scale with them), frames with a ball, the frames with a ball the stubs do not have,
+# and the agreement with the stubs (recall and center error of the ball, recall of the players).
+
+# ultralytics predicts at 640 unless told otherwise
+DEFAULT_IMGSZ = 640
+
+def run_mode(frames, model_path, ball_roi, ball_roi_params=None, batch_size=20):
+    tracker = Tracker(model_path, batch_size=batch_size, adaptive_batch_size=False, ball_roi=ball_roi, ball_roi_params=ball_roi_params)
+    tracker.load_model()
+    start = time.perf_counter()
+    tracks = tracker.get_object_track(frames)
+    seconds = time.perf_counter() - start
+
+    if ball_roi:
+        pixels = tracker.inference_engine.stats["pixels"]
+    else:
+        pixels = sum(input_pixels(frame.shape, DEFAULT_IMGSZ) for frame in frames)
+    return tracks, {"seconds": seconds, "fps": len(frames) / seconds if seconds > 0 else 0.0, "pixels_per_frame": pixels / len(frames)}
+
+def ball_frames(tracks):
+    return [1 in ball for ball in tracks["ball"]]
+
+def compare_modes(frames, reference_tracks, model_path, ball_roi_params=None, ball_iou_threshold=0.3):
+    reference_tracks = {object: object_tracks[:len(frames)] for object, object_tracks in reference_tracks.items()}
+    reference_balls = ball_frames(reference_tracks)
+    results = {}
+    for mode, ball_roi in (("single", False), ("two_tier", True)):
+        tracks, result = run_mode(frames, model_path, ball_roi, ball_roi_params)
+        balls = ball_frames(tracks)
+        ball_comparison = compare_tracks(reference_tracks, tracks, iou_threshold=ball_iou_threshold)["ball"]
+        result.update(
+            ball_frames=sum(balls) / len(frames),
+            extra_ball_frames=sum(ball and not reference_ball for ball, reference_ball in zip(balls, reference_balls)),
+            ball_recall=ball_comparison["recall"],
+            ball_center_error=ball_comparison["mean_center_error"],
+            player_recall=compare_tracks(reference_tracks, tracks)["players"]["recall"],
+        )
+        results[mode] = result
+    return {"frames": len(frames), "reference_ball_frames": sum(reference_balls) / len(frames), "modes": results}
+
+def format_comparison(comparison):
+    lines = [f"{comparison['frames']} frames, ball in {comparison['reference_ball_frames'] * 100:.1f}% of the stub frames",
+             f"{'Mode':<10}{'seconds':>9}{'fps':>8}{'kpx/frame':>11}{'ball frames':>13}{'not in stub':>13}{'ball recall':>13}{'center px':>11}{'players':>9}"]
+    for mode, result in comparison["modes"].items():
+        lines.append(f"{mode:<10}{result['seconds']:>9.2f}{result['fps']:>8.1f}{result['pixels_per_frame'] / 1000:>11.0f}"
+                     f"{result['ball_frames'] * 100:>12.1f}%{result['extra_ball_frames']:>13}{result['ball_recall'] * 100:>12.1f}%"
+                     f"{result['ball_center_error']:>11.1f}{result['player_recall'] * 100:>8.1f}%")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ball detection of the single pass and two-tier detection against the track stubs')
+    parser.add_argument('--video', default='input_videos/08fd33_4.mp4')
+    parser.add_argument('--stubs', default='stubs/track_stubs.pkl', help='Tracks of the full detection of the video')
+    parser.add_argument('--model', default='models/best.pt')
+    parser.add_argument('--frames', type=int, default=None, help='Only the first frames of the video')
+    parser.add_argument('--imgsz', type=int, default=480, help='Model input size of the full frames in two-tier detection')
+    parser.add_argument('--crop-size', type=int, default=256, help='Size in pixels of the crop around the ball')
+    parser.add_argument('--output', default=None, help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    frames = list(islice(read_video_stream(args.video), args.frames))
+    with open(args.stubs, 'rb') as f:
+        reference_tracks = pickle.load(f)
+
+    comparison = compare_modes(frames, reference_tracks, args.model, {'imgsz': args.imgsz, 'crop_size': args.crop_size})
+    print(format_comparison(comparison))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(comparison, f, indent=2)
@@ -0,0 +1,103 @@
+import argparse
+import json
+import time
+from itertools import islice
+import numpy as np
+from utils import read_video_stream
+from trackers import Tracker, DETECTOR_BACKENDS
+from trackers.detection_result import to_detections
+from trackers.keyframe_tracking import box_iou
+
+# Throughput of the detector backends on the frames of a video, through the same batched inference as the
+# tracker, and how well their detections agree with the first backend (recall of its boxes per class).
+# Backends are given as backend[:precision], e.g. ultralytics onnxruntime onnxruntime:int8 openvino:fp16
+
+def parse_backend(spec):
+    backend, _, precision = spec.partition(':')
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    return backend, precision or 'fp32'
+
+def run_backend(frames, model_path, backend, precision='fp32', batch_size=8, num_threads=None, conf=0.1):
+    backend_params = {'precision': precision, 'num_threads': num_threads} if backend != 'ultralytics' else None
+    if backend == 'ultralytics' and num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    tracker = Tracker(model_path, batch_size=batch_size, adaptive_batch_size=False, conf=conf, backend=backend, backend_params=backend_params)
+    tracker.load_model()
+    tracker.inference_engine.predict(frames[:batch_size]) # Warm up (memory allocation, kernel selection)
+
+    start = time.perf_counter()
+    results = list(tracker.inference_engine.iter_detections(frames))
+    seconds = time.perf_counter() - start
+    detections = [to_detections(result) for result in results]
+    names = results[0].names if results else {}
+    return detections, names, {"seconds": seconds, "fps": len(frames) / seconds, "ms_per_frame": seconds / len(frames) * 1000}
+
+# Share of the reference boxes of every class matched by a box of the same class at iou_threshold
+def detection_agreement(reference_detections, detections, names, iou_threshold=0.5):
+    matched = {name: 0 for name in names.values()}
+    total = {name: 0 for name in names.values()}
+    for reference, detection in zip(reference_detections, detections):
+        for class_id, name in names.items():
+            reference_boxes = reference.xyxy[reference.class_id == class_id]
+            boxes = detection.xyxy[detection.class_id == class_id]
+            total[name] += len(reference_boxes)
+            if not len(reference_boxes) or not len(boxes):
+                continue
+            ious = box_iou(reference_boxes.tolist(), boxes.tolist())
+            while ious.size and ious.max() >= iou_threshold:
+                i, j = np.unravel_index(np.argmax(ious), ious.shape)
+                matched[name] += 1
+                ious[i, :] = -1
+                ious[:, j] = -1
+    return {name: matched[name] / total[name] if total[name] else 1.0 for name in names.values()}
+
+def compare_backends(frames, model_path, specs, batch_size=8, num_threads=None):
+    results = {}
+    reference = None
+    for spec in specs:
+        backend, precision = parse_backend(spec)
+        detections, names, result = run_backend(frames, model_path, backend, precision, batch_size, num_threads)
+        if reference is None:
+            reference = detections
+            reference_fps = result["fps"]
+        result["speedup"] = result["fps"] / reference_fps
+        result["agreement"] = detection_agreement(reference, detections, names)
+        results[spec] = result
+    return {"frames": len(frames), "batch_size": batch_size, "num_threads": num_threads, "backends": results}
+
+def format_backends(comparison):
+    specs = list(comparison["backends"])
+    class_names = list(comparison["backends"][specs[0]]["agreement"])
+    lines = [f"{comparison['frames']} frames, batch size {comparison['batch_size']}, threads {comparison['num_threads'] or 'default'}, "
+             f"agreement with {specs[0]}",
+             f"{'Backend':<22}{'seconds':>9}{'fps':>8}{'ms/frame':>10}{'speedup':>9}" + "".join(f"{name:>12}" for name in class_names)]
+    for spec, result in comparison["backends"].items():
+        lines.append(f"{spec:<22}{result['seconds']:>9.2f}{result['fps']:>8.1f}{result['ms_per_frame']:>10.1f}{result['speedup']:>8.2f}x" +
+                     "".join(f"{result['agreement'][name] * 100:>11.1f}%" for name in class_names))
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput and agreement of the detector backends')
+    parser.add_argument('--video', default='input_videos/08fd33_4.mp4')
+    parser.add_argument('--model', default='models/best.pt', help='YOLO weights, the ONNX backends use the .onnx next to them')
+    parser.add_argument('--backends', nargs='+', default=['ultralytics', 'onnxruntime', 'onnxruntime:int8', 'openvino'],
+                        help='backend[:precision] to compare, the first one is the reference')
+    parser.add_argument('--frames', type=int, default=200, help='Frames of the video to detect')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=None, help='Inference threads (default: all the cores)')
+    parser.add_argument('--export', action='store_true', help='Export the weights to ONNX first (needs ultralytics)')
+    parser.add_argument('--output', default=None, help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.export:
+        from trackers import export_onnx
+        print(f"Exported {export_onnx(args.model)}")
+
+    frames = list(islice(read_video_stream(args.video), args.frames))
+    comparison = compare_backends(frames, args.model, args.backends, args.batch_size, args.threads)
+    print(format_backends(comparison))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(comparison, f, indent=2)
@@ -0,0 +1,240 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import time
+import numpy as np
+from utils import StageProfiler, TrackTable
+from trackers import Tracker
+from team_assigner import TeamAssigner
+from player_ball_assigner import PlayerBallAssigner, PossessionStats
+from camera_movement_estimator import CameraMovementEstimator
+from view_transformer import ViewTransformer
+from speed_and_distance_estimator import SpeedAndDistanceEstimator
+from renderer import FrameRenderer, LAYERS
+from .synthetic_match import synthesize_tracks, synthesize_frames, synthesize_camera_movement
+
+# Post-detection stages of main(), in order. Each one runs on the output of the previous ones.
+BENCHMARK_STAGES = ('position', 'camera_adjust', 'view_transform', 'interpolation', 'speed', 'team', 'ball_assignment', 'draw')
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Times the stages of main() after detection on a synthetic match.
+# track_format is 'table' (TrackTable, as main() runs) or 'dict' (nested dicts, as the streaming pipeline and
+# the stubs use). The pixel stages read sample_frames synthetic frames over and over, and drawing is timed on
+# the first draw_frames frames only and scaled to the whole match.
+class PipelineBenchmark:
+    def __init__(self, minutes, objects_per_frame, frame_rate=24, track_format='table', sample_frames=120, draw_frames=500,
+                 trace_memory=False, stages=BENCHMARK_STAGES, seed=0):
+        if track_format not in ('table', 'dict'):
+            raise ValueError(f"Unknown track format: {track_format}")
+        unknown = [stage for stage in stages if stage not in BENCHMARK_STAGES]
+        if unknown:
+            raise ValueError(f"Unknown benchmark stage: {unknown[0]}")
+
+        self.minutes = minutes
+        self.objects_per_frame = objects_per_frame
+        self.frame_rate = frame_rate
+        self.num_frames = max(int(round(minutes * 60 * frame_rate)), 2)
+        self.track_format = track_format
+        self.sample_frames = sample_frames
+        self.draw_frames = min(draw_frames, self.num_frames)
+        self.trace_memory = trace_memory
+        self.stages = stages
+        self.seed = seed
+
+    def config(self):
+        return {
+            "minutes": self.minutes,
+            "objects_per_frame": self.objects_per_frame,
+            "frame_rate": self.frame_rate,
+            "frames": self.num_frames,
+            "track_format": self.track_format,
+            "sample_frames": self.sample_frames,
+            "draw_frames": self.draw_frames,
+            "trace_memory": self.trace_memory,
+            "seed": self.seed,
+        }
+
+    def prepare(self):
+        self.table = synthesize_tracks(self.num_frames, self.objects_per_frame, frame_rate=self.frame_rate, seed=self.seed)
+        self.camera_movement = synthesize_camera_movement(self.num_frames, seed=self.seed)
+        self.frames = synthesize_frames(self.table, self.sample_frames, seed=self.seed)
+        if 'team' in self.stages:
+            import sklearn.cluster # Imported on the first use by TeamAssigner, import times are for benchmarks.startup_time
+
+    def fresh_tracks(self):
+        if self.track_format == 'table':
+            return TrackTable(self.table.rows.copy(), self.table.num_frames)
+        return self.table.to_tracks()
+
+    # One run of every stage, returns the StageProfiler with their timings
+    def run_once(self):
+        tracks = self.fresh_tracks()
+        is_table = self.track_format == 'table'
+        profiler = StageProfiler(trace_memory=self.trace_memory)
+        frame_of = lambda frame_num: self.frames[frame_num % len(self.frames)]
+        tracker = Tracker('models/best.pt') # The model is only loaded to detect, which the benchmark never does
+        possession = None
+
+        if 'position' in self.stages:
+            with profiler.stage('position', frames=self.num_frames):
+                tracker.add_position_to_track(tracks)
+
+        if 'camera_adjust' in self.stages:
+            camera_movement_estimator = CameraMovementEstimator(self.frames[0])
+            with profiler.stage('camera_adjust', frames=self.num_frames):
+                camera_movement_estimator.add_adjust_positions_to_trackers(tracks, self.camera_movement)
+
+        if 'view_transform' in self.stages:
+            with profiler.stage('view_transform', frames=self.num_frames):
+                ViewTransformer().add_transformed_position_to_tracks(tracks)
+
+        if 'interpolation' in self.stages:
+            with profiler.stage('interpolation', frames=self.num_frames):
+                if is_table:
+                    tracks.interpolate_ball_position()
+                else:
+                    tracks['ball'] = tracker.interpolate_ball_position(tracks['ball'])
+
+        if 'speed' in self.stages:
+            with profiler.stage('speed', frames=self.num_frames):
+                speed_and_distance_estimator = SpeedAndDistanceEstimator(frame_rate=self.frame_rate, method='rolling' if is_table else 'window')
+                speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
+
+        if 'team' in self.stages:
+            with profiler.stage('team', frames=self.num_frames):
+                team_assigner = TeamAssigner()
+                team_assigner.assign_team_color(self.frames[0], tracks['players'][0])
+                for frame_num, player_track in enumerate(tracks['players']):
+                    frame_teams = team_assigner.get_frame_teams(frame_of(frame_num), player_track, frame_num)
+                    for player_id, team in frame_teams.items():
+                        player_track[player_id]['team'] = team
+                        player_track[player_id]['team_color'] = team_assigner.team_colors[team]
+
+        if 'ball_assignment' in self.stages:
+            with profiler.stage('ball_assignment', frames=self.num_frames):
+                player_assigner = PlayerBallAssigner()
+                if is_table:
+                    team_ball_control = player_assigner.assign_ball_to_tracks(tracks)
+                else:
+                    team_ball_control = []
+                    for frame_num, player_track in enumerate(tracks['players']):
+                        team = team_ball_control[-1] if team_ball_control else 0
+                        ball = tracks['ball'][frame_num]
+                        if 1 in ball:
+                            assigned_player = player_assigner.assign_ball_to_player(player_track, ball[1]['bbox'])
+                            if assigned_player != -1:
+                                player_track[assigned_player]['has_ball'] = True
+                                team = player_track[assigned_player].get('team', team)
+                        team_ball_control.append(team)
+                possession = PossessionStats.from_team_ball_control(team_ball_control, frame_rate=self.frame_rate)
+
+        if 'draw' in self.stages:
+            # Drawing is in place, the frames are copied first so every run draws on clean frames
+            draw_frames = [frame_of(frame_num).copy() for frame_num in range(self.draw_frames)]
+            with profiler.stage('draw', frames=self.draw_frames):
+                FrameRenderer(LAYERS).render_video(draw_frames, tracks, possession, self.camera_movement)
+
+        return profiler
+
+    # Best of `repeat` runs for every stage
+    def run(self, repeat=1):
+        self.prepare()
+        results = {}
+        for _ in range(repeat):
+            profiler = self.run_once()
+            for stage in (stage for stage in BENCHMARK_STAGES if stage in profiler.stages):
+                stats = profiler.get_stage_stats(stage)
+                # Sampled stages are scaled to the whole match
+                seconds = stats["total"] * self.num_frames / stats["frames"]
+                result = {
+                    "seconds": seconds,
+                    "per_frame_us": seconds / self.num_frames * 1e6,
+                    "sampled_frames": stats["frames"] if stats["frames"] < self.num_frames else None,
+                    "peak_memory": stats["peak_memory"],
+                }
+                if stage not in results or seconds < results[stage]["seconds"]:
+                    results[stage] = result
+        return {"config": self.config(), "stages": results}
+
+def scale_name(config):
+    return f"{config['minutes']:g}min_{config['objects_per_frame']}obj_{config['track_format']}"
+
+def save_baseline(name, results, baseline_dir=BASELINE_DIR):
+    os.makedirs(baseline_dir, exist_ok=True)
+    baseline = {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "python": platform.python_version(),
+                    "numpy": np.__version__, "cpus": os.cpu_count()},
+        "scales": {scale_name(result["config"]): result for result in results},
+    }
+    path = os.path.join(baseline_dir, f"{name}.json")
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+    return path
+
+def load_baseline(name, baseline_dir=BASELINE_DIR):
+    path = name if os.path.exists(name) else os.path.join(baseline_dir, f"{name}.json")
+    with open(path) as f:
+        return json.load(f)
+
+def format_results(result, baseline=None, threshold=0.1):
+    config = result["config"]
+    baseline_stages = baseline["stages"] if baseline is not None else {}
+    lines = [f"{scale_name(config)}: {config['frames']} frames" + (" (memory traced, timings inflated)" if config["trace_memory"] else "")]
+    header = f"  {'Stage':<16}{'seconds':>10}{'us/frame':>10}"
+    if config["trace_memory"]:
+        header += f"{'peak MB':>9}"
+    if baseline is not None:
+        header += f"{'baseline s':>12}{'change':>9}"
+    lines.append(header)
+
+    for stage, stats in result["stages"].items():
+        line = f"  {stage:<16}{stats['seconds']:>10.3f}{stats['per_frame_us']:>10.1f}"
+        if config["trace_memory"]:
+            line += f"{stats['peak_memory'] / 1024**2:>9.1f}"
+        if stage in baseline_stages:
+            change = stats["seconds"] / baseline_stages[stage]["seconds"] - 1 if baseline_stages[stage]["seconds"] > 0 else 0.0
+            line += f"{baseline_stages[stage]['seconds']:>12.3f}{change * 100:>+8.1f}%"
+            if change > threshold:
+                line += "  SLOWER"
+            elif change < -threshold:
+                line += "  faster"
+        if stats["sampled_frames"]:
+            line += f"  (scaled from {stats['sampled_frames']} frames)"
+        lines.append(line)
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the post-detection stages on synthetic matches')
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1.0], help='Match lengths to benchmark, e.g. 1 10 90')
+    parser.add_argument('--objects', type=int, nargs='+', default=[25], help='Objects per frame (players, referees and ball), e.g. 10 25 40')
+    parser.add_argument('--frame-rate', type=int, default=24)
+    parser.add_argument('--format', default='table', choices=['table', 'dict'], help='Track storage: TrackTable like main() or nested dicts')
+    parser.add_argument('--stages', default=','.join(BENCHMARK_STAGES), help=f'Comma separated stages ({", ".join(BENCHMARK_STAGES)})')
+    parser.add_argument('--sample-frames', type=int, default=120, help='Synthetic frames the pixel stages cycle through')
+    parser.add_argument('--draw-frames', type=int, default=500, help='Frames drawn, the drawing time is scaled to the whole match')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per scale, the fastest one is kept')
+    parser.add_argument('--memory', action='store_true', help='Record the peak memory of every stage (tracemalloc, slows the stages down)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', default=None, help='Save the results as benchmarks/baselines/<name>.json')
+    parser.add_argument('--compare', default=None, help='Baseline name or path to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported as slower or faster')
+    args = parser.parse_args()
+
+    stages = tuple(stage for stage in args.stages.split(',') if stage)
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    results = []
+    for minutes, objects in itertools.product(args.minutes, args.objects):
+        benchmark = PipelineBenchmark(minutes, objects, args.frame_rate, args.format, args.sample_frames, args.draw_frames,
+                                      args.memory, stages, args.seed)
+        result = benchmark.run(args.repeat)
+        results.append(result)
+        baseline_result = baseline["scales"].get(scale_name(result["config"])) if baseline is not None else None
+        print(format_results(result, baseline_result, args.threshold))
+
+    if args.save_baseline:
+        print(f"Baseline saved to {save_baseline(args.save_baseline, results)}")
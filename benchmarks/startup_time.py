@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that should only be imported once they are used
+HEAVY_MODULES = ('ultralytics', 'supervision', 'torch', 'sklearn', 'scipy', 'pandas')
+
+# Each scenario runs in a fresh interpreter and reports the seconds from its start to the end of the snippet
+SCENARIOS = {
+    "interpreter": "pass",
+    "import utils": "import utils",
+    "import trackers": "import trackers",
+    "import team_assigner": "import team_assigner",
+    "import pipeline": "import pipeline",
+    "import main": "import main",
+    "stub tracks": (
+        "import main\n"
+        "tracker = main.Tracker('models/best.pt')\n"
+        "tracks = tracker.get_object_track([], read_from_stubs=True, stub_path='stubs/track_stubs.pkl')\n"
+        "main.TrackTable.from_tracks(tracks)"
+    ),
+}
+
+RUNNER = """
+import time
+start = time.perf_counter()
+exec(compile({code!r}, '<scenario>', 'exec'))
+elapsed = time.perf_counter() - start
+import json, sys
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def run_scenario(code, python=sys.executable, cwd=REPO_DIR):
+    output = subprocess.run([python, '-c', RUNNER.format(code=code, heavy=HEAVY_MODULES)], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+# Median over `repeat` cold starts of every scenario, with the heavy modules each one ended up importing
+def measure_startup(scenarios=None, repeat=5):
+    results = {}
+    for name in scenarios or SCENARIOS:
+        runs = [run_scenario(SCENARIOS[name]) for _ in range(repeat)]
+        results[name] = {
+            "seconds": float(np.median([run["seconds"] for run in runs])),
+            "heavy_modules": runs[-1]["heavy"],
+        }
+    return results
+
+# Slowest imports (cumulative) of a scenario from python -X importtime
+def slowest_imports(code, top=15, cwd=REPO_DIR):
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, capture_output=True, text=True, check=True)
+    imports = []
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us), module.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+def format_startup(results):
+    lines = [f"{'Scenario':<22}{'seconds':>9}  heavy modules imported"]
+    for name, result in results.items():
+        lines.append(f"{name:<22}{result['seconds']:>9.3f}  {', '.join(result['heavy_modules']) or '-'}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cold start time of the pipeline packages, each scenario in a fresh interpreter')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS), metavar='SCENARIO',
+                        help=f'Scenarios to time ({", ".join(SCENARIOS)})')
+    parser.add_argument('--repeat', type=int, default=5, help='Cold starts per scenario, the median is reported')
+    parser.add_argument('--importtime', default=None, choices=list(SCENARIOS), metavar='SCENARIO',
+                        help='Also list the slowest imports of a scenario')
+    args = parser.parse_args()
+
+    print(format_startup(measure_startup(args.scenarios, args.repeat)))
+    if args.importtime:
+        print(f"\nSlowest imports of '{args.importtime}' (cumulative):")
+        for cumulative_us, module in slowest_imports(SCENARIOS[args.importtime]):
+            print(f"{cumulative_us / 1e6:>8.3f}s  {module}")
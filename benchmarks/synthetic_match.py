@@ -0,0 +1,116 @@
+import os
+import pickle
+import cv2
+import numpy as np
+from utils import TrackTable, OBJECT_CLASSES
+from utils.track_table import empty_rows
+
+# Synthetic matches at any length and crowding for the benchmarks, shaped after the stubs of the sample
+# video: box sizes and camera movement come from stubs/ when they are there. Everything is drawn from a
+# seeded generator so a configuration always gives the same match.
+
+# Box sizes (width, height) from the first frames of the track stub, the usual sizes of the sample video otherwise
+def stub_box_sizes(stub_path='stubs/track_stubs.pkl'):
+    sizes = {"players": (38.0, 80.0), "referees": (36.0, 78.0), "ball": (16.0, 16.0)}
+    if os.path.exists(stub_path):
+        with open(stub_path, 'rb') as f:
+            tracks = pickle.load(f)
+        for object in OBJECT_CLASSES:
+            bboxes = np.array([track["bbox"] for frame in tracks[object][:100] for track in frame.values()]).reshape(-1, 4)
+            if len(bboxes):
+                sizes[object] = tuple(np.median(bboxes[:, 2:] - bboxes[:, :2], axis=0).tolist())
+    return sizes
+
+# Camera movement per frame: the stub repeated over the match, a smooth random pan if there is no stub
+def synthesize_camera_movement(num_frames, seed=0, stub_path='stubs/camera_movement_stub.pkl'):
+    if os.path.exists(stub_path):
+        with open(stub_path, 'rb') as f:
+            movement = np.asarray(pickle.load(f), dtype=np.float32).reshape(-1, 2)
+        return np.resize(movement, (num_frames, 2))
+
+    rng = np.random.default_rng(seed)
+    pan = np.cumsum(rng.normal(0, 0.2, size=(num_frames, 2)), axis=0)
+    return np.clip(pan, -6, 6).astype(np.float32)
+
+# TrackTable of a match: players and referees run around the frame with smooth random velocities, and
+# every now and then a track is lost and comes back with a new id (like ByteTrack). The ball follows a
+# player and is missing for short gaps.
+# objects_per_frame counts players, referees and the ball.
+def synthesize_tracks(num_frames, objects_per_frame=25, num_referees=3, ball_visibility=0.7, mean_track_seconds=20,
+                      frame_rate=24, frame_size=(1920, 1080), seed=0, box_sizes=None):
+    rng = np.random.default_rng(seed)
+    box_sizes = box_sizes or stub_box_sizes()
+    num_referees = min(num_referees, max(objects_per_frame - 3, 0))
+    num_players = max(objects_per_frame - num_referees - 1, 2)
+    num_slots = num_players + num_referees
+    width, height = frame_size
+
+    # Random velocities with drag (a few pixels per frame), the positions reflected at the frame edges
+    acceleration = rng.normal(0, 0.5, size=(num_frames, num_slots, 2))
+    velocity = np.empty_like(acceleration)
+    velocity[0] = acceleration[0]
+    for frame_num in range(1, num_frames):
+        velocity[frame_num] = 0.97 * velocity[frame_num - 1] + acceleration[frame_num]
+    positions = (rng.uniform((100, 200), (width - 100, height - 50), size=(num_slots, 2)) + np.cumsum(velocity, axis=0)).astype(np.float32)
+    for axis, (low, high) in enumerate(((50, width - 50), (150, height - 10))):
+        span = high - low
+        wrapped = np.mod(positions[:, :, axis] - low, 2 * span)
+        positions[:, :, axis] = low + np.where(wrapped > span, 2 * span - wrapped, wrapped)
+
+    # A new track id whenever the track of a slot is lost, kept by the slot until it is lost again. The new
+    # ids grow over the frames, so the running maximum of a slot is its current id.
+    lost = rng.random((num_frames, num_slots)) < 1 / (mean_track_seconds * frame_rate)
+    lost[0] = True
+    new_ids = np.where(lost, np.cumsum(lost.ravel()).reshape(num_frames, num_slots), 0)
+    track_ids = np.maximum.accumulate(new_ids, axis=0).astype(np.int32)
+
+    classes = np.array([0] * num_players + [1] * num_referees)
+    sizes = np.array([box_sizes["players"]] * num_players + [box_sizes["referees"]] * num_referees, dtype=np.float32)
+
+    rows = empty_rows(num_frames * num_slots)
+    rows["frame"] = np.repeat(np.arange(num_frames), num_slots)
+    rows["track_id"] = track_ids.ravel()
+    rows["class"] = np.tile(classes, num_frames)
+    feet = positions.reshape(-1, 2)
+    box_size = np.tile(sizes, (num_frames, 1))
+    rows["bbox"] = np.concatenate([feet - box_size * (0.5, 1.0), feet + box_size * (0.5, 0.0)], axis=1)
+
+    # The ball stays with a player for a few seconds, near their feet, with detection gaps
+    holder = np.repeat(rng.integers(0, num_players, size=num_frames // (3 * frame_rate) + 1), 3 * frame_rate)[:num_frames]
+    ball_center = positions[np.arange(num_frames), holder] + rng.normal(0, 6, size=(num_frames, 2)).astype(np.float32)
+    gap_starts = rng.random(num_frames) < (1 - ball_visibility) / 6
+    visible = np.convolve(gap_starts, np.ones(6), mode='same') == 0
+    ball_frames = np.flatnonzero(visible)
+    ball_rows = empty_rows(len(ball_frames))
+    ball_rows["frame"] = ball_frames
+    ball_rows["track_id"] = 1
+    ball_rows["class"] = OBJECT_CLASSES.index("ball")
+    half_ball = np.array(box_sizes["ball"], dtype=np.float32) / 2
+    ball_rows["bbox"] = np.concatenate([ball_center[ball_frames] - half_ball, ball_center[ball_frames] + half_ball], axis=1)
+
+    return TrackTable(np.concatenate([rows, ball_rows]), num_frames)
+
+# Frames showing the tracks of the first num_frames frames: a pitch with the players in their team
+# colors (by track id parity) and the referees in yellow, for the stages that read pixels
+def synthesize_frames(tracks, num_frames, frame_size=(1920, 1080), seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    pitch = np.empty((height, width, 3), dtype=np.uint8)
+    pitch[:] = (60, 140, 50)
+    pitch = cv2.add(pitch, rng.integers(0, 20, size=pitch.shape, dtype=np.uint8))
+
+    team_colors = {0: (240, 240, 240), 1: (40, 40, 200)}
+    frames = []
+    for frame_num in range(min(num_frames, tracks.num_frames)):
+        frame = pitch.copy()
+        for row in tracks.frame_rows(frame_num):
+            x1, y1, x2, y2 = [int(v) for v in row["bbox"]]
+            if OBJECT_CLASSES[row["class"]] == "players":
+                color = team_colors[row["track_id"] % 2]
+            elif OBJECT_CLASSES[row["class"]] == "referees":
+                color = (0, 220, 220)
+            else:
+                color = (255, 255, 255)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+        frames.append(frame)
+    return frames
@@ -2,13 +2,27 @@ import pickle
 import cv2
 import numpy as np
 import os
-import sys
-sys.path.append('../')
-from utils import measure_distance, measure_xy_distance
+from utils import TrackTable
+from .parallel_camera_movement import get_camera_movement_parallel
 
 class CameraMovementEstimator():
-    def __init__(self, frame):
+    # mode: 'max' takes the largest feature displacement, 'affine' fits a RANSAC partial affine motion to all the features
+    # pyramid_level: estimate on the frame downscaled 2**pyramid_level times
+    # min_features: keep tracking the same features and only redetect when fewer are left
+    #               (None redetects after every recorded movement, defaults to 30 in 'affine' mode)
+    def __init__(self, frame, mode='max', pyramid_level=0, min_features=None):
+        if mode not in ('max', 'affine'):
+            raise ValueError(f"Unknown camera movement mode: {mode}")
+
+        self.params = dict(mode=mode, pyramid_level=pyramid_level, min_features=min_features) # To rebuild the estimator in other processes
         self.minimum_distance = 5
+        self.mode = mode
+        self.pyramid_level = pyramid_level
+        self.scale = 2 ** pyramid_level
+        if min_features is None and mode == 'affine':
+            min_features = 30
+        self.min_features = min_features
+        self.ransac_threshold = 3.0 # Pixels at the pyramid level
 
         self.lk_params = dict(
             winSize = (15, 15),
@@ -20,6 +34,8 @@ class CameraMovementEstimator():
         mask_features = np.zeros_like(first_frame_grayscale)
         mask_features[:, 0:20] = 1  # Top section
         mask_features[:, 900:1050] = 1  # Bottom section
+        if pyramid_level > 0:
+            mask_features = cv2.resize(mask_features, self.to_grayscale(frame).shape[::-1], interpolation=cv2.INTER_NEAREST)
 
         self.features = dict(
             maxCorners = 100,
@@ -30,7 +46,11 @@ class CameraMovementEstimator():
         )
 
 
-    def get_camera_movement(self, frames, read_from_stub = False, stub_path = None):
+    # With a PipelineCache and the video path, the result is reused as long as the video and the estimator parameters are unchanged
+    def get_camera_movement(self, frames, read_from_stub = False, stub_path = None, video_path = None, cache = None):
+        if cache is not None and video_path is not None:
+            return self.get_cached_camera_movement(cache, video_path, {}, lambda: self.get_camera_movement(frames))
+
         # Read the stub
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path, 'rb') as f:
@@ -38,39 +58,127 @@ class CameraMovementEstimator():
 
         camera_movement = [[0,0]] * len(frames)
 
-        old_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
-        old_features = cv2.goodFeaturesToTrack(old_gray, **self.features)
-
+        self.reset_stream(frames[0])
         for frame_num in range(1, len(frames)):
-            frame_gray = cv2.cvtColor(frames[frame_num], cv2.COLOR_BGR2GRAY)
-            new_features, status, error = cv2.calcOpticalFlowPyrLK(old_gray, frame_gray, old_features, None, **self.lk_params)
+            camera_movement[frame_num] = self.get_frame_camera_movement(frames[frame_num])
 
-            max_distance = 0
-            camera_movemnt_x, camera_movement_y = 0, 0
+        if stub_path is not None:
+            with open(stub_path, 'wb') as f:
+                pickle.dump(camera_movement, f)
 
-            for i, (new, old) in enumerate(zip(new_features, old_features)):
-                new_features_point = new.ravel()
-                old_features_point = old.ravel()
+        return camera_movement
+    
+    # Same as get_camera_movement but the video is split into overlapping chunks estimated on a process pool,
+    # each worker decoding its own frames from video_path
+    def get_camera_movement_parallel(self, video_path, num_workers=None, chunk_size=500, overlap=24, read_from_stub=False, stub_path=None, cache=None):
+        if cache is not None:
+            chunking = {'chunk_size': chunk_size, 'overlap': overlap}
+            return self.get_cached_camera_movement(cache, video_path, chunking, lambda: self.get_camera_movement_parallel(video_path, num_workers, chunk_size, overlap))
 
-                distance = measure_distance(new_features_point, old_features_point)
-                
-                if distance > max_distance:
-                    max_distance = distance
-                    camera_movemnt_x, camera_movement_y = measure_xy_distance(old_features_point, new_features_point)
-            
-            if max_distance < self.minimum_distance:
-                camera_movement[frame_num] = [camera_movemnt_x, camera_movement_y]
-                old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            with open(stub_path, 'rb') as f:
+                return pickle.load(f)
 
-            old_gray = frame_gray.copy()
+        camera_movement = get_camera_movement_parallel(video_path, self.params, num_workers, chunk_size, overlap)
 
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
                 pickle.dump(camera_movement, f)
 
         return camera_movement
+
+    def get_cached_camera_movement(self, cache, video_path, extra_params, estimate):
+        features = {name: value for name, value in self.features.items() if name != 'mask'}
+        params = dict(self.params, lk_params=self.lk_params, features=features, minimum_distance=self.minimum_distance, **extra_params)
+        key = cache.make_key('camera_movement', files=[video_path], params=params)
+
+        cached = cache.get('camera_movement', key)
+        if cached is not None:
+            return cached['camera_movement'].tolist()
+
+        camera_movement = estimate()
+        cache.put('camera_movement', key, {'camera_movement': np.asarray(camera_movement, dtype=np.float32).reshape(-1, 2)})
+        return camera_movement
+
+    def to_grayscale(self, frame):
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for _ in range(self.pyramid_level):
+            frame_gray = cv2.pyrDown(frame_gray)
+        return frame_gray
+
+    # Start estimating camera movement frame by frame from the given first frame
+    def reset_stream(self, frame):
+        self.old_gray = self.to_grayscale(frame)
+        self.old_features = cv2.goodFeaturesToTrack(self.old_gray, **self.features)
+
+    # Camera movement of the next frame relative to the previous one (reset_stream must be called first)
+    def get_frame_camera_movement(self, frame):
+        frame_gray = self.to_grayscale(frame)
+        camera_movement = [0, 0]
+
+        if self.old_features is None or len(self.old_features) == 0:
+            self.old_gray = frame_gray
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+            return camera_movement
+
+        new_features, status, error = cv2.calcOpticalFlowPyrLK(self.old_gray, frame_gray, self.old_features, None, **self.lk_params)
+        old_points = self.old_features.reshape(-1, 2)
+        new_points = new_features.reshape(-1, 2)
+        is_tracked = status.reshape(-1) == 1
+
+        if self.mode == 'affine':
+            movement, is_inlier = self.estimate_affine_movement(old_points[is_tracked], new_points[is_tracked])
+            if movement is not None:
+                camera_movement = movement
+            # Carry on with the inliers only
+            tracked_features = new_features[is_tracked][is_inlier] if movement is not None else new_features[:0]
+            redetect = False
+        else:
+            # Displacement (old - new) of every feature, the largest one is the camera movement
+            displacement = old_points - new_points
+            distances = np.hypot(displacement[:, 0], displacement[:, 1])
+            max_index = np.argmax(distances)
+            # minimum_distance is in full resolution pixels like the movement, not in pixels of the pyramid level
+            redetect = distances[max_index] * self.scale < self.minimum_distance
+            if redetect:
+                camera_movement = [displacement[max_index, 0] * self.scale, displacement[max_index, 1] * self.scale]
+            tracked_features = new_features[is_tracked]
+
+        if self.min_features is None:
+            if redetect:
+                self.old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+        elif len(tracked_features) < self.min_features:
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+        else:
+            self.old_features = tracked_features
+
+        self.old_gray = frame_gray
+
+        return camera_movement
+
+    # Camera movement from a RANSAC partial affine (rotation, scale, translation) fit of the feature motion.
+    # Returns the movement of the features' center (None if the fit failed) and the inlier mask.
+    def estimate_affine_movement(self, old_points, new_points):
+        is_inlier = np.zeros(len(old_points), dtype=bool)
+        if len(old_points) < 3:
+            return None, is_inlier
+
+        matrix, inliers = cv2.estimateAffinePartial2D(old_points, new_points, method=cv2.RANSAC, ransacReprojThreshold=self.ransac_threshold)
+        if matrix is None:
+            return None, is_inlier
+        is_inlier = inliers.reshape(-1) == 1
+
+        center = old_points[is_inlier].mean(axis=0)
+        moved_center = matrix[:, :2] @ center + matrix[:, 2]
+        movement = (center - moved_center) * self.scale
+        return [float(movement[0]), float(movement[1])], is_inlier
     
     def add_adjust_positions_to_trackers(self, tracks, camera_movement_per_frame):
+        if isinstance(tracks, TrackTable):
+            camera_movement_per_frame = np.asarray(camera_movement_per_frame, dtype=np.float32)
+            tracks.rows['position_adjusted'] = tracks.rows['position'] - camera_movement_per_frame[tracks.rows['frame']]
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -78,22 +186,3 @@ class CameraMovementEstimator():
                     camera_movement = camera_movement_per_frame[frame_num]
                     position_adjusted = (position[0] - camera_movement[0], position[1] - camera_movement[1])
                     tracks[object][frame_num][track_id]['position_adjusted'] = position_adjusted
-
-    def draw_camera_movement(self, frames, camera_movement_per_frame):
-        output_frames = []
-        for frame_num, frame in enumerate(frames):
-            frame = frame.copy()
-
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (500, 100), (255, 255, 255), -1)
-            alpha = 0.6
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-            x_movement, y_movement = camera_movement_per_frame[frame_num]
-            frame = cv2.putText(frame, f'Camera Movement X: {x_movement:.2f}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-            frame = cv2.putText(frame, f'Camera Movement Y: {y_movement:.2f}', (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-
-            output_frames.append(frame)
-
-        return output_frames
-
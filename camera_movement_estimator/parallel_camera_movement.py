@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import cv2
+import numpy as np
+
+# Camera movement of frames [start, end) of the video, estimated in a worker process.
+# The worker decodes its own frames and starts estimating `overlap` frames early so the
+# tracked features have settled by the time it reaches its first frame.
+# seek=False decodes the frames before the warm start instead of seeking, slower but frame accurate.
+def estimate_chunk_camera_movement(video_path, start, end, overlap, estimator_params, seek=True):
+    from .camera_movement_estimator import CameraMovementEstimator
+
+    cv2.setNumThreads(1) # The pool already uses every core
+    warm_start = max(start - overlap, 0)
+
+    cap = cv2.VideoCapture(video_path)
+    if seek:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warm_start)
+    else:
+        for _ in range(warm_start):
+            if not cap.grab():
+                break
+    try:
+        ret, frame = cap.read()
+        if not ret:
+            return []
+
+        estimator = CameraMovementEstimator(frame, **estimator_params)
+        estimator.reset_stream(frame)
+        camera_movement = [[0, 0]] if warm_start == start else []
+
+        frame_num = warm_start + 1
+        while end is None or frame_num < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            movement = estimator.get_frame_camera_movement(frame)
+            if frame_num >= start:
+                camera_movement.append(movement)
+            frame_num += 1
+    finally:
+        cap.release()
+
+    return camera_movement
+
+# Split the video into chunks, estimate them on a process pool and stitch the per-chunk series back together.
+# Movements are relative to the previous frame, so the chunks only need to be concatenated in order.
+def get_camera_movement_parallel(video_path, estimator_params=None, num_workers=None, chunk_size=500, overlap=24):
+    estimator_params = estimator_params or {}
+    num_workers = num_workers or os.cpu_count()
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    # The frame count from the container can be off, so the last chunk reads until the end of the video
+    starts = list(range(0, max(frame_count, 1), chunk_size))
+    ends = starts[1:] + [None]
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(estimate_chunk_camera_movement, video_path, start, end, overlap, estimator_params)
+                   for start, end in zip(starts, ends)]
+        chunks = [future.result() for future in futures]
+
+    camera_movement = []
+    for chunk_index, (start, chunk) in enumerate(zip(starts, chunks)):
+        if len(camera_movement) != start:
+            # The previous chunk came back short (the seek is not frame accurate in every container, or the
+            # frame count was too high). That chunk is estimated again without seeking, so the series still
+            # has one movement per frame.
+            previous_start = starts[chunk_index - 1]
+            print(f"Camera movement of frames {previous_start}-{start - 1}: {len(camera_movement) - previous_start} frames "
+                  f"after seeking, estimating them again without seeking")
+            camera_movement = camera_movement[:previous_start]
+            camera_movement.extend(estimate_chunk_camera_movement(video_path, previous_start, start, overlap, estimator_params, seek=False))
+            if len(camera_movement) != start:
+                break # The video ends in that chunk, the frame count was too high
+        camera_movement.extend(chunk)
+
+    return camera_movement
+
+# Largest difference per axis between two camera movement series, to check the parallel result against the sequential one
+def compare_camera_movement(camera_movement, reference_camera_movement):
+    camera_movement = np.asarray(camera_movement, dtype=np.float64)
+    reference_camera_movement = np.asarray(reference_camera_movement, dtype=np.float64)
+    if camera_movement.shape != reference_camera_movement.shape:
+        raise ValueError(f"Camera movement lengths differ: {len(camera_movement)} and {len(reference_camera_movement)}")
+    if len(camera_movement) == 0:
+        return 0.0
+    return float(np.abs(camera_movement - reference_camera_movement).max())
@@ -1,83 +1,272 @@
-from utils import read_video, save_video
-from trackers import Tracker
+from utils import read_video, save_video, get_video_fps, video_extension, TrackTable, TrackExporter, PipelineCache, StageProfiler, ENCODERS
+from trackers import Tracker, DETECTOR_BACKENDS, compare_tracks, format_track_comparison, format_roi_stats
 import cv2
 import numpy as np
-from team_assigner import TeamAssigner
-from player_ball_assigner import PlayerBallAssigner
+from team_assigner import TeamAssigner, parse_team_override
+from player_ball_assigner import PlayerBallAssigner, PossessionStats
 from camera_movement_estimator import CameraMovementEstimator
 from view_transformer import ViewTransformer
 from speed_and_distance_estimator import SpeedAndDistanceEstimator
+from pipeline import StreamingPipeline, LivePipeline, BatchRunner, load_batch, format_batch_progress
+from renderer import FrameRenderer, OverlayWriter, LAYERS
+import argparse
+import json
+import os
+import pickle
+
+def main(calibration_path=None, camera_workers=1, use_stubs=False, cache_dir='cache', layers=LAYERS, detection_stride=1, profiler=None,
+         encoder='opencv', encoder_params=None, tracks_only=False, export_tracks=False, ball_roi_params=None, backend='ultralytics', backend_params=None,
+         switch_margin=10, team_overrides=None):
+    # Time every stage when profiling (a disabled profiler measures nothing)
+    profiler = profiler if profiler is not None else StageProfiler(enabled=False)
+    os.makedirs('output_videos', exist_ok=True) # Not in the repository
 
-def main():
     # Read the video
-    video_frames = read_video('input_videos/08fd33_4.mp4')
+    video_path = 'input_videos/08fd33_4.mp4'
+    with profiler.stage('read') as stage:
+        video_frames = read_video(video_path)
+        stage.set_frames(len(video_frames))
+    num_frames = len(video_frames)
+    frame_rate = get_video_fps(video_path)
     
+    # Detection and camera movement are reused from the cache while the video, model and parameters are unchanged
+    cache = None if use_stubs else PipelineCache(cache_dir)
+
+    # Estimate camera movement
+    with profiler.stage('camera_motion', frames=num_frames):
+        camera_movement_estimator = CameraMovementEstimator(video_frames[0])
+        camera_movement_stub_path = 'stubs/camera_movement_stub.pkl' if use_stubs else None
+        if camera_workers > 1:
+            # Chunks of the video estimated on several processes
+            camera_movement_per_frame = camera_movement_estimator.get_camera_movement_parallel(video_path,
+                                                                                               num_workers=camera_workers,
+                                                                                               read_from_stub=use_stubs,
+                                                                                               stub_path=camera_movement_stub_path,
+                                                                                               cache=cache)
+        else:
+            camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames,
+                                                                                       read_from_stub=use_stubs,
+                                                                                       stub_path=camera_movement_stub_path,
+                                                                                       video_path=video_path,
+                                                                                       cache=cache)
+
     # Initialize the tracker
-    tracker = Tracker('models/best.pt')
+    tracker = Tracker('models/best.pt', detection_stride=detection_stride, ball_roi=ball_roi_params is not None, ball_roi_params=ball_roi_params,
+                      backend=backend, backend_params=backend_params)
+    tracker.profiler = profiler
 
-    tracks = tracker.get_object_track(video_frames,
-                                      read_from_stubs=True,
-                                      stub_path='stubs/track_stubs.pkl')
-    
-    # Add position to the track
-    tracker.add_position_to_track(tracks)
+    with profiler.stage('detect', frames=num_frames):
+        if use_stubs:
+            tracks = tracker.get_object_track(video_frames,
+                                              read_from_stubs=True,
+                                              stub_path='stubs/track_stubs.pkl')
+
+            # Columnar tracks so every stage below runs on whole arrays (still indexable like the nested dicts)
+            tracks = TrackTable.from_tracks(tracks)
+        else:
+            # The camera movement seeds the optical flow between keyframes when detecting with a stride
+            tracks = tracker.get_track_table(video_frames, video_path=video_path, cache=cache,
+                                             camera_movement_per_frame=camera_movement_per_frame)
+    if tracker.keyframe_stats['frames'] > 0: # Not when the tracks come from the cache
+        print(f"Detection on {tracker.keyframe_stats['keyframes']} of {tracker.keyframe_stats['frames']} frames")
+    if tracker.ball_roi and tracker.inference_engine is not None:
+        print(format_roi_stats(tracker.inference_engine.stats))
     
-    # Estimate camera movement
-    camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames,
-                                                                               read_from_stub=True,
-                                                                               stub_path='stubs/camera_movement_stub.pkl')
-    camera_movement_estimator.add_adjust_positions_to_trackers(tracks, camera_movement_per_frame)
+    with profiler.stage('positions', frames=num_frames):
+        # Add position to the track
+        tracker.add_position_to_track(tracks)
+
+        # Adjust the positions to the camera movement
+        camera_movement_estimator.add_adjust_positions_to_trackers(tracks, camera_movement_per_frame)
     
     # View Transformer
-    view_transformer = ViewTransformer()
-    view_transformer.add_transformed_position_to_tracks(tracks)
+    with profiler.stage('view_transform', frames=num_frames):
+        view_transformer = ViewTransformer.from_config(calibration_path) if calibration_path else ViewTransformer()
+        view_transformer.add_transformed_position_to_tracks(tracks)
 
     # Interpolate the ball position
-    tracks["ball"] = tracker.interpolate_ball_position(tracks["ball"])
+    with profiler.stage('interpolation', frames=num_frames):
+        tracks.interpolate_ball_position()
+
+    # Accuracy against full detection of the sample video (stubs), the ball of both interpolated
+    if detection_stride > 1 and not use_stubs and os.path.exists('stubs/track_stubs.pkl'):
+        with open('stubs/track_stubs.pkl', 'rb') as f:
+            full_detection_tracks = pickle.load(f)
+        full_detection_tracks['ball'] = tracker.interpolate_ball_position(full_detection_tracks['ball'])
+        print(format_track_comparison(compare_tracks(full_detection_tracks, tracks.to_tracks())))
     
     # Add speed and distance to the tracks
-    speed_and_distance_estimator = SpeedAndDistanceEstimator()
-    speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
+    with profiler.stage('speed', frames=num_frames):
+        speed_and_distance_estimator = SpeedAndDistanceEstimator(frame_rate=frame_rate, method='rolling')
+        speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
 
     # Assign player team
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(video_frames[0], tracks['players'][0]) # First frame
+    with profiler.stage('team', frames=num_frames):
+        # Online team model: the first frame fit keeps following the jersey colors over the match and
+        # players not seen for a while are forgotten, so memory does not grow with the match length
+        team_assigner = TeamAssigner(team_overrides=team_overrides, online=True)
+        team_assigner.assign_team_color(video_frames[0], tracks['players'][0]) # First frame
 
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num], track['bbox'], player_id)
-            tracks['players'][frame_num][player_id]['team'] = team
-            tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
+        for frame_num, player_track in enumerate(tracks['players']):
+            # New players and, on sampled frames, every visible player are classified together
+            frame_teams = team_assigner.get_frame_teams(video_frames[frame_num], player_track, frame_num)
+            for player_id, team in frame_teams.items():
+                player_track[player_id]['team'] = team
+                player_track[player_id]['team_color'] = team_assigner.team_colors[team]
 
 
+    # Player and team summary of the match
+    speed_summary = speed_and_distance_estimator.get_summary(tracks)
+    with open('output_videos/player_stats.json', 'w') as f:
+        json.dump(speed_summary, f, indent=2)
+    for team, team_summary in sorted(speed_summary['teams'].items()):
+        print(f"Team {team}: {team_summary['distance']:.0f} m covered, {team_summary['sprints']} sprints")
+
     # Assign ball to player
-    player_assigner = PlayerBallAssigner()
-    team_ball_control = []
-    for frame_num, player_track in enumerate(tracks['players']):
-        ball_bbox = tracks['ball'][frame_num][1]['bbox']
-        assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-        
-        if assigned_player != -1:  # No player assigned
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True
-            team_ball_control.append(tracks['players'][frame_num][assigned_player]['team'])
-        else:
-            team_ball_control.append(team_ball_control[-1])  # Keep the last team control
-    team_ball_control = np.array(team_ball_control)
+    with profiler.stage('possession', frames=num_frames):
+        # The holder keeps the ball until another player is switch_margin pixels closer, no flicker between neighbours
+        player_assigner = PlayerBallAssigner(switch_margin=switch_margin)
+        team_ball_control = player_assigner.assign_ball_to_tracks(tracks)
+        possession = PossessionStats.from_team_ball_control(team_ball_control, frame_rate=speed_and_distance_estimator.frame_rate)
+    possession.save_json('output_videos/possession.json')
+
+    # Tracks with their derived fields as Parquet, for the analytics (utils.read_tracks)
+    if export_tracks:
+        with TrackExporter('output_videos/tracks', metadata={"video": video_path, "fps": frame_rate}) as track_exporter:
+            track_exporter.append_tracks(tracks)
 
         
-    # Draw output
-    ## Draw object tracks
-    output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
+    if tracks_only:
+        # Overlay data for the player to draw over the source video, nothing is drawn or encoded
+        with profiler.stage('write', frames=num_frames):
+            frame_size = (video_frames[0].shape[1], video_frames[0].shape[0])
+            with OverlayWriter('output_videos/overlay.jsonl', frame_rate, frame_size, layers) as overlay_writer:
+                overlay_writer.write_video(tracks, possession, camera_movement_per_frame)
+    else:
+        # Draw output
+        ## All the layers in one pass, in place
+        with profiler.stage('draw', frames=num_frames):
+            renderer = FrameRenderer(layers)
+            output_video_frames = renderer.render_video(video_frames, tracks, possession, camera_movement_per_frame)
+
+        # Save the video at the frame rate of the input, in the container of the codec
+        with profiler.stage('write', frames=num_frames):
+            output_video_path = 'output_videos/output_video' + video_extension(encoder, encoder_params)
+            save_video(output_video_frames, output_video_path, frame_rate, encoder, **(encoder_params or {}))
 
-    ## Draw camera movement
-    output_video_frames = camera_movement_estimator.draw_camera_movement(output_video_frames, camera_movement_per_frame)
+    if cache is not None:
+        print(cache.format_stats())
 
-    ## Draw speed and distance
-    speed_and_distance_estimator.draw_speed_and_distance(output_video_frames, tracks)
+# Stage timings as JSON, a Chrome trace (chrome://tracing, Perfetto) and Prometheus metrics
+def save_profile(profiler, path_prefix='output_videos/profile'):
+    profiler.save_json(path_prefix + '.json')
+    profiler.save_chrome_trace(path_prefix + '_trace.json')
+    profiler.save_prometheus(path_prefix + '.prom')
+    print(profiler.format_stats())
 
-    # Save the video
-    save_video(output_video_frames, 'output_videos/output_video.avi')
+# Same stages as main() but frames are streamed so memory does not grow with the video length
+def main_streaming(calibration_path=None, layers=LAYERS, profiler=None, encoder='opencv', encoder_params=None, tracks_only=False, export_tracks=False,
+                   ball_roi_params=None, backend='ultralytics', backend_params=None, switch_margin=10, team_overrides=None):
+    os.makedirs('output_videos', exist_ok=True)
+    pipeline = StreamingPipeline('models/best.pt', calibration_path=calibration_path, layers=layers, profiler=profiler, ball_roi_params=ball_roi_params,
+                                 backend=backend, backend_params=backend_params, switch_margin=switch_margin,
+                                 team_assigner_params={'online': True, 'team_overrides': team_overrides})
+    tracks_path = 'output_videos/tracks' if export_tracks else None
+    if tracks_only:
+        pipeline.run('input_videos/08fd33_4.mp4', overlay_path='output_videos/overlay.jsonl', tracks_path=tracks_path)
+    else:
+        pipeline.run('input_videos/08fd33_4.mp4', 'output_videos/output_video' + video_extension(encoder, encoder_params),
+                     encoder=encoder, encoder_params=encoder_params, tracks_path=tracks_path)
+    pipeline.possession.save_json('output_videos/possession.json')
+    print(pipeline.format_io_stats())
+
+# Keep up with a live feed (URL or capture device): frames are dropped and detection skipped as needed
+def main_live(source, calibration_path=None, layers=LAYERS, latency_budget=None, throttle=False, profiler=None, export_tracks=False,
+              backend='ultralytics', backend_params=None, encoder='opencv', encoder_params=None, tracks_only=False, switch_margin=10, team_overrides=None):
+    os.makedirs('output_videos', exist_ok=True)
+    pipeline = LivePipeline('models/best.pt', latency_budget=latency_budget, calibration_path=calibration_path, layers=layers, profiler=profiler,
+                            backend=backend, backend_params=backend_params, switch_margin=switch_margin,
+                            team_assigner_params={'online': True, 'team_overrides': team_overrides})
+    tracks_path = 'output_videos/live_tracks' if export_tracks else None
+    try:
+        if tracks_only:
+            pipeline.run(source, throttle=throttle, overlay_path='output_videos/live_overlay.jsonl', tracks_path=tracks_path)
+        else:
+            pipeline.run(source, 'output_videos/live_output' + video_extension(encoder, encoder_params), throttle=throttle,
+                         encoder=encoder, encoder_params=encoder_params, tracks_path=tracks_path)
+    except KeyboardInterrupt:
+        pass
+    print(pipeline.format_live_stats())
+
+# Every video of a directory or manifest, several at a time on worker processes that each load the model once
+def main_batch(source, output_dir='output_videos/batch', num_workers=None, model_path='models/best.pt', layers=LAYERS, resume=True, ball_roi_params=None,
+               backend='ultralytics', backend_params=None, encoder='opencv', encoder_params=None, tracks_only=False, switch_margin=10, team_overrides=None):
+    runner = BatchRunner(model_path, output_dir, num_workers,
+                         pipeline_params={'layers': layers, 'ball_roi_params': ball_roi_params, 'backend': backend, 'backend_params': backend_params,
+                                          'switch_margin': switch_margin, 'team_assigner_params': {'online': True, 'team_overrides': team_overrides}},
+                         output_params={'encoder': encoder, 'encoder_params': encoder_params, 'tracks_only': tracks_only})
+    jobs = load_batch(source)
+    on_result = lambda name, result: print(f"{name}: {result['status']} in {result.get('seconds', 0):.1f}s")
+    progress = runner.run(jobs, resume=resume, on_result=on_result)
+    print(format_batch_progress(progress, runner.elapsed, runner.processed))
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stream', action='store_true', help='Process the video frame by frame instead of loading it fully')
+    parser.add_argument('--calibration', default=None, help='JSON file with the pitch calibration polygons of the stadium')
+    parser.add_argument('--camera-workers', type=int, default=1, help='Processes used to estimate the camera movement')
+    parser.add_argument('--use-stubs', action='store_true', help='Read the tracks and camera movement from the pickled stubs instead of the cache')
+    parser.add_argument('--cache-dir', default='cache', help='Directory of the pipeline cache')
+    parser.add_argument('--live', default=None, help='Live source to follow in real time: RTSP/HTTP URL, capture device index or a file')
+    parser.add_argument('--latency-budget', type=float, default=None, help='Seconds per frame before detection is skipped in live mode (default: one frame interval)')
+    parser.add_argument('--throttle', action='store_true', help='In live mode read a file at its frame rate, like a live feed')
+    parser.add_argument('--detection-stride', type=int, default=1, help='Run the detector every K frames (and on scene changes), optical flow in between')
+    parser.add_argument('--batch', default=None, help='Directory of videos (calibration in <video name>.json) or JSON manifest to process on a process pool')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes in batch mode (default: one per core)')
+    parser.add_argument('--model', default='models/best.pt', help='YOLO weights used in batch mode')
+    parser.add_argument('--output-dir', default='output_videos/batch', help='Output directory of batch mode, one subdirectory per video')
+    parser.add_argument('--no-resume', action='store_true', help='In batch mode process again the videos already done')
+    parser.add_argument('--profile', action='store_true', help='Time every stage, written to output_videos/profile.json, profile_trace.json and profile.prom')
+    parser.add_argument('--profile-memory', action='store_true', help='Also record the peak memory and allocations of every stage (slow)')
+    parser.add_argument('--encoder', default='opencv', choices=list(ENCODERS), help='Video encoder: opencv (XVID AVI) or ffmpeg (raw frames piped to an ffmpeg process, MP4 or WebM for VP8/VP9)')
+    parser.add_argument('--codec', default='libx264', help='ffmpeg video codec, e.g. libx264, libx265, h264_nvenc, h264_qsv')
+    parser.add_argument('--preset', default='veryfast', help='ffmpeg encoder preset (libx264, libx265 and nvenc codecs)')
+    parser.add_argument('--crf', type=int, default=23, help='ffmpeg constant rate factor (libx264 and libx265)')
+    parser.add_argument('--tracks-only', action='store_true', help='Write the overlay data (output_videos/overlay.jsonl, live_overlay.jsonl, overlay.jsonl per batch video) instead of drawing and encoding the video')
+    parser.add_argument('--export-tracks', action='store_true', help='Export the tracks and their derived fields as Parquet to output_videos/tracks, live_tracks in live mode (needs pyarrow)')
+    parser.add_argument('--ball-roi', action='store_true', help='Two-tier detection: low resolution full frames, then a full resolution crop around the ball')
+    parser.add_argument('--roi-imgsz', type=int, default=480, help='Model input size of the full frames in two-tier detection')
+    parser.add_argument('--roi-crop-size', type=int, default=256, help='Size in pixels of the crop around the ball in two-tier detection')
+    parser.add_argument('--backend', default='ultralytics', choices=list(DETECTOR_BACKENDS),
+                        help='Detector: ultralytics, or the ONNX export of the model (models/best.onnx) on ONNX Runtime or OpenVINO')
+    parser.add_argument('--precision', default='fp32', choices=['fp32', 'fp16', 'int8'], help='Precision of the ONNX detector')
+    parser.add_argument('--threads', type=int, default=None, help='Inference threads of the ONNX detector (default: all the cores)')
+    parser.add_argument('--switch-margin', type=float, default=10, help='Pixels another player must be closer to the ball than its holder to take it (0: always the nearest player)')
+    parser.add_argument('--team-override', action='append', default=[], type=parse_team_override, metavar='PLAYER_ID:TEAM_ID',
+                        help='Team of a player the jersey colors get wrong, e.g. a goalkeeper (repeatable, team 1 or 2)')
+    parser.add_argument('--layers', default=','.join(LAYERS), help=f'Comma separated annotation layers to draw ({", ".join(LAYERS)})')
+    args = parser.parse_args()
+    layers = [layer for layer in args.layers.split(',') if layer]
+    encoder_params = {'codec': args.codec, 'preset': args.preset, 'crf': args.crf} if args.encoder == 'ffmpeg' else None
+    ball_roi_params = {'imgsz': args.roi_imgsz, 'crop_size': args.roi_crop_size} if args.ball_roi else None
+    backend_params = {'precision': args.precision, 'num_threads': args.threads} if args.backend != 'ultralytics' else None
+    team_overrides = dict(args.team_override)
+
+    profiler = StageProfiler(trace_memory=args.profile_memory) if args.profile or args.profile_memory else None
+
+    if args.batch is not None:
+        main_batch(args.batch, args.output_dir, args.workers, args.model, layers, not args.no_resume, ball_roi_params, args.backend, backend_params,
+                   args.encoder, encoder_params, args.tracks_only, args.switch_margin, team_overrides)
+    elif args.live is not None:
+        main_live(args.live, args.calibration, layers, args.latency_budget, args.throttle, profiler, args.export_tracks, args.backend, backend_params,
+                  args.encoder, encoder_params, args.tracks_only, args.switch_margin, team_overrides)
+    elif args.stream:
+        main_streaming(args.calibration, layers, profiler, args.encoder, encoder_params, args.tracks_only, args.export_tracks, ball_roi_params,
+                       args.backend, backend_params, args.switch_margin, team_overrides)
+    else:
+        main(args.calibration, args.camera_workers, args.use_stubs, args.cache_dir, layers, args.detection_stride, profiler,
+             args.encoder, encoder_params, args.tracks_only, args.export_tracks, ball_roi_params, args.backend, backend_params, args.switch_margin,
+             team_overrides)
+
+    if profiler is not None:
+        save_profile(profiler)
@@ -0,0 +1,3 @@
+from .streaming_pipeline import StreamingPipeline
+from .live_pipeline import LivePipeline
+from .batch_runner import BatchRunner, load_batch, format_batch_progress
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import glob
+import json
+import os
+import time
+import traceback
+import cv2
+from utils import video_extension
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+
+# Videos of a batch as [{"video": path, "calibration": path or None, "name": output name}].
+# source is either a directory (every video in it, with the calibration <video name>.json next to it
+# if there is one) or a JSON manifest: [{"video": ..., "calibration": ..., "name": ...}, ...] with
+# paths relative to the manifest.
+def load_batch(source):
+    if os.path.isdir(source):
+        jobs = []
+        for video_path in sorted(glob.glob(os.path.join(source, '*'))):
+            stem, extension = os.path.splitext(video_path)
+            if extension.lower() not in VIDEO_EXTENSIONS:
+                continue
+            calibration_path = stem + '.json'
+            jobs.append({"video": video_path, "calibration": calibration_path if os.path.exists(calibration_path) else None})
+    else:
+        with open(source) as f:
+            entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(source))
+        jobs = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"video": entry}
+            calibration_path = entry.get("calibration")
+            jobs.append({
+                "video": os.path.join(base_dir, entry["video"]),
+                "calibration": os.path.join(base_dir, calibration_path) if calibration_path else None,
+                "name": entry.get("name"),
+            })
+
+    for job in jobs:
+        if not job.get("name"):
+            job["name"] = os.path.splitext(os.path.basename(job["video"]))[0]
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate video names in batch: {', '.join(duplicates)}")
+    return jobs
+
+# Pipeline of the worker process, built once by init_worker so the model is loaded once per worker
+worker_pipeline = None
+
+def init_worker(model_path, pipeline_params, threads_per_worker):
+    global worker_pipeline
+    from .streaming_pipeline import StreamingPipeline
+
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    if pipeline_params.get('backend', 'ultralytics') != 'ultralytics':
+        # The ONNX runtimes take all the cores unless told otherwise, an unset thread count means the worker's share
+        backend_params = dict(pipeline_params.get('backend_params') or {})
+        backend_params['num_threads'] = backend_params.get('num_threads') or threads_per_worker
+        pipeline_params = dict(pipeline_params, backend_params=backend_params)
+    worker_pipeline = StreamingPipeline(model_path, **pipeline_params)
+    worker_pipeline.tracker.load_model()
+
+# Run one video in a worker. Errors are returned rather than raised so one bad video does not stop the batch.
+# output_params: encoder and encoder_params of the video, or tracks_only to write the overlay data instead
+def process_video(job, output_dir, output_params=None):
+    start = time.perf_counter()
+    output_params = output_params or {}
+    encoder = output_params.get('encoder', 'opencv')
+    encoder_params = output_params.get('encoder_params')
+    video_output_dir = os.path.join(output_dir, job["name"])
+    os.makedirs(video_output_dir, exist_ok=True)
+    if output_params.get('tracks_only', False):
+        output_name, extension = 'overlay', '.jsonl'
+    else:
+        output_name, extension = 'output_video', video_extension(encoder, encoder_params)
+    output_path = os.path.join(video_output_dir, output_name + extension)
+    tmp_path = os.path.join(video_output_dir, output_name + '.tmp' + extension)
+    try:
+        worker_pipeline.reset(job["calibration"])
+        if output_params.get('tracks_only', False):
+            io_stats = worker_pipeline.run(job["video"], overlay_path=tmp_path)
+        else:
+            io_stats = worker_pipeline.run(job["video"], tmp_path, encoder=encoder, encoder_params=encoder_params)
+        if worker_pipeline.frame_count == 0:
+            raise ValueError(f"No frames could be read from {job['video']}")
+        worker_pipeline.possession.save_json(os.path.join(video_output_dir, 'possession.json'))
+        # Only a finished output gets its final name
+        os.replace(tmp_path, output_path)
+    except Exception:
+        return {
+            "status": "failed",
+            "error": traceback.format_exc(),
+            "seconds": time.perf_counter() - start,
+            "pid": os.getpid(),
+        }
+
+    seconds = time.perf_counter() - start
+    return {
+        "status": "done",
+        "output": output_path,
+        "frames": worker_pipeline.frame_count,
+        "seconds": seconds,
+        "fps": worker_pipeline.frame_count / seconds if seconds > 0 else 0.0,
+        "read_wait": io_stats["read"]["consumer_wait"],
+        "write_wait": io_stats["write"]["producer_wait"],
+        "pid": os.getpid(),
+    }
+
+# Runs the StreamingPipeline on many videos across a pool of worker processes.
+# Progress is kept in <output_dir>/batch_progress.json after every video: a rerun skips the videos
+# already done, so an interrupted batch resumes where it stopped and failed videos are retried.
+class BatchRunner:
+    # pipeline_params are passed to StreamingPipeline (detection_batch_size, layers, ...)
+    # output_params: encoder and encoder_params of the output videos (see utils.ENCODERS), or tracks_only
+    # to write the overlay data of every video instead of drawing and encoding it
+    def __init__(self, model_path, output_dir='output_videos/batch', num_workers=None, pipeline_params=None, output_params=None):
+        self.model_path = model_path
+        self.output_dir = output_dir
+        self.num_workers = num_workers or os.cpu_count()
+        self.pipeline_params = pipeline_params or {}
+        self.output_params = output_params or {}
+        self.progress_path = os.path.join(output_dir, 'batch_progress.json')
+
+    def load_progress(self):
+        if not os.path.exists(self.progress_path):
+            return {}
+        with open(self.progress_path) as f:
+            return json.load(f)
+
+    def save_progress(self, progress):
+        tmp_path = self.progress_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f, indent=2)
+        os.replace(tmp_path, self.progress_path)
+
+    # on_result(name, result) is called as every video finishes. Returns the progress of the whole batch.
+    def run(self, jobs, resume=True, on_result=None):
+        os.makedirs(self.output_dir, exist_ok=True)
+        progress = self.load_progress() if resume else {}
+        jobs = [job for job in jobs if not self.is_done(progress.get(job["name"]))]
+        self.processed = [job["name"] for job in jobs]
+        self.elapsed = 0.0
+        if not jobs:
+            return progress
+
+        start = time.perf_counter()
+        num_workers = min(self.num_workers, len(jobs))
+        threads_per_worker = max(1, os.cpu_count() // num_workers)
+
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker,
+                                 initargs=(self.model_path, self.pipeline_params, threads_per_worker)) as executor:
+            futures = {executor.submit(process_video, job, self.output_dir, self.output_params): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died (out of memory, crash in native code), the videos left are retried on the next run
+                    result = {"status": "failed", "error": "Worker process died"}
+                result.update(video=job["video"], calibration=job["calibration"])
+                progress[job["name"]] = result
+                self.save_progress(progress)
+                if on_result is not None:
+                    on_result(job["name"], result)
+
+        self.elapsed = time.perf_counter() - start
+        return progress
+
+    def is_done(self, result):
+        return result is not None and result["status"] == "done" and os.path.exists(result["output"])
+
+# processed: names of the videos run this time (BatchRunner.processed), their throughput over elapsed seconds
+def format_batch_progress(progress, elapsed=None, processed=None):
+    done = [result for result in progress.values() if result["status"] == "done"]
+    failed = [name for name, result in progress.items() if result["status"] != "done"]
+    frames = sum(result["frames"] for result in done)
+    lines = [f"Batch:  {len(done)} done, {len(failed)} failed, {frames} frames"]
+    if elapsed and processed:
+        run_frames = sum(progress[name].get("frames", 0) for name in processed)
+        lines.append(f"Time:   {len(processed)} videos in {elapsed:.1f}s, {run_frames / elapsed:.1f} fps over all workers")
+    if failed:
+        lines.append(f"Failed: {', '.join(failed)}")
+    return "\n".join(lines)
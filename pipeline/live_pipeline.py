@@ -0,0 +1,105 @@
+from collections import deque
+from itertools import islice
+import time
+import numpy as np
+from utils import LiveVideoReader, ThreadedVideoWriter
+from trackers import TrackPredictor
+from renderer import OverlayWriter
+from .streaming_pipeline import StreamingPipeline
+
+# Streaming pipeline on a live source (RTSP/HTTP URL or capture device) that has to keep up with it.
+# - The capture thread only keeps the newest frames, the frames the pipeline is too slow for are dropped
+# - Detection is skipped on the frames that would go over the per-frame latency budget, their boxes are
+#   predicted from the last tracks instead (at most max_skipped frames in a row)
+# - The look-ahead is short (max_ball_gap frames) since every frame held back adds to the latency
+class LivePipeline(StreamingPipeline):
+    # latency_budget: seconds a frame may take from capture until its tracks are ready, one frame
+    # interval of the source by default. The other parameters are the ones of StreamingPipeline.
+    def __init__(self, model_path, latency_budget=None, max_skipped=4, capture_queue_size=2, max_ball_gap=5, **kwargs):
+        super().__init__(model_path, max_ball_gap=max_ball_gap, **kwargs)
+        self.latency_budget = latency_budget
+        self.max_skipped = max_skipped
+        self.capture_queue_size = capture_queue_size
+        self.detection_time = 0.0 # Moving average of the detection time of a frame
+
+    # Annotated frames are written to output_video_path (if given, with encoder and encoder_params like
+    # StreamingPipeline.run) and passed to on_frame(frame). Without either the frames are not drawn.
+    # throttle reads a file at its frame rate, as a stand-in for a live feed.
+    # overlay_path writes the overlay data as JSON lines (see OverlayWriter).
+    # tracks_path exports the tracks as they are settled, in Parquet parts of tracks_chunk_seconds of video
+    # that dashboards can query during the match (see TrackExporter).
+    def run(self, source, output_video_path=None, on_frame=None, max_frames=None, throttle=False, tracks_path=None, tracks_chunk_seconds=5,
+            encoder='opencv', encoder_params=None, overlay_path=None):
+        start = time.perf_counter()
+        self.predictor = TrackPredictor()
+        self.capture_times = deque()
+        self.stats = {"processed": 0, "detected": 0, "predicted": 0, "latencies": deque(maxlen=10000)}
+
+        with LiveVideoReader(source, self.capture_queue_size, throttle) as reader:
+            self.source_fps = reader.fps
+            self.frame_budget = self.latency_budget if self.latency_budget is not None else 1 / reader.fps
+            self.speed_and_distance_estimator.frame_rate = reader.fps
+
+            self.draw = output_video_path is not None or on_frame is not None
+            writer = ThreadedVideoWriter(output_video_path, fps=reader.fps, encoder=encoder, encoder_params=encoder_params) if output_video_path is not None else None
+            self.overlay_writer = OverlayWriter(overlay_path, reader.fps, layers=self.layers) if overlay_path is not None else None
+            self.track_exporter = self.open_track_exporter(tracks_path, max(int(round(tracks_chunk_seconds * reader.fps)), 1), source, reader.fps)
+            try:
+                for frame in islice(self.process(reader), max_frames):
+                    self.stats["latencies"].append(time.perf_counter() - self.capture_times.popleft())
+                    self.stats["processed"] += 1
+                    if writer is not None:
+                        with self.profiler.stage('write'):
+                            writer.write(frame)
+                    if on_frame is not None:
+                        on_frame(frame)
+            finally:
+                # Also when interrupted, a live feed usually ends with Ctrl+C
+                if writer is not None:
+                    writer.close()
+                if self.overlay_writer is not None:
+                    self.overlay_writer.close()
+                    self.overlay_writer = None
+                if self.track_exporter is not None:
+                    self.track_exporter.close()
+                    self.track_exporter = None
+                self.draw = True
+                self.stats["captured"] = reader.stats["captured"]
+                self.stats["dropped"] = reader.stats["dropped"]
+                self.stats["elapsed"] = time.perf_counter() - start
+
+        return self.stats
+
+    # frames: (frame, capture_time) from LiveVideoReader
+    def iter_frame_tracks(self, frames):
+        skipped = 0
+        for frame_num, (frame, capture_time) in enumerate(frames):
+            self.capture_times.append(capture_time)
+
+            # Detect unless the frame would miss its budget, and only predict from a recent detection
+            age = time.perf_counter() - capture_time
+            if self.stats["detected"] > 0 and skipped < self.max_skipped and age + self.detection_time > self.frame_budget:
+                frame_tracks = self.predictor.predict()
+                self.stats["predicted"] += 1
+                skipped += 1
+            else:
+                detection_start = time.perf_counter()
+                frame_tracks = self.tracker.detect_frame_tracks(frame, frame_num)
+                elapsed = time.perf_counter() - detection_start
+                self.detection_time = elapsed if self.stats["detected"] == 0 else 0.8 * self.detection_time + 0.2 * elapsed
+                self.predictor.update(frame_tracks)
+                self.stats["detected"] += 1
+                skipped = 0
+
+            yield frame, frame_tracks
+
+    def format_live_stats(self):
+        stats = self.stats
+        latencies = np.array(stats["latencies"]) * 1000 if stats["latencies"] else np.zeros(1)
+        fps = stats["processed"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+        return "\n".join([
+            f"Live:      {stats['processed']} frames at {fps:.1f} fps (source {self.source_fps:.1f} fps), "
+            f"{stats['captured']} captured, {stats['dropped']} dropped",
+            f"Detection: {stats['detected']} detected, {stats['predicted']} predicted, {self.detection_time * 1000:.1f} ms per detection",
+            f"Latency:   p50 {np.percentile(latencies, 50):.0f} ms, p95 {np.percentile(latencies, 95):.0f} ms, max {latencies.max():.0f} ms",
+        ])
@@ -0,0 +1,240 @@
+from collections import deque
+from itertools import islice
+import time
+from utils import ThreadedVideoReader, ThreadedVideoWriter, TrackExporter, format_io_stats, get_video_fps, get_video_size, StageProfiler
+from trackers import Tracker, BallGapFiller
+from team_assigner import TeamAssigner
+from player_ball_assigner import PlayerBallAssigner, PossessionStats
+from camera_movement_estimator import CameraMovementEstimator
+from view_transformer import ViewTransformer
+from speed_and_distance_estimator import SpeedAndDistanceEstimator
+from renderer import FrameRenderer, OverlayWriter, LAYERS
+
+# Runs decode -> detect/track -> camera movement -> annotate -> encode one frame at a time.
+# Only the frames needed for the ball interpolation and speed look-ahead are kept in memory.
+class StreamingPipeline:
+    # detection_batch_size is the starting YOLO batch size, adapted to the measured throughput
+    # camera_movement_params are passed to CameraMovementEstimator (mode, pyramid_level, min_features)
+    # max_ball_jump rejects ball detections moving more pixels per frame than that (None keeps them all)
+    # team_assigner_params are passed to TeamAssigner (online team model by default, long streams drift)
+    # layers are the annotation layers drawn (see renderer.LAYERS)
+    # profiler (StageProfiler) times every stage of every frame, nothing is measured by default
+    # ball_roi_params turn on the two-tier ball detection of the Tracker (imgsz, crop_size, ...)
+    # backend and backend_params choose the detector (see Tracker)
+    # switch_margin is the ball possession hysteresis in pixels (see PlayerBallAssigner)
+    def __init__(self, model_path, detection_batch_size=20, max_ball_gap=48, calibration_path=None, camera_movement_params=None, max_ball_jump=None,
+                 team_assigner_params=None, layers=LAYERS, profiler=None, ball_roi_params=None, backend='ultralytics', backend_params=None,
+                 switch_margin=10):
+        self.profiler = profiler if profiler is not None else StageProfiler(enabled=False)
+        self.tracker = Tracker(model_path, batch_size=detection_batch_size, ball_roi=ball_roi_params is not None, ball_roi_params=ball_roi_params,
+                               backend=backend, backend_params=backend_params)
+        self.tracker.profiler = self.profiler
+        self.speed_and_distance_estimator = SpeedAndDistanceEstimator(method='rolling')
+        self.team_assigner_params = team_assigner_params if team_assigner_params is not None else {'online': True}
+        self.renderer = FrameRenderer(layers)
+        self.layers = layers
+        self.draw = True # Annotate the frames
+        self.overlay_writer = None # OverlayWriter of the overlay data, set by run()
+        self.track_exporter = None # TrackExporter of the tracks, set by run()
+        self.camera_movement_params = camera_movement_params or {}
+        self.switch_margin = switch_margin
+        self.reset(calibration_path)
+
+        self.max_ball_gap = max_ball_gap # Longest gap in frames that the ball is interpolated over
+        self.max_ball_jump = max_ball_jump
+
+        # Number of frames held back before a frame is annotated. The speeds are the ones of the whole video
+        # (main) when it covers stream_horizon, a shorter look-ahead (live) shortens the windows at the start
+        # of a track.
+        self.lookahead = max(self.max_ball_gap, self.speed_and_distance_estimator.frame_window)
+
+    # Forget the previous video (track ids, team colors, camera) before running on another one, the model stays loaded
+    def reset(self, calibration_path=None):
+        self.tracker.reset_tracking()
+        self.view_transformer = ViewTransformer.from_config(calibration_path) if calibration_path else ViewTransformer()
+        self.team_assigner = TeamAssigner(**self.team_assigner_params)
+        self.player_assigner = PlayerBallAssigner(switch_margin=self.switch_margin)
+        self.camera_movement_estimator = None # Created from the first frame
+
+    # Decoding and encoding run on background threads so they overlap with the pipeline.
+    # The video is encoded at the frame rate of the input with encoder (see utils.ENCODERS) and its encoder_params.
+    # overlay_path also writes the overlay data as JSON lines (see OverlayWriter). Without output_video_path the
+    # frames are neither drawn nor encoded, only the overlay data is written (tracks-only).
+    # tracks_path exports the tracks as Parquet parts of tracks_chunk_frames frames (see TrackExporter),
+    # readable while the video is processed.
+    def run(self, video_path, output_video_path=None, queue_size=32, encoder='opencv', encoder_params=None, overlay_path=None,
+            tracks_path=None, tracks_chunk_frames=1000):
+        if output_video_path is None and overlay_path is None and tracks_path is None:
+            raise ValueError("One of output_video_path, overlay_path or tracks_path is needed")
+        start = time.perf_counter()
+        fps = get_video_fps(video_path)
+        self.speed_and_distance_estimator.frame_rate = fps
+        self.draw = output_video_path is not None
+        writer = ThreadedVideoWriter(output_video_path, fps, queue_size=queue_size, encoder=encoder, encoder_params=encoder_params) if self.draw else None
+        self.overlay_writer = OverlayWriter(overlay_path, fps, get_video_size(video_path), self.layers) if overlay_path is not None else None
+        self.track_exporter = self.open_track_exporter(tracks_path, tracks_chunk_frames, video_path, fps)
+        try:
+            with ThreadedVideoReader(video_path, queue_size) as reader:
+                for frame in self.process(self.profiler.iter_stage('read', reader)):
+                    if writer is not None:
+                        with self.profiler.stage('write'):
+                            writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+            if self.overlay_writer is not None:
+                self.overlay_writer.close()
+                self.overlay_writer = None
+            if self.track_exporter is not None:
+                self.track_exporter.close()
+                self.track_exporter = None
+            self.draw = True
+
+        self.io_stats = {
+            "read": reader.stats,
+            "write": writer.stats if writer is not None else {"frames": 0, "encode": 0.0, "producer_wait": 0.0, "consumer_wait": 0.0},
+            "total": time.perf_counter() - start,
+        }
+        return self.io_stats
+
+    def open_track_exporter(self, tracks_path, chunk_frames, source, fps):
+        if tracks_path is None:
+            return None
+        return TrackExporter(tracks_path, chunk_frames=chunk_frames, metadata={"video": str(source), "fps": fps})
+
+    def format_io_stats(self):
+        return format_io_stats(self.io_stats["read"], self.io_stats["write"], self.io_stats["total"])
+
+    # Generator of annotated frames from an iterable of frames
+    def process(self, frames):
+        self.frame_count = 0
+        self.ball_gap_filler = BallGapFiller(self.max_ball_gap, self.max_ball_jump)
+        self.speed_and_distance_estimator.reset_stream()
+        self.team_ball_control = 0 # Team of the last player with the ball
+        self.possession = PossessionStats(frame_rate=self.speed_and_distance_estimator.frame_rate)
+        pending = deque()
+
+        for frame, frame_tracks in self.profiler.iter_stage('detect', self.iter_frame_tracks(frames)):
+            entry = self.prepare_frame(frame, frame_tracks)
+            pending.append(entry)
+
+            with self.profiler.stage('interpolation'):
+                ball = frame_tracks["ball"]
+                self.fill_ball(pending, self.ball_gap_filler.push(entry["frame_num"], ball[1]["bbox"] if 1 in ball else None))
+
+            while len(pending) > self.lookahead:
+                yield self.finish_frame(pending)
+
+        with self.profiler.stage('interpolation', frames=0):
+            self.fill_ball(pending, self.ball_gap_filler.flush())
+        while pending:
+            yield self.finish_frame(pending)
+
+    # (frame, frame_tracks) of every frame, detected in batches
+    def iter_frame_tracks(self, frames):
+        return self.tracker.iter_frame_tracks(frames)
+
+    # Per-frame stages that do not need any look-ahead
+    def prepare_frame(self, frame, frame_tracks):
+        # Single-frame view of the tracks so the existing stages can be reused as is
+        frame_slice = {object: [object_track] for object, object_track in frame_tracks.items()}
+
+        with self.profiler.stage('camera_motion'):
+            if self.camera_movement_estimator is None:
+                self.camera_movement_estimator = CameraMovementEstimator(frame, **self.camera_movement_params)
+            if self.frame_count == 0:
+                self.camera_movement_estimator.reset_stream(frame)
+                camera_movement = [0, 0]
+            else:
+                camera_movement = self.camera_movement_estimator.get_frame_camera_movement(frame)
+
+        with self.profiler.stage('positions'):
+            self.tracker.add_position_to_track(frame_slice)
+            self.camera_movement_estimator.add_adjust_positions_to_trackers(frame_slice, [camera_movement])
+
+        with self.profiler.stage('view_transform'):
+            self.view_transformer.add_transformed_position_to_tracks(frame_slice)
+
+        entry = {
+            "frame_num": self.frame_count,
+            "frame": frame,
+            "tracks": frame_tracks,
+            "camera_movement": camera_movement,
+        }
+        self.frame_count += 1
+
+        return entry
+
+    # Stages that need the look-ahead, then draw the oldest pending frame
+    def finish_frame(self, pending):
+        entry = pending[0]
+        frame_num = entry["frame_num"]
+        frame = entry["frame"]
+        tracks = entry["tracks"]
+
+        # Rolling speed from the previous frames and the pending ones
+        with self.profiler.stage('speed'):
+            horizon = self.speed_and_distance_estimator.stream_horizon
+            next_player_tracks = [e["tracks"]["players"] for e in islice(pending, 1, horizon + 1)]
+            self.speed_and_distance_estimator.add_speed_and_distance_to_frame(frame_num, tracks["players"], next_player_tracks)
+
+        pending.popleft()
+
+        # Assign player team (the team colors come from the first frame with enough players)
+        with self.profiler.stage('team'):
+            if not self.team_assigner.team_colors and len(tracks["players"]) >= 2:
+                self.team_assigner.assign_team_color(frame, tracks["players"])
+
+            if self.team_assigner.team_colors:
+                frame_teams = self.team_assigner.get_frame_teams(frame, tracks["players"], frame_num)
+                for player_id, team in frame_teams.items():
+                    tracks["players"][player_id]['team'] = team
+                    tracks["players"][player_id]['team_color'] = self.team_assigner.team_colors[team]
+
+        # Assign ball to player
+        with self.profiler.stage('possession'):
+            team = self.team_ball_control # Keep the last team control
+            if 1 in tracks["ball"]:
+                assigned_player = self.player_assigner.assign_ball_to_player(tracks["players"], tracks["ball"][1]['bbox'])
+                if assigned_player != -1:
+                    tracks["players"][assigned_player]['has_ball'] = True
+                    team = tracks["players"][assigned_player].get('team', team)
+            self.team_ball_control = team
+            self.possession.append(team)
+
+        # Draw output
+        if self.draw:
+            with self.profiler.stage('draw'):
+                self.renderer.render(frame,
+                                     frame_num,
+                                     tracks["players"],
+                                     tracks["referees"],
+                                     tracks["ball"],
+                                     self.possession,
+                                     entry["camera_movement"])
+        if self.overlay_writer is not None:
+            with self.profiler.stage('write'):
+                self.overlay_writer.write(frame_num,
+                                          tracks["players"],
+                                          tracks["referees"],
+                                          tracks["ball"],
+                                          self.possession,
+                                          entry["camera_movement"])
+        if self.track_exporter is not None:
+            with self.profiler.stage('write'):
+                self.track_exporter.append_frame(frame_num, tracks)
+
+        return frame
+
+    # Write the ball positions settled by the gap filler into their pending frames.
+    # The filler settles a frame at most max_ball_gap frames later, always before the frame leaves the look-ahead.
+    def fill_ball(self, pending, filled_balls):
+        if not filled_balls:
+            return
+        first_frame_num = pending[0]["frame_num"]
+        for frame_num, bbox in filled_balls:
+            ball = pending[frame_num - first_frame_num]["tracks"]["ball"]
+            if bbox is None:
+                ball.pop(1, None)
+            elif ball.get(1, {}).get("bbox") != bbox:
+                ball[1] = {"bbox": bbox}
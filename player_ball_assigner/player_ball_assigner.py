@@ -1,16 +1,20 @@
-import sys
-sys.path.append('../')
+import numpy as np
 from utils import get_center_of_bbox, measure_distance
 
 class PlayerBallAssigner:
-    def __init__(self):
+    # switch_margin: another player only takes the ball from the current holder (still in range) when
+    # that many pixels closer, 0 keeps the plain nearest player rule
+    def __init__(self, switch_margin=0):
         self.max_player_ball_distance = 70
+        self.switch_margin = switch_margin
+        self.holder_id = -1 # Last player assign_ball_to_player gave the ball to, for the switch margin
 
     def assign_ball_to_player(self, players, ball_bbox):
         ball_position = get_center_of_bbox(ball_bbox)
 
         minimum_distance = 99999
         assigned_player = -1
+        holder_distance = None
 
         for player_id, player in players.items():
             player_bbox = player['bbox']
@@ -23,6 +27,140 @@ class PlayerBallAssigner:
                 if distance < minimum_distance:
                     minimum_distance = distance
                     assigned_player = player_id
+                if player_id == self.holder_id:
+                    holder_distance = distance
+
+        # The holder keeps the ball unless someone else is switch_margin pixels closer (frame by frame
+        # like assign_with_hysteresis)
+        if self.switch_margin > 0 and holder_distance is not None and minimum_distance > holder_distance - self.switch_margin:
+            assigned_player = self.holder_id
+        if assigned_player != -1:
+            self.holder_id = assigned_player
 
         return assigned_player
 
+    # Ball holder of every frame of the video in one pass.
+    # player_frames, player_ids (M,), player_bboxes (M,4): every player detection of the video
+    # ball_centers (num_frames,2): ball center per frame, NaN without a ball
+    # Returns the player row (index into the player arrays) holding the ball in each frame, -1 for none.
+    # method 'grid' only measures the players in the grid cells around the ball, for frames far more crowded
+    # than a match: sorting the cells costs more than measuring every player at 40 objects per frame.
+    def assign_ball_to_players(self, player_frames, player_ids, player_bboxes, ball_centers, method='brute'):
+        player_frames = np.asarray(player_frames)
+        player_ids = np.asarray(player_ids)
+        player_bboxes = np.asarray(player_bboxes, dtype=np.float64).reshape(-1, 4)
+        ball_centers = np.asarray(ball_centers, dtype=np.float64).reshape(-1, 2)
+
+        if method == 'grid':
+            candidate_rows = self.grid_candidates(player_frames, player_bboxes, ball_centers)
+        elif method == 'brute':
+            candidate_rows = np.arange(len(player_frames))
+        else:
+            raise ValueError(f"Unknown assignment method: {method}")
+
+        distances = self.foot_distances(player_bboxes[candidate_rows], ball_centers[player_frames[candidate_rows]])
+        in_range = distances < self.max_player_ball_distance
+        candidate_rows, distances = candidate_rows[in_range], distances[in_range]
+
+        assigned_rows = np.full(len(ball_centers), -1, dtype=np.int64)
+        if self.switch_margin > 0:
+            return self.assign_with_hysteresis(player_frames, player_ids, candidate_rows, distances, assigned_rows)
+
+        # Nearest player per frame, the first one listed wins a tie like in assign_ball_to_player
+        order = np.lexsort((candidate_rows, distances, player_frames[candidate_rows]))
+        frames_in_order = player_frames[candidate_rows[order]]
+        is_first = np.r_[True, frames_in_order[1:] != frames_in_order[:-1]]
+        assigned_rows[frames_in_order[is_first]] = candidate_rows[order[is_first]]
+
+        return assigned_rows
+
+    # Distance from the ball to the nearest bottom corner (feet) of each player bbox
+    def foot_distances(self, player_bboxes, ball_centers):
+        distance_left = np.hypot(player_bboxes[:, 0] - ball_centers[:, 0], player_bboxes[:, 3] - ball_centers[:, 1])
+        distance_right = np.hypot(player_bboxes[:, 2] - ball_centers[:, 0], player_bboxes[:, 3] - ball_centers[:, 1])
+        distances = np.minimum(distance_left, distance_right)
+        return np.where(np.isnan(distances), np.inf, distances)
+
+    # Rows of the players with a foot corner in the grid cell of the ball or one of its 8 neighbours. The cells
+    # are max_player_ball_distance wide, so every player in range of the ball is among them. Each foot corner
+    # is bucketed under its (frame, cell) key, sorted once, and the 9 cells around each ball are looked up
+    # with searchsorted.
+    def grid_candidates(self, player_frames, player_bboxes, ball_centers):
+        cell_size = self.max_player_ball_distance
+        corners = np.concatenate([player_bboxes[:, [0, 3]], player_bboxes[:, [2, 3]]])
+        corner_rows = np.tile(np.arange(len(player_frames)), 2)
+        keys = grid_cell_keys(np.tile(player_frames, 2), np.floor(corners / cell_size))
+        order = np.argsort(keys, kind='stable')
+        keys, corner_rows = keys[order], corner_rows[order]
+
+        ball_frames = np.flatnonzero(~np.isnan(ball_centers[:, 0]))
+        ball_cells = np.floor(ball_centers[ball_frames] / cell_size)
+        candidates = []
+        for offset in ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+            query = grid_cell_keys(ball_frames, ball_cells + offset)
+            starts = np.searchsorted(keys, query, side='left')
+            ends = np.searchsorted(keys, query, side='right')
+            candidates.append(corner_rows[expand_ranges(starts, ends)])
+        return np.unique(np.concatenate(candidates)) # Both corners of a player can be near the ball
+
+    # Nearest player per frame, but the current holder keeps the ball unless someone is switch_margin pixels closer
+    def assign_with_hysteresis(self, player_frames, player_ids, candidate_rows, distances, assigned_rows):
+        order = np.lexsort((candidate_rows, player_frames[candidate_rows]))
+        candidate_rows, distances = candidate_rows[order], distances[order]
+        candidate_frames = player_frames[candidate_rows]
+        frame_starts = np.searchsorted(candidate_frames, np.arange(len(assigned_rows) + 1))
+
+        holder_row = -1
+        for frame_num in range(len(assigned_rows)):
+            start, end = frame_starts[frame_num], frame_starts[frame_num + 1]
+            if start == end:
+                continue
+            frame_rows, frame_distances = candidate_rows[start:end], distances[start:end]
+            best = np.argmin(frame_distances)
+
+            holder = np.flatnonzero(player_ids[frame_rows] == player_ids[holder_row]) if holder_row >= 0 else []
+            if len(holder) and frame_distances[best] > frame_distances[holder[0]] - self.switch_margin:
+                best = holder[0]
+
+            holder_row = frame_rows[best]
+            assigned_rows[frame_num] = holder_row
+
+        return assigned_rows
+
+    # Assign the ball of every frame of a TrackTable: sets has_ball on the holders and returns the team in
+    # control per frame (the last team keeps control while nobody holds the ball, 0 before anyone had it)
+    def assign_ball_to_tracks(self, tracks, method='brute'):
+        rows = tracks.rows
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        ball_rows = np.flatnonzero(tracks.class_mask('ball'))
+
+        ball_centers = np.full((tracks.num_frames, 2), np.nan)
+        ball_bboxes = rows['bbox'][ball_rows].astype(np.float64)
+        # Truncated to int like get_center_of_bbox
+        ball_centers[rows['frame'][ball_rows]] = np.trunc(np.stack([(ball_bboxes[:, 0] + ball_bboxes[:, 2]) / 2,
+                                                                    (ball_bboxes[:, 1] + ball_bboxes[:, 3]) / 2], axis=1))
+
+        assigned_rows = self.assign_ball_to_players(rows['frame'][player_rows], rows['track_id'][player_rows], rows['bbox'][player_rows], ball_centers, method)
+
+        has_holder = assigned_rows >= 0
+        holder_rows = player_rows[assigned_rows[has_holder]]
+        rows['has_ball'][holder_rows] = True
+
+        # Team in control, carried forward over the frames without a holder
+        team_ball_control = np.zeros(tracks.num_frames, dtype=np.int64)
+        team_ball_control[has_holder] = rows['team'][holder_rows]
+        last_control = np.maximum.accumulate(np.where(team_ball_control > 0, np.arange(tracks.num_frames), -1))
+        team_ball_control = np.where(last_control >= 0, team_ball_control[np.maximum(last_control, 0)], 0)
+
+        return team_ball_control
+
+# Sortable key of a (frame, grid cell x, grid cell y), the cells within +-2**20 of the origin
+def grid_cell_keys(frames, cells):
+    cells = np.clip(cells, -2**20 + 2, 2**20 - 2).astype(np.int64) + 2**20
+    return np.asarray(frames, dtype=np.int64) << 42 | cells[:, 0] << 21 | cells[:, 1]
+
+# Concatenation of the index ranges [starts[i], ends[i])
+def expand_ranges(starts, ends):
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
@@ -0,0 +1,96 @@
+import json
+import numpy as np
+
+# Ball possession of both teams from the team in control of every frame (0 = nobody yet).
+# Running counts (prefix sums) of the frames each team had the ball make every query O(1):
+# possession up to a frame, over the last window_seconds, or within a period of the match.
+# Frames can be appended one at a time while a video streams in.
+class PossessionStats:
+    # period_starts: first frame of every period (e.g. [0, frame of the second half kick-off])
+    def __init__(self, frame_rate=24, window_seconds=300, period_starts=None):
+        self.frame_rate = frame_rate
+        self.window_seconds = window_seconds
+        self.period_starts = sorted(period_starts) if period_starts else [0]
+        self.num_frames = 0
+        self.counts = np.zeros((1024 + 1, 2), dtype=np.int64) # counts[f]: frames of team 1 and 2 before frame f
+
+    @classmethod
+    def from_team_ball_control(cls, team_ball_control, **kwargs):
+        stats = cls(**kwargs)
+        stats.extend(team_ball_control)
+        return stats
+
+    def append(self, team):
+        self.extend([team])
+
+    def extend(self, teams):
+        teams = np.asarray(teams).reshape(-1)
+        self.reserve(self.num_frames + len(teams))
+        start = self.num_frames
+        self.counts[start + 1:start + len(teams) + 1] = self.counts[start] + np.cumsum(np.stack([teams == 1, teams == 2], axis=1), axis=0)
+        self.num_frames += len(teams)
+
+    def reserve(self, num_frames):
+        if num_frames + 1 > len(self.counts):
+            counts = np.zeros((max(num_frames + 1, 2 * len(self.counts)), 2), dtype=np.int64)
+            counts[:self.num_frames + 1] = self.counts[:self.num_frames + 1]
+            self.counts = counts
+
+    # Frames each team had the ball in frames [start, end)
+    def get_counts(self, start, end):
+        start = min(max(start, 0), self.num_frames)
+        end = min(max(end, start), self.num_frames)
+        team_1, team_2 = self.counts[end] - self.counts[start]
+        return int(team_1), int(team_2)
+
+    # Share of the possession of each team in frames [start, end), (0, 0) if nobody had the ball
+    def get_share(self, start, end):
+        team_1, team_2 = self.get_counts(start, end)
+        total = team_1 + team_2
+        if total == 0:
+            return 0.0, 0.0
+        return team_1 / total, team_2 / total
+
+    # Possession from the start of the video up to and including frame_num
+    def get_possession(self, frame_num):
+        return self.get_share(0, frame_num + 1)
+
+    # Possession over the last window_seconds up to and including frame_num
+    def get_window_possession(self, frame_num, window_seconds=None):
+        window_seconds = self.window_seconds if window_seconds is None else window_seconds
+        window_frames = int(round(window_seconds * self.frame_rate))
+        return self.get_share(frame_num + 1 - window_frames, frame_num + 1)
+
+    def get_period(self, frame_num):
+        return int(np.searchsorted(self.period_starts, frame_num, side='right')) - 1
+
+    # Possession of a period so far (up to and including frame_num, the whole period if None)
+    def get_period_possession(self, period, frame_num=None):
+        start = self.period_starts[period]
+        end = self.period_starts[period + 1] if period + 1 < len(self.period_starts) else self.num_frames
+        if frame_num is not None:
+            end = min(end, frame_num + 1)
+        return self.get_share(start, end)
+
+    def to_dict(self):
+        team_1, team_2 = self.get_share(0, self.num_frames)
+        team_1_frames, team_2_frames = self.get_counts(0, self.num_frames)
+        periods = []
+        for period, start in enumerate(self.period_starts):
+            end = self.period_starts[period + 1] if period + 1 < len(self.period_starts) else self.num_frames
+            period_team_1, period_team_2 = self.get_period_possession(period)
+            periods.append({"start_frame": start, "end_frame": end, "team_1": period_team_1, "team_2": period_team_2})
+
+        return {
+            "frames": self.num_frames,
+            "frame_rate": self.frame_rate,
+            "team_1": team_1,
+            "team_2": team_2,
+            "team_1_frames": team_1_frames,
+            "team_2_frames": team_2_frames,
+            "periods": periods,
+        }
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,2 @@
+from .frame_renderer import FrameRenderer, LAYERS
+from .overlay_writer import OverlayWriter
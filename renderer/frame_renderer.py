@@ -0,0 +1,214 @@
+import cv2
+import numpy as np
+from utils import get_center_of_bbox, get_bbox_width, get_foot_position
+
+LAYERS = ('players', 'referees', 'ball', 'ball_control', 'camera_movement', 'speed')
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Ball pointer, relative to the top center of the bbox
+TRIANGLE = np.array([[0, 0], [-10, -20], [10, -20]])
+
+# Translucent panels: top left, bottom right, color, alpha and their static labels (text, origin). The values
+# are drawn after the labels each frame.
+PANELS = {
+    "ball_control": ((1350, 850), (1900, 970), (255, 255, 255), 0.4, (("Team 1 Ball Control: ", (1400, 900)), ("Team 2 Ball Control: ", (1400, 950)))),
+    "camera_movement": ((0, 0), (500, 100), (255, 255, 255), 0.6, (("Camera Movement X: ", (10, 30)), ("Camera Movement Y: ", (10, 80)))),
+}
+PANEL_TEXT_SCALE = 1
+PANEL_TEXT_THICKNESS = 3
+
+# Draws every annotation layer of a frame in one pass, in place (no copy of the frame).
+# - The translucent panels are only blended inside their rectangle, with solid fill patches built once,
+#   instead of blending a filled copy of the whole frame. Their labels are rendered once into a text mask,
+#   only the values are drawn with putText per frame
+# - Layers can be switched on and off (see LAYERS)
+# All the overlays of the pipeline are drawn here (tracks, ball control, camera movement, speed and distance).
+class FrameRenderer:
+    def __init__(self, layers=LAYERS):
+        self.layers = set()
+        for layer in layers:
+            self.enable(layer)
+
+        self.panel_fills = {} # {(height, width, color): solid patch}
+        self.panel_layers = {} # {(panel, frame height, frame width): PanelLayer}
+
+    def enable(self, layer):
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown layer: {layer}")
+        self.layers.add(layer)
+
+    def disable(self, layer):
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown layer: {layer}")
+        self.layers.discard(layer)
+
+    # Draw all the frames of a video in place, tracks can be a TrackTable or the nested dicts
+    # possession: PossessionStats of the team in control per frame
+    def render_video(self, frames, tracks, possession=None, camera_movement_per_frame=None):
+        for frame_num, frame in enumerate(frames):
+            self.render(frame,
+                        frame_num,
+                        tracks["players"][frame_num],
+                        tracks["referees"][frame_num],
+                        tracks["ball"][frame_num],
+                        possession,
+                        camera_movement_per_frame[frame_num] if camera_movement_per_frame is not None else None)
+        return frames
+
+    # Draw the enabled layers of a single frame in place
+    def render(self, frame, frame_num, player_dict, referee_dict, ball_dict, possession=None, camera_movement=None):
+        if 'players' in self.layers:
+            for track_id, player in player_dict.items():
+                bbox = player["bbox"]
+                self.draw_ellipse(frame, bbox, player.get("team_color", (0, 0, 255)), track_id)
+                if player.get("has_ball", False):
+                    self.draw_triangle(frame, bbox, (0, 0, 255))
+
+        if 'referees' in self.layers:
+            for track_id, referee in referee_dict.items():
+                self.draw_ellipse(frame, referee["bbox"], (0, 255, 255), track_id)
+
+        if 'ball' in self.layers:
+            for ball in ball_dict.values():
+                self.draw_triangle(frame, ball["bbox"], (0, 255, 0))
+
+        if 'ball_control' in self.layers and possession is not None:
+            self.draw_team_ball_control(frame, frame_num, possession)
+
+        if 'camera_movement' in self.layers and camera_movement is not None:
+            self.draw_camera_movement(frame, camera_movement)
+
+        if 'speed' in self.layers:
+            self.draw_speed_and_distance(frame, player_dict)
+
+        return frame
+
+    def draw_ellipse(self, frame, bbox, color, track_id=None):
+        y2 = int(bbox[3])
+        x_center, _ = get_center_of_bbox(bbox)
+        width = get_bbox_width(bbox)
+
+        cv2.ellipse(frame, center=(x_center, y2), axes=(int(width), int(0.35*width)), angle=0.0, startAngle=-45, endAngle=235,
+                    color=color, thickness=2, lineType=cv2.LINE_4)
+
+        if track_id is not None:
+            rectangle_width = 40
+            rectangle_height = 20
+            x1_rect = x_center - rectangle_width // 2
+            x2_rect = x_center + rectangle_width // 2
+            y1_rect = (y2 - (rectangle_height // 2)) + 15
+            y2_rect = (y2 + (rectangle_height // 2)) + 15
+            cv2.rectangle(frame, (x1_rect, y1_rect), (x2_rect, y2_rect), color, cv2.FILLED)
+
+            x1_text = x1_rect + 12
+            if track_id > 99:
+                x1_text -= 10
+            cv2.putText(frame, str(track_id), (x1_text, y2_rect - 2), FONT, 0.5, (0, 0, 0), 2)
+
+    def draw_triangle(self, frame, bbox, color):
+        y = int(bbox[1])
+        x, _ = get_center_of_bbox(bbox)
+        triangle_points = TRIANGLE + (x, y)
+
+        cv2.drawContours(frame, [triangle_points], 0, color, cv2.FILLED)
+        cv2.drawContours(frame, [triangle_points], 0, (0, 0, 0), 2)
+
+    def draw_team_ball_control(self, frame, frame_num, possession):
+        team_1, team_2 = possession.get_possession(frame_num)
+        self.draw_panel(frame, "ball_control", (f"{team_1*100:.2f}%", f"{team_2*100:.2f}%"))
+
+    def draw_camera_movement(self, frame, camera_movement):
+        x_movement, y_movement = camera_movement
+        self.draw_panel(frame, "camera_movement", (f"{x_movement:.2f}", f"{y_movement:.2f}"))
+
+    # Blend a panel with its labels, then draw the value after each label
+    def draw_panel(self, frame, name, values):
+        layer = self.panel_layers.get((name, frame.shape[0], frame.shape[1]))
+        if layer is None:
+            layer = self.panel_layers[(name, frame.shape[0], frame.shape[1])] = self.build_panel_layer(name, frame.shape)
+
+        if layer.region is not None:
+            x1, y1, x2, y2 = layer.region
+            roi = frame[y1:y2, x1:x2]
+            roi[:] = cv2.addWeighted(layer.fill, layer.alpha, roi, 1 - layer.alpha, 0)
+            for (label_x1, label_y1, label_x2, label_y2), label_mask in zip(layer.label_boxes, layer.label_masks):
+                label_roi = roi[label_y1:label_y2, label_x1:label_x2]
+                label_roi[:] = cv2.multiply(label_roi, label_mask, scale=1 / 255)
+        for value, origin in zip(values, layer.value_origins):
+            cv2.putText(frame, value, origin, FONT, PANEL_TEXT_SCALE, (0, 0, 0), PANEL_TEXT_THICKNESS)
+
+    def draw_speed_and_distance(self, frame, player_dict):
+        for track_info in player_dict.values():
+            speed = track_info.get("speed", None)
+            distance = track_info.get("distance", None)
+            if speed is None or distance is None:
+                continue
+            position = get_foot_position(track_info['bbox'])
+            position = (position[0], position[1] + 40)
+
+            cv2.putText(frame, f"Speed: {speed:.2f} km/h", position, FONT, 0.5, (0, 0, 0), 2)
+            cv2.putText(frame, f"Distance: {distance:.2f} m", (position[0], position[1] + 20), FONT, 0.5, (0, 0, 0), 2)
+
+    # Same as addWeighted of a copy of the frame with a filled rectangle, but only over the rectangle
+    def blend_panel(self, frame, top_left, bottom_right, color, alpha):
+        region = panel_region(frame.shape, top_left, bottom_right)
+        if region is None:
+            return
+        x1, y1, x2, y2 = region
+        fill = self.panel_fill(y2 - y1, x2 - x1, color)
+        roi = frame[y1:y2, x1:x2]
+        roi[:] = cv2.addWeighted(fill, alpha, roi, 1 - alpha, 0)
+
+    def panel_fill(self, height, width, color):
+        key = (height, width, color)
+        fill = self.panel_fills.get(key)
+        if fill is None:
+            fill = np.empty((height, width, 3), dtype=np.uint8)
+            fill[:] = color
+            self.panel_fills[key] = fill
+        return fill
+
+    # Fill patch of a panel and its labels drawn once in black on white masks, cut to the box of each label.
+    # The blended panel is multiplied by the masks, which gives the pixels of black text drawn on it
+    # (anti-aliased edges included). The values start where putText of the label followed by the value
+    # would have put them.
+    def build_panel_layer(self, name, frame_shape):
+        top_left, bottom_right, color, alpha, labels = PANELS[name]
+        value_origins = []
+        for label, (x, y) in labels:
+            advance = cv2.getTextSize(label + "0", FONT, PANEL_TEXT_SCALE, PANEL_TEXT_THICKNESS)[0][0] - \
+                      cv2.getTextSize("0", FONT, PANEL_TEXT_SCALE, PANEL_TEXT_THICKNESS)[0][0]
+            value_origins.append((x + advance, y))
+
+        region = panel_region(frame_shape, top_left, bottom_right)
+        layer = PanelLayer(region, alpha, value_origins)
+        if region is None:
+            return layer
+        x1, y1, x2, y2 = region
+        layer.fill = self.panel_fill(y2 - y1, x2 - x1, color)
+        for label, (x, y) in labels:
+            text_mask = np.full((y2 - y1, x2 - x1, 3), 255, dtype=np.uint8)
+            cv2.putText(text_mask, label, (x - x1, y - y1), FONT, PANEL_TEXT_SCALE, (0, 0, 0), PANEL_TEXT_THICKNESS)
+            label_x, label_y, label_width, label_height = cv2.boundingRect(255 - text_mask[:, :, 0])
+            if label_width > 0:
+                layer.label_boxes.append((label_x, label_y, label_x + label_width, label_y + label_height))
+                layer.label_masks.append(text_mask[label_y:label_y + label_height, label_x:label_x + label_width].copy())
+        return layer
+
+class PanelLayer:
+    def __init__(self, region, alpha, value_origins):
+        self.region = region # x1, y1, x2, y2 within the frame, None outside of it
+        self.alpha = alpha
+        self.value_origins = value_origins
+        self.fill = None
+        self.label_boxes = [] # x1, y1, x2, y2 within the region
+        self.label_masks = []
+
+# Part of the rectangle (corners included) inside the frame as x1, y1, x2, y2, None if it is outside
+def panel_region(frame_shape, top_left, bottom_right):
+    x1, y1 = max(top_left[0], 0), max(top_left[1], 0)
+    x2, y2 = min(bottom_right[0] + 1, frame_shape[1]), min(bottom_right[1] + 1, frame_shape[0])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
@@ -0,0 +1,70 @@
+import json
+from .frame_renderer import LAYERS
+
+# Overlay data of every frame as JSON lines, for a player to draw over the untouched source video instead
+# of re-encoding it. The first line describes the video, then one line per frame with the enabled layers:
+#   {"fps": 25.0, "frame_size": [1920, 1080], "layers": [...], "color_order": "bgr"}
+#   {"frame": 0, "players": [{"id": 7, "bbox": [x1, y1, x2, y2], "team": 1, "team_color": [b, g, r],
+#    "has_ball": true, "speed": 21.3, "distance": 104.2}], "referees": [{"id": 3, "bbox": [...]}],
+#    "ball": [x1, y1, x2, y2] or null, "ball_control": [0.54, 0.46], "camera_movement": [dx, dy]}
+# Boxes are in source pixels, speed in km/h and distance in m like the drawn annotations.
+class OverlayWriter:
+    def __init__(self, output_path, fps, frame_size=None, layers=LAYERS):
+        for layer in layers:
+            if layer not in LAYERS:
+                raise ValueError(f"Unknown layer: {layer}")
+        self.layers = set(layers)
+        self.file = open(output_path, 'w')
+        header = {"fps": fps, "frame_size": list(frame_size) if frame_size is not None else None,
+                  "layers": [layer for layer in LAYERS if layer in self.layers], "color_order": "bgr"}
+        self.file.write(json.dumps(header) + "\n")
+
+    # Same arguments as FrameRenderer.render, minus the frame
+    def write(self, frame_num, player_dict, referee_dict, ball_dict, possession=None, camera_movement=None):
+        record = {"frame": frame_num}
+        if 'players' in self.layers or 'speed' in self.layers:
+            record["players"] = [self.player_record(track_id, player) for track_id, player in player_dict.items()]
+        if 'referees' in self.layers:
+            record["referees"] = [{"id": int(track_id), "bbox": round_values(referee["bbox"])} for track_id, referee in referee_dict.items()]
+        if 'ball' in self.layers:
+            record["ball"] = next((round_values(ball["bbox"]) for ball in ball_dict.values()), None)
+        if 'ball_control' in self.layers and possession is not None:
+            record["ball_control"] = round_values(possession.get_possession(frame_num), 4)
+        if 'camera_movement' in self.layers and camera_movement is not None:
+            record["camera_movement"] = round_values(camera_movement, 2)
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def player_record(self, track_id, player):
+        record = {"id": int(track_id), "bbox": round_values(player["bbox"])}
+        if 'players' in self.layers:
+            if player.get("team") is not None:
+                record["team"] = int(player["team"])
+            if player.get("team_color") is not None:
+                record["team_color"] = [int(value) for value in player["team_color"]]
+            record["has_ball"] = bool(player.get("has_ball", False))
+        if 'speed' in self.layers and player.get("speed") is not None and player.get("distance") is not None:
+            record["speed"] = round(float(player["speed"]), 2)
+            record["distance"] = round(float(player["distance"]), 2)
+        return record
+
+    # Overlay of a whole video, tracks can be a TrackTable or the nested dicts
+    def write_video(self, tracks, possession=None, camera_movement_per_frame=None):
+        for frame_num in range(len(tracks["players"])):
+            self.write(frame_num,
+                       tracks["players"][frame_num],
+                       tracks["referees"][frame_num],
+                       tracks["ball"][frame_num],
+                       possession,
+                       camera_movement_per_frame[frame_num] if camera_movement_per_frame is not None else None)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def round_values(values, digits=1):
+    return [round(float(value), digits) for value in values]
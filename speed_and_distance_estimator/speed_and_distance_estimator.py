@@ -1,15 +1,34 @@
-import cv2
-import sys
-sys.path.append('../')
-from utils import measure_distance, get_foot_position
+from collections import deque
+import numpy as np
+from utils import measure_distance, TrackTable
+from .speed_engine import compute_speed_and_distance, summarize_tracks
 
 class SpeedAndDistanceEstimator():
-    def __init__(self):
-        self.frame_window = 5 # Number of frames to consider for speed estimation
-        self.frame_rate = 24 # Frame rate of the video
+    # frame_rate: frames per second of the video (see utils.get_video_fps)
+    # method 'window': one speed per frame_window frames, distance measured between the window ends
+    #        'rolling': speed, acceleration and distance at every frame, smoothed over frame_window frames
+    # sprint_speed (km/h) and min_sprint_frames define a sprint in the summary
+    def __init__(self, frame_rate=24, frame_window=5, method='window', sprint_speed=25.0, min_sprint_frames=5):
+        if method not in ('window', 'rolling'):
+            raise ValueError(f"Unknown speed method: {method}")
+        self.frame_window = frame_window # Number of frames to consider for speed estimation
+        self.frame_rate = frame_rate # Frame rate of the video
+        self.method = method
+        self.sprint_speed = sprint_speed
+        self.min_sprint_frames = min_sprint_frames
         
-    def add_speed_and_distance_to_tracks(self, tracks):
-        total_distance = {}
+    # total_distance can be passed in to carry the covered distance over consecutive windows of a stream
+    def add_speed_and_distance_to_tracks(self, tracks, total_distance=None):
+        if self.method == 'rolling':
+            self.add_rolling_speed_and_distance(tracks)
+            return
+
+        if isinstance(tracks, TrackTable):
+            self.add_speed_and_distance_to_table(tracks)
+            return
+
+        if total_distance is None:
+            total_distance = {}
 
         for object, object_tracks in tracks.items():
             if object == 'ball' or object == 'referees':
@@ -17,6 +36,8 @@ class SpeedAndDistanceEstimator():
             number_of_frames = len(object_tracks)
             for frame_num in range (0, number_of_frames, self.frame_window): # Step by frame_window
                 last_frame = min(frame_num + self.frame_window, number_of_frames - 1) # To avoid out of index
+                if last_frame == frame_num: # No time elapsed in the last window
+                    continue
 
                 for track_id, track in object_tracks[frame_num].items():
                     # Skip if the track is not present in the last frame and in the current frame
@@ -48,25 +69,148 @@ class SpeedAndDistanceEstimator():
                         tracks[object][frame_num_batch][track_id]['speed'] = speed_km_per_hour
                         tracks[object][frame_num_batch][track_id]['distance'] = total_distance[object][track_id]
 
-    def draw_speed_and_distance(self, frames, tracks):
-        output_frames = []
-        for frame_num, frame in enumerate(frames):
-            for object, object_tracks in tracks.items():
-                if object == 'ball' or object == 'referees':
-                    continue
-                for track_id, track_info in object_tracks[frame_num].items():
-                    if "speed" in track_info:
-                        speed = track_info.get("speed", None)
-                        distance = track_info.get("distance", None)
-                        if speed is None or distance is None:
-                            continue
-                        bbox = track_info['bbox']
-                        position = get_foot_position(bbox)
-                        position = list(position)
-                        position[1] += 40
-
-                        position = tuple(map(int, position))
-                        cv2.putText(frame, f"Speed: {speed:.2f} km/h", position, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-                        cv2.putText(frame, f"Speed: {distance:.2f} m", (position[0], position[1] + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-            output_frames.append(frame)
-        return output_frames      
+    # Same windows as add_speed_and_distance_to_tracks, computed for all the players of the table at once
+    def add_speed_and_distance_to_table(self, table):
+        rows = table.rows
+        number_of_frames = table.num_frames
+        player_rows = np.flatnonzero(table.class_mask('players'))
+        frames = rows['frame'][player_rows]
+        track_ids = rows['track_id'][player_rows]
+
+        # Windows start at every frame_window-th frame and end in the next start frame (or the last frame)
+        is_start = frames % self.frame_window == 0
+        start_rows = player_rows[is_start]
+        start_frames = frames[is_start]
+        window_track_ids = track_ids[is_start]
+        last_frames = np.minimum(start_frames + self.frame_window, number_of_frames - 1)
+        end_rows = table.find_rows('players', last_frames, window_track_ids)
+
+        valid = (end_rows >= 0) & (last_frames > start_frames)
+        start_positions = rows['position_transformed'][start_rows]
+        end_positions = rows['position_transformed'][end_rows]
+        valid &= ~np.isnan(start_positions[:, 0]) & ~np.isnan(end_positions[:, 0])
+
+        start_rows, start_frames, window_track_ids = start_rows[valid], start_frames[valid], window_track_ids[valid]
+        last_frames = last_frames[valid]
+        distance_covered = np.linalg.norm(end_positions[valid] - start_positions[valid], axis=1)
+        time_elapsed = (last_frames - start_frames) / self.frame_rate
+        speed_km_per_hour = distance_covered / time_elapsed * 3.6
+
+        # Total distance of each track up to and including each window
+        order = np.lexsort((start_frames, window_track_ids))
+        cumulative_distance = np.cumsum(distance_covered[order])
+        track_starts = np.flatnonzero(np.r_[True, window_track_ids[order][1:] != window_track_ids[order][:-1]])
+        cumulative_distance -= np.repeat(np.r_[0, cumulative_distance[track_starts[1:] - 1]], np.diff(np.r_[track_starts, len(order)]))
+        total_distance = np.empty_like(cumulative_distance)
+        total_distance[order] = cumulative_distance
+
+        # Every player row takes the values of the window it falls in, if that window was measured
+        window_lookup = np.full(len(rows), -1, dtype=np.int64)
+        window_lookup[start_rows] = np.arange(len(start_rows))
+        window_start_rows = table.find_rows('players', frames - frames % self.frame_window, track_ids)
+        window = np.where(window_start_rows >= 0, window_lookup[window_start_rows], -1)
+        in_window = window >= 0
+        in_window[in_window] &= frames[in_window] < last_frames[window[in_window]]
+
+        rows['speed'][player_rows[in_window]] = speed_km_per_hour[window[in_window]]
+        rows['distance'][player_rows[in_window]] = total_distance[window[in_window]]
+
+    # Per-frame speed (km/h), acceleration (m/s^2) and distance (m) of every player, see speed_engine
+    def add_rolling_speed_and_distance(self, tracks):
+        table = tracks if isinstance(tracks, TrackTable) else TrackTable.from_tracks(tracks)
+        rows = table.rows
+        player_rows = np.flatnonzero(table.class_mask('players'))
+
+        speed, acceleration, distance = compute_speed_and_distance(rows['position_transformed'][player_rows],
+                                                                   rows['frame'][player_rows],
+                                                                   rows['track_id'][player_rows],
+                                                                   self.frame_rate,
+                                                                   self.frame_window)
+        rows['speed'][player_rows] = speed
+        rows['acceleration'][player_rows] = acceleration
+        rows['distance'][player_rows] = distance
+
+        if table is not tracks:
+            # Copy the values back into the nested dicts
+            for frame_num, player_track in enumerate(table['players']):
+                for track_id, track in player_track.items():
+                    for field in ('speed', 'acceleration', 'distance'):
+                        if field in track:
+                            tracks['players'][frame_num][track_id][field] = track[field]
+
+    # Frames after a frame whose players are needed for its rolling values to match the whole video ones:
+    # the windows at the start of a track segment look frame_window rows ahead, a row at most frame_window
+    # (max_frame_gap of the speed engine) frames after the previous one
+    @property
+    def stream_horizon(self):
+        return self.frame_window * self.frame_window
+
+    # Start of a stream of frames for add_speed_and_distance_to_frame
+    def reset_stream(self):
+        self.stream_history = {} # {track_id: deque of the last (frame, x, y, distance) rows with a position}
+        self.stream_distance = {} # {track_id: distance covered so far}
+
+    # Rolling speed, acceleration and distance of the players of frame_num, the same values as the 'rolling'
+    # method on the whole video. next_player_tracks are the player tracks of the frames that follow it
+    # (stream_horizon of them are enough). Every track keeps the 2 * frame_window + 1 rows before the frame,
+    # as far as the windows of speed and then acceleration look back.
+    def add_speed_and_distance_to_frame(self, frame_num, player_track, next_player_tracks):
+        history_size = 2 * self.frame_window + 1
+        track_ids = [track_id for track_id, track in player_track.items() if track.get('position_transformed') is not None]
+        for track_id in list(self.stream_history):
+            # Further than the engine's max_frame_gap, the next row of the track starts a new segment
+            if self.stream_history[track_id][-1][0] < frame_num - self.frame_window:
+                del self.stream_history[track_id]
+        if not track_ids:
+            return
+
+        rows = {track_id: list(self.stream_history.get(track_id, ())) for track_id in track_ids}
+        current_rows = {}
+        for track_id in track_ids:
+            current_rows[track_id] = len(rows[track_id])
+            rows[track_id].append((frame_num,) + tuple(player_track[track_id]['position_transformed']) + (np.nan,))
+
+        # Only the first frame_window rows of a segment look ahead
+        looking_ahead = []
+        for track_id in track_ids:
+            frames = [row[0] for row in rows[track_id][-self.frame_window - 1:]]
+            if len(frames) <= self.frame_window or any(frame - previous > self.frame_window for previous, frame in zip(frames, frames[1:])):
+                looking_ahead.append(track_id)
+        for next_frame_num, next_player_track in enumerate(next_player_tracks if looking_ahead else (), frame_num + 1):
+            for track_id in looking_ahead:
+                position = next_player_track.get(track_id, {}).get('position_transformed')
+                if position is not None:
+                    rows[track_id].append((next_frame_num,) + tuple(position) + (np.nan,))
+
+        # All the tracks of the frame in one call, each from the first row it kept
+        offsets = np.cumsum([0] + [len(rows[track_id]) for track_id in track_ids])
+        values = np.array([row for track_id in track_ids for row in rows[track_id]], dtype=np.float64)
+        speed, acceleration, distance = compute_speed_and_distance(values[:, 1:3],
+                                                                   values[:, 0].astype(np.int64),
+                                                                   np.repeat(np.arange(len(track_ids)), np.diff(offsets)),
+                                                                   self.frame_rate,
+                                                                   self.frame_window)
+
+        for index, track_id in enumerate(track_ids):
+            row = offsets[index] + current_rows[track_id]
+            # The first kept row has its distance from the previous frames, or it starts the track
+            history = self.stream_history.get(track_id)
+            base_distance = history[0][3] if history else self.stream_distance.get(track_id, 0.0)
+            track_distance = base_distance + distance[row]
+            self.stream_distance[track_id] = track_distance
+
+            track = player_track[track_id]
+            for field, value in (('speed', speed[row]), ('acceleration', acceleration[row]), ('distance', track_distance)):
+                if not np.isnan(value):
+                    track[field] = float(value)
+
+            if history is None:
+                history = self.stream_history[track_id] = deque(maxlen=history_size)
+            history.append((frame_num,) + tuple(values[row, 1:3]) + (track_distance,))
+
+    # Top speed, sprints and covered distance of every player and distance per team (TrackTable, after
+    # add_speed_and_distance_to_tracks and the team assignment)
+    def get_summary(self, table):
+        rows = table.rows[table.class_mask('players')]
+        return summarize_tracks(rows['frame'], rows['track_id'], rows['team'], rows['speed'], rows['distance'],
+                                self.sprint_speed, self.min_sprint_frames)
@@ -0,0 +1,140 @@
+import numpy as np
+
+# Per-frame speed, acceleration and covered distance of many tracks at once.
+# The rows of every track are laid out contiguously (sorted by track then frame) so the rolling windows
+# are plain index arithmetic over the whole array, there is no loop over tracks or frames.
+
+# Order of the rows by (track_id, frame), and the start of every track in that order
+def sort_by_track(frames, track_ids):
+    frames = np.asarray(frames, dtype=np.int64)
+    track_ids = np.asarray(track_ids)
+    if len(track_ids) and np.all(frames[1:] >= frames[:-1]):
+        # Rows in frame order (TrackTable rows are): a stable sort on the track ids keeps the frames sorted.
+        # Ids within a 16 bit range are sorted as uint16, which numpy radix sorts in linear time.
+        keys = track_ids.astype(np.int64) - track_ids.min()
+        if keys.max() < 2**16:
+            keys = keys.astype(np.uint16)
+        order = np.argsort(keys, kind='stable')
+    else:
+        order = np.argsort(track_ids.astype(np.int64) << 32 | frames, kind='stable')
+    sorted_ids = track_ids[order]
+    track_starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(order) else np.zeros(0, dtype=np.int64)
+    return order, track_starts
+
+# Index of the first row of the run each row belongs to, runs start at every True of is_start
+def run_starts(is_start):
+    return np.maximum.accumulate(np.where(is_start, np.arange(len(is_start)), 0))
+
+# Index of the last row of the run each row belongs to
+def run_ends(is_start):
+    is_end = np.r_[is_start[1:], True]
+    return np.minimum.accumulate(np.where(is_end, np.arange(len(is_end)), len(is_end))[::-1])[::-1]
+
+# Rate of change of values over window frames within each segment (values per second).
+# The window ends at the row when it can look window rows back, otherwise it starts at the segment start.
+def rolling_rate(values, frames, segment_start, segment_end, window, frame_rate):
+    rows = np.arange(len(values))
+    hi = np.minimum(np.maximum(rows, segment_start + window), segment_end)
+    lo = np.maximum(hi - window, segment_start)
+    elapsed = (frames[hi] - frames[lo]) / frame_rate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(hi > lo, (values[hi] - values[lo]) / elapsed, np.nan)
+
+# positions (N,2) in meters, NaN when not on the pitch; frames, track_ids (N,)
+# Returns speed (km/h), acceleration (m/s^2) and the distance covered so far (m) of every row.
+# A track split by more than max_frame_gap missing frames starts a new segment: the jump is not counted
+# as distance and the windows do not span it.
+def compute_speed_and_distance(positions, frames, track_ids, frame_rate, window=5, max_frame_gap=None):
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    frames = np.asarray(frames, dtype=np.int64)
+    track_ids = np.asarray(track_ids)
+    max_frame_gap = window if max_frame_gap is None else max_frame_gap
+
+    speed = np.full(len(frames), np.nan)
+    acceleration = np.full(len(frames), np.nan)
+    distance = np.full(len(frames), np.nan)
+
+    # Only the rows with a position take part, the others stay NaN
+    valid = np.flatnonzero(~np.isnan(positions[:, 0]))
+    order, track_starts = sort_by_track(frames[valid], track_ids[valid])
+    rows = valid[order]
+    if len(rows) == 0:
+        return speed, acceleration, distance
+    sorted_positions = positions[rows]
+    sorted_frames = frames[rows]
+
+    is_track_start = np.zeros(len(rows), dtype=bool)
+    is_track_start[track_starts] = True
+    is_segment_start = is_track_start | np.r_[True, np.diff(sorted_frames) > max_frame_gap]
+
+    # Distance covered since the track started, step by step
+    steps = np.r_[0.0, np.hypot(np.diff(sorted_positions[:, 0]), np.diff(sorted_positions[:, 1]))]
+    steps[is_segment_start] = 0
+    cumulative = np.cumsum(steps)
+    track_distance = cumulative - cumulative[run_starts(is_track_start)]
+
+    segment_start = run_starts(is_segment_start)
+    segment_end = run_ends(is_segment_start)
+    meters_per_second = rolling_rate(cumulative, sorted_frames, segment_start, segment_end, window, frame_rate)
+    sorted_acceleration = rolling_rate(meters_per_second, sorted_frames, segment_start, segment_end, window, frame_rate)
+
+    speed[rows] = meters_per_second * 3.6
+    acceleration[rows] = sorted_acceleration
+    distance[rows] = track_distance
+    return speed, acceleration, distance
+
+# Per track summary: {track_id: {"team", "distance", "top_speed", "mean_speed", "sprints", "frames"}}
+# and per team: {team: {"distance", "players", "sprints"}}.
+# A sprint is a run of at least min_sprint_frames consecutive frames at sprint_speed km/h or faster.
+def summarize_tracks(frames, track_ids, teams, speed, distance, sprint_speed=25.0, min_sprint_frames=5):
+    frames = np.asarray(frames, dtype=np.int64)
+    order, track_starts = sort_by_track(frames, track_ids)
+    if len(order) == 0:
+        return {"players": {}, "teams": {}}
+
+    sorted_ids = np.asarray(track_ids)[order]
+    sorted_frames = frames[order]
+    sorted_teams = np.asarray(teams, dtype=np.int64)[order]
+    sorted_speed = np.asarray(speed, dtype=np.float64)[order]
+    sorted_distance = np.asarray(distance, dtype=np.float64)[order]
+    track_lengths = np.diff(np.r_[track_starts, len(order)])
+    track_index = np.repeat(np.arange(len(track_starts)), track_lengths)
+    num_tracks = len(track_starts)
+
+    has_speed = ~np.isnan(sorted_speed)
+    top_speed = np.maximum.reduceat(np.where(has_speed, sorted_speed, -np.inf), track_starts)
+    speed_sum = np.bincount(track_index, np.where(has_speed, sorted_speed, 0), minlength=num_tracks)
+    speed_count = np.bincount(track_index, has_speed, minlength=num_tracks)
+    total_distance = np.maximum.reduceat(np.where(np.isnan(sorted_distance), -np.inf, sorted_distance), track_starts)
+
+    # Sprint runs: consecutive frames of the same track above the threshold
+    is_sprinting = has_speed & (np.nan_to_num(sorted_speed) >= sprint_speed)
+    run_start = is_sprinting & np.r_[True, (~is_sprinting[:-1]) | (np.diff(sorted_frames) != 1) | (np.diff(track_index) != 0)]
+    run_id = np.cumsum(run_start) - 1
+    run_length = np.bincount(run_id[is_sprinting], minlength=run_id[-1] + 1 if len(run_id) else 0)
+    long_runs = np.flatnonzero(run_start)[run_length[run_id[run_start]] >= min_sprint_frames]
+    sprints = np.bincount(track_index[long_runs], minlength=num_tracks)
+
+    # Team of a track: the one it was assigned most often
+    team_votes = np.bincount(track_index * 3 + np.clip(sorted_teams, 0, 2), minlength=num_tracks * 3).reshape(num_tracks, 3)
+    track_team = np.where(team_votes[:, 1:].sum(axis=1) > 0, np.argmax(team_votes[:, 1:], axis=1) + 1, 0)
+
+    players = {}
+    team_summary = {}
+    for i in range(num_tracks):
+        distance_covered = float(total_distance[i]) if np.isfinite(total_distance[i]) else 0.0
+        players[int(sorted_ids[track_starts[i]])] = {
+            "team": int(track_team[i]),
+            "distance": distance_covered,
+            "top_speed": float(top_speed[i]) if np.isfinite(top_speed[i]) else None,
+            "mean_speed": float(speed_sum[i] / speed_count[i]) if speed_count[i] else None,
+            "sprints": int(sprints[i]),
+            "frames": int(track_lengths[i]),
+        }
+        if track_team[i]:
+            team = team_summary.setdefault(int(track_team[i]), {"distance": 0.0, "players": 0, "sprints": 0})
+            team["distance"] += distance_covered
+            team["players"] += 1
+            team["sprints"] += int(sprints[i])
+
+    return {"players": players, "teams": team_summary}
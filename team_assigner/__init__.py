@@ -1 +1 @@
-from .team_assigner import TeamAssigner
\ No newline at end of file
+from .team_assigner import TeamAssigner, parse_team_override
\ No newline at end of file
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Extracts the jersey color of many players of a frame at once.
+# Every top-half crop is resized to the same small size so the whole batch is clustered together:
+# - 'kmeans': two-cluster k-means per crop, the cluster not holding most of the corners is the player
+#   (same steps as in color_analysis, done as array operations over the batch)
+# - 'median': median color of the pixels that differ from the median border (background) color
+# Colors are cached per track id (least recently used dropped beyond cache_size).
+class JerseyColorExtractor:
+    def __init__(self, method='kmeans', crop_size=(16, 16), iterations=10, cache_size=512):
+        if method not in ('kmeans', 'median'):
+            raise ValueError(f"Unknown color extraction method: {method}")
+        self.method = method
+        self.crop_size = crop_size # (width, height) of the resized top half crop
+        self.iterations = iterations
+        self.cache_size = cache_size
+        self.color_cache = OrderedDict() # {track_id: color}
+
+    # (N,3) colors of the players in bboxes, track_ids (optional) are used to reuse cached colors
+    # (the bbox of a cached track can be None)
+    def get_colors(self, frame, bboxes, track_ids=None):
+        colors = np.zeros((len(bboxes), 3), dtype=np.float32)
+        if track_ids is None:
+            missing = list(range(len(bboxes)))
+        else:
+            missing = []
+            for i, track_id in enumerate(track_ids):
+                if track_id in self.color_cache:
+                    self.color_cache.move_to_end(track_id)
+                    colors[i] = self.color_cache[track_id]
+                else:
+                    missing.append(i)
+
+        if missing:
+            crops = self.get_crops(frame, [bboxes[i] for i in missing])
+            if self.method == 'kmeans':
+                colors[missing] = self.kmeans_colors(crops)
+            else:
+                colors[missing] = self.median_colors(crops)
+
+            if track_ids is not None:
+                for i in missing:
+                    self.cache_color(track_ids[i], colors[i])
+
+        return colors
+
+    def cache_color(self, track_id, color):
+        self.color_cache[track_id] = color
+        self.color_cache.move_to_end(track_id)
+        while len(self.color_cache) > self.cache_size:
+            self.color_cache.popitem(last=False)
+
+    def forget(self, track_id):
+        self.color_cache.pop(track_id, None)
+
+    # (N, height, width, 3) float32 stack of the resized top half of every bbox
+    def get_crops(self, frame, bboxes):
+        width, height = self.crop_size
+        crops = np.zeros((len(bboxes), height, width, 3), dtype=np.float32)
+        for i, bbox in enumerate(bboxes):
+            x1, y1, x2, y2 = (int(v) for v in bbox)
+            x1, y1 = max(x1, 0), max(y1, 0)
+            image = frame[y1:y2, x1:x2]
+            top_half_image = image[0:image.shape[0]//2, :]
+            if top_half_image.size == 0:
+                continue
+            # Nearest neighbour keeps real pixel colors instead of blending jersey and background
+            crops[i] = cv2.resize(top_half_image, (width, height), interpolation=cv2.INTER_NEAREST)
+        return crops
+
+    def kmeans_colors(self, crops):
+        num_crops, height, width, _ = crops.shape
+        pixels = crops.reshape(num_crops, -1, 3)
+        corner_indices = [0, width - 1, (height - 1) * width, height * width - 1]
+
+        # Start from the mean corner color and the pixel furthest from it
+        corner_color = pixels[:, corner_indices].mean(axis=1)
+        furthest = np.argmax(((pixels - corner_color[:, None]) ** 2).sum(axis=2), axis=1)
+        centers = np.stack([corner_color, pixels[np.arange(num_crops), furthest]], axis=1) # (N, 2, 3)
+
+        for _ in range(self.iterations):
+            distances = ((pixels[:, :, None, :] - centers[:, None, :, :]) ** 2).sum(axis=3) # (N, P, 2)
+            labels = np.argmin(distances, axis=2)
+            for cluster in (0, 1):
+                in_cluster = (labels == cluster)[:, :, None]
+                count = in_cluster.sum(axis=1)
+                cluster_sum = (pixels * in_cluster).sum(axis=1)
+                # Keep the previous center of an empty cluster
+                centers[:, cluster] = np.where(count > 0, cluster_sum / np.maximum(count, 1), centers[:, cluster])
+
+        # The cluster of most corners is the background, ties go to cluster 0 like in color_analysis
+        corner_labels = labels[:, corner_indices]
+        non_player_cluster = (corner_labels.sum(axis=1) >= 3).astype(int)
+        player_cluster = 1 - non_player_cluster
+
+        return centers[np.arange(num_crops), player_cluster]
+
+    def median_colors(self, crops, background_distance=40):
+        num_crops, height, width, _ = crops.shape
+        border = np.concatenate([crops[:, 0], crops[:, -1], crops[:, :, 0], crops[:, :, -1]], axis=1)
+        background_color = np.median(border, axis=1)
+
+        pixels = crops.reshape(num_crops, -1, 3)
+        is_player = np.linalg.norm(pixels - background_color[:, None], axis=2) > background_distance
+        # Crops where nothing stands out from the background use all their pixels
+        is_player[~is_player.any(axis=1)] = True
+
+        player_pixels = np.where(is_player[:, :, None], pixels, np.nan)
+        return np.nanmedian(player_pixels, axis=1)
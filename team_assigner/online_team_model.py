@@ -0,0 +1,70 @@
+from collections import OrderedDict, deque
+import numpy as np
+
+# Team model that keeps adapting over a whole match.
+# - The two team centers follow the jersey colors with mini-batch k-means updates on sampled frames,
+#   so lighting changes do not make the first frame fit go stale.
+# - Each track settles on the majority team of its last vote_window classifications.
+# - Tracks not seen for max_unseen frames are forgotten, so memory stays bounded.
+class OnlineTeamModel:
+    def __init__(self, centers, sample_every=10, vote_window=15, max_unseen=250, min_learning_rate=0.01, team_overrides=None):
+        self.centers = np.array(centers, dtype=np.float32).reshape(2, 3)
+        self.center_counts = np.zeros(2)
+        self.sample_every = sample_every # Frames between two re-classifications of every visible player
+        self.vote_window = vote_window
+        self.max_unseen = max_unseen
+        self.min_learning_rate = min_learning_rate # Keeps the centers moving after many updates
+        self.team_overrides = team_overrides or {} # {track_id: team_id}, e.g. goalkeepers
+
+        self.tracks = OrderedDict() # {track_id: {"votes": deque, "team": team_id, "last_seen": frame_num}}, least recently seen first
+
+    def is_sample_frame(self, frame_num):
+        return frame_num % self.sample_every == 0
+
+    def predict(self, colors):
+        distances = ((np.asarray(colors, dtype=np.float32)[:, None, :] - self.centers[None, :, :]) ** 2).sum(axis=2)
+        return np.argmin(distances, axis=1) + 1  # Team is 1 or 2
+
+    # Mini-batch k-means step: move each center towards the mean of the colors assigned to it
+    def partial_fit(self, colors):
+        colors = np.asarray(colors, dtype=np.float32)
+        labels = self.predict(colors) - 1
+        for cluster in (0, 1):
+            cluster_colors = colors[labels == cluster]
+            if len(cluster_colors) == 0:
+                continue
+            self.center_counts[cluster] += len(cluster_colors)
+            learning_rate = max(len(cluster_colors) / self.center_counts[cluster], self.min_learning_rate)
+            self.centers[cluster] += learning_rate * (cluster_colors.mean(axis=0) - self.centers[cluster])
+
+    def vote(self, track_ids, teams):
+        for track_id, team in zip(track_ids, teams):
+            track = self.tracks.get(track_id)
+            if track is None:
+                track = {"votes": deque(maxlen=self.vote_window), "team": int(team), "last_seen": None}
+                self.tracks[track_id] = track
+            track["votes"].append(int(team))
+
+            team_1_votes = track["votes"].count(1)
+            team_2_votes = len(track["votes"]) - team_1_votes
+            if team_1_votes != team_2_votes: # A tie keeps the current team
+                track["team"] = 1 if team_1_votes > team_2_votes else 2
+
+    def mark_seen(self, frame_num, track_ids):
+        for track_id in track_ids:
+            if track_id in self.tracks:
+                self.tracks[track_id]["last_seen"] = frame_num
+                self.tracks.move_to_end(track_id)
+
+    # Forget the tracks not seen for max_unseen frames (they are at the front of the ordered dict)
+    def evict(self, frame_num):
+        while self.tracks:
+            track_id, track = next(iter(self.tracks.items()))
+            if track["last_seen"] is not None and frame_num - track["last_seen"] <= self.max_unseen:
+                break
+            self.tracks.popitem(last=False)
+
+    def get_team(self, track_id):
+        if track_id in self.team_overrides:
+            return self.team_overrides[track_id]
+        return self.tracks[track_id]["team"]
@@ -1,71 +1,103 @@
-from sklearn.cluster import KMeans
+import numpy as np
+from .color_extractor import JerseyColorExtractor
+from .online_team_model import OnlineTeamModel
 
 class TeamAssigner:
-    def __init__(self):
+    # team_overrides: {player_id: team_id} for players the colors get wrong (e.g. goalkeepers)
+    # online: keep updating the team centers and re-voting the teams over the match (see OnlineTeamModel),
+    #         online_params are passed to OnlineTeamModel
+    def __init__(self, color_method='kmeans', color_cache_size=512, team_overrides=None, online=False, online_params=None):
         self.team_colors = {}
-        self.player_team_dict = {} # {player_id: team_id}
+        self.color_extractor = JerseyColorExtractor(method=color_method, cache_size=color_cache_size)
+        self.team_overrides = team_overrides or {}
+        self.online = online
+        self.online_params = online_params or {}
+        self.online_model = None
 
-    def get_clustering_model(self, image):
-        # Reshape image to 2D array
-        image_2d = image.reshape(-1, 3)
-
-        # Perform KMeans clustering with 2 clusters
-        kmeans = KMeans(n_clusters=2, init='k-means++', n_init=1).fit(image_2d) # n_init=1 to speed up the process
-        
-        return kmeans
-
-    # Same steps as in color_analysis done on ipynb
+    # Same steps as in color_analysis done on ipynb, through the batched color extractor
     def get_player_color(self, frame, bbox):
-        image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]
-        top_half_image = image[0:image.shape[0]//2, :]
-
-        # Get clustering model
-        kmeans = self.get_clustering_model(top_half_image)
-
-        # Get cluster labels for each pixel
-        labels = kmeans.labels_
-
-        # Reshape labels to the image shape
-        clustered_image = labels.reshape(top_half_image.shape[0], top_half_image.shape[1])
-
-        # Get the player cluster
-        corner_clusters = [clustered_image[0, 0], clustered_image[0, -1], clustered_image[-1, 0], clustered_image[-1, -1]]
-        non_player_cluster = max(set(corner_clusters), key=corner_clusters.count)
-        player_cluster = 1 if non_player_cluster == 0 else 0   # Same as 1 - non_player_cluster
-
-        # Get the player color
-        player_color = kmeans.cluster_centers_[player_cluster]
-
-        return player_color
-
+        return self.color_extractor.get_colors(frame, [bbox])[0]
 
     def assign_team_color(self, frame, player_detections):
-        player_colors = []
-        for track_id, player_detections in player_detections.items():
-            bbox = player_detections['bbox']
-            player_color = self.get_player_color(frame, bbox)
-            player_colors.append(player_color)
+        from sklearn.cluster import KMeans # Slow to import, only needed once per video
+
+        track_ids = list(player_detections.keys())
+        bboxes = [player_detections[track_id]['bbox'] for track_id in track_ids]
+        player_colors = self.color_extractor.get_colors(frame, bboxes, track_ids)
 
         kmeans = KMeans(n_clusters=2, init='k-means++', n_init = 5).fit(player_colors)
 
         self.kmeans = kmeans
-
-        self.team_colors[1] = kmeans.cluster_centers_[0]
-        self.team_colors[2] = kmeans.cluster_centers_[1]
-
-    def get_player_team(self, frame, player_bbox, player_id):
-        if player_id in self.player_team_dict:
-            return self.player_team_dict[player_id]
-        
-        player_color = self.get_player_color(frame, player_bbox)
-
-        team_id = self.kmeans.predict(player_color.reshape(1,-1))[0]
-        team_id += 1  # Player is 0 or 1, Team is 1 or 2
-
-        # Hardcoded goalkeeper team assignment
-        if player_id == 94:
-            team_id = 1
-
-        self.player_team_dict[player_id] = team_id
-
-        return team_id
+        self.team_centers = kmeans.cluster_centers_.astype(np.float32)
+
+        # float64 like the online centers, OpenCV does not take float32 arrays as colors
+        self.team_colors[1] = kmeans.cluster_centers_[0].astype(np.float64)
+        self.team_colors[2] = kmeans.cluster_centers_[1].astype(np.float64)
+
+        if self.online:
+            self.online_model = OnlineTeamModel(self.team_centers, team_overrides=self.team_overrides, **self.online_params)
+
+    # Nearest team center of each color, a plain distance check instead of KMeans.predict per player
+    def predict_teams(self, player_colors):
+        distances = ((np.asarray(player_colors, dtype=np.float32)[:, None, :] - self.team_centers[None, :, :]) ** 2).sum(axis=2)
+        return np.argmin(distances, axis=1) + 1  # Player is 0 or 1, Team is 1 or 2
+
+    # frame_num is needed in online mode, like for get_frame_teams
+    def get_player_team(self, frame, player_bbox, player_id, frame_num=None):
+        return self.get_frame_teams(frame, {player_id: {'bbox': player_bbox}}, frame_num)[player_id]
+
+    # Teams of all the players of a frame ({player_id: {'bbox': ...}}). The colors of the players seen before
+    # come from the color cache, only the new ones are cropped, together in one batch. frame_num is needed in
+    # online mode.
+    def get_frame_teams(self, frame, player_track, frame_num=None):
+        if self.online_model is not None:
+            return self.get_online_frame_teams(frame, player_track, frame_num)
+
+        player_ids = list(player_track)
+        # Only the players missing from the cache need their bbox
+        cached = self.color_extractor.color_cache
+        bboxes = [None if player_id in cached else player_track[player_id]['bbox'] for player_id in player_ids]
+        player_colors = self.color_extractor.get_colors(frame, bboxes, player_ids)
+        team_ids = self.predict_teams(player_colors) if player_ids else []
+
+        frame_teams = {}
+        for player_id, team_id in zip(player_ids, team_ids):
+            frame_teams[player_id] = self.team_overrides.get(player_id, int(team_id))
+        return frame_teams
+
+    # On sampled frames every visible player is classified again and the team centers are updated,
+    # otherwise only new players are. The cost per frame only depends on the players in it.
+    def get_online_frame_teams(self, frame, player_track, frame_num):
+        if frame_num is None:
+            raise ValueError("frame_num is needed to assign teams in online mode")
+        model = self.online_model
+        player_ids = list(player_track)
+
+        if model.is_sample_frame(frame_num):
+            classify_ids = player_ids
+        else:
+            classify_ids = [player_id for player_id in player_ids if player_id not in model.tracks]
+
+        if classify_ids:
+            # Fresh colors, the per-track color cache would hide lighting changes
+            player_colors = self.color_extractor.get_colors(frame, [player_track[player_id]['bbox'] for player_id in classify_ids])
+            if model.is_sample_frame(frame_num):
+                model.partial_fit(player_colors)
+                self.team_colors[1] = model.centers[0].astype(np.float64)
+                self.team_colors[2] = model.centers[1].astype(np.float64)
+            model.vote(classify_ids, model.predict(player_colors))
+
+        model.mark_seen(frame_num, player_ids)
+        model.evict(frame_num)
+
+        return {player_id: model.get_team(player_id) for player_id in player_ids}
+
+# "PLAYER_ID:TEAM_ID" of a team override given on the command line
+def parse_team_override(value):
+    try:
+        player_id, team_id = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise ValueError(f"Unknown team override: {value} (expected PLAYER_ID:TEAM_ID)")
+    if team_id not in (1, 2):
+        raise ValueError(f"Unknown team: {team_id}")
+    return player_id, team_id
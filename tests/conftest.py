@@ -0,0 +1,25 @@
+import os
+import pickle
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+STUBS_DIR = os.path.join(REPO_ROOT, 'stubs')
+
+def load_stub(name):
+    path = os.path.join(STUBS_DIR, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not found")
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+# Tracks of the sample video as nested dicts, shared by the tests: copy them before changing them
+@pytest.fixture(scope='session')
+def stub_tracks():
+    return load_stub('track_stubs.pkl')
+
+@pytest.fixture(scope='session')
+def stub_camera_movement():
+    return load_stub('camera_movement_stub.pkl')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from trackers import Tracker, BallGapFiller
+
+# BallGapFiller (and Tracker.interpolate_ball_position on top of it) against the pandas interpolation it
+# replaced: linear between detections, forward fill after the last one and back fill before the first one.
+
+def pandas_interpolation(ball_positions):
+    pd = pytest.importorskip('pandas')
+    ball_positions = [x.get(1, {}).get('bbox', []) for x in ball_positions]
+    df_ball_positions = pd.DataFrame(ball_positions, columns=['x1', 'y1', 'x2', 'y2'])
+    df_ball_positions = df_ball_positions.interpolate()
+    df_ball_positions = df_ball_positions.bfill()
+    return [{1: {"bbox": x}} for x in df_ball_positions.to_numpy().tolist()]
+
+def assert_same_balls(ball_positions, expected):
+    assert len(ball_positions) == len(expected)
+    for frame_num, (ball, expected_ball) in enumerate(zip(ball_positions, expected)):
+        np.testing.assert_allclose(ball[1]['bbox'], expected_ball[1]['bbox'], atol=1e-6, err_msg=str(frame_num))
+
+def synthetic_balls(num_frames, detected_frames):
+    return [{1: {"bbox": [frame_num * 3.0, frame_num * 2.0, frame_num * 3.0 + 10, frame_num * 2.0 + 10]}} if frame_num in detected_frames else {}
+            for frame_num in range(num_frames)]
+
+def test_stub_ball_matches_pandas(stub_tracks):
+    ball_positions = stub_tracks['ball']
+    assert_same_balls(Tracker('models/best.pt').interpolate_ball_position(ball_positions), pandas_interpolation(ball_positions))
+
+@pytest.mark.parametrize('detected_frames', [
+    {0, 5, 6, 20},          # gaps of several lengths
+    {4, 9},                 # leading and trailing gaps
+    {7},                    # a single detection
+    set(range(0, 30, 2)),   # every other frame
+])
+def test_gaps_match_pandas(detected_frames):
+    ball_positions = synthetic_balls(30, detected_frames)
+    assert_same_balls(Tracker('models/best.pt').interpolate_ball_position(ball_positions), pandas_interpolation(ball_positions))
+
+def test_streamed_frames_are_emitted_in_order():
+    ball_gap_filler = BallGapFiller()
+    emitted = []
+    for frame_num, ball in enumerate(synthetic_balls(30, {3, 10, 11, 25})):
+        emitted += ball_gap_filler.push(frame_num, ball[1]['bbox'] if 1 in ball else None)
+    emitted += ball_gap_filler.flush()
+    assert [frame_num for frame_num, bbox in emitted] == list(range(30))
+
+def test_max_gap_keeps_the_last_ball():
+    ball_gap_filler = BallGapFiller(max_gap=3)
+    assert ball_gap_filler.push(0, [0, 0, 10, 10]) == [(0, [0, 0, 10, 10])]
+    emitted = []
+    for frame_num in range(1, 6):
+        emitted += ball_gap_filler.push(frame_num, None)
+    # Frames 1 and 2 could not wait for the next detection any longer
+    assert emitted == [(1, [0, 0, 10, 10]), (2, [0, 0, 10, 10])]
+    emitted = ball_gap_filler.push(6, [60, 0, 70, 10])
+    # Interpolated from the last emitted ball, frame 2
+    assert [frame_num for frame_num, bbox in emitted] == [3, 4, 5, 6]
+    np.testing.assert_allclose(emitted[0][1], [15, 0, 25, 10])
+
+def test_jumps_are_treated_as_misses():
+    ball_gap_filler = BallGapFiller(max_jump=50)
+    ball_gap_filler.push(0, [0, 0, 10, 10])
+    assert ball_gap_filler.push(1, [500, 0, 510, 10]) == []
+    emitted = ball_gap_filler.push(2, [20, 0, 30, 10])
+    np.testing.assert_allclose(emitted[0][1], [10, 0, 20, 10])
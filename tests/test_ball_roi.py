@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from trackers import BallTrajectory, TwoTierInferenceEngine, format_roi_stats
+from trackers.ball_roi import input_pixels
+
+def ball_bbox(center, size=10):
+    return [center[0] - size / 2, center[1] - size / 2, center[0] + size / 2, center[1] + size / 2]
+
+def test_trajectory_prediction():
+    trajectory = BallTrajectory(history=3, max_lost=12)
+    assert trajectory.predict(0) is None
+    trajectory.observe(0, ball_bbox((100, 50)))
+    np.testing.assert_allclose(trajectory.predict(1), [100, 50]) # One sighting: no velocity yet
+
+    # Frames in the video, with gaps when the ball is not detected
+    for frame_num in (2, 3, 6):
+        trajectory.observe(frame_num, ball_bbox((100 + 10 * frame_num, 50 - 2 * frame_num)))
+    assert sorted(trajectory.centers) == [2, 3, 6] # Only the last `history` sightings
+    np.testing.assert_allclose(trajectory.predict(10), [200, 30])
+    assert trajectory.predict(18) is not None
+    assert trajectory.predict(19) is None # Lost for more than max_lost frames
+
+    trajectory.reset()
+    assert trajectory.predict(7) is None
+
+def test_input_pixels():
+    assert input_pixels((1080, 1920), 640) == 640 * 384 # 360 rows padded to the stride
+    assert input_pixels((256, 256), 256) == 256 * 256
+
+@pytest.mark.parametrize('center, expected', [
+    ((960, 540), (832, 412, 1088, 668)),
+    ((10, 10), (0, 0, 256, 256)),
+    ((1915, 1075), (1664, 824, 1920, 1080)),
+])
+def test_crop_window(center, expected):
+    engine = TwoTierInferenceEngine(model=None, crop_size=256)
+    assert engine.crop_window((1080, 1920, 3), center) == expected
+
+def test_crop_window_of_a_small_frame():
+    engine = TwoTierInferenceEngine(model=None, crop_size=256)
+    assert engine.crop_window((200, 300, 3), (150, 100)) == (22, 0, 278, 200)
+
+# The full frame pass of a model with its own preprocessing is prepared at the low resolution
+def test_full_pass_preprocessed_at_imgsz():
+    class Model:
+        def preprocess(self, frames, imgsz=None):
+            return ('blob', len(frames), imgsz)
+
+        def predict_preprocessed(self, prepared, conf=0.25):
+            return []
+
+    engine = TwoTierInferenceEngine(Model(), imgsz=480)
+    assert engine.prepare_batch([np.zeros((1080, 1920, 3), dtype=np.uint8)] * 2) == ('blob', 2, 480)
+
+def test_roi_stats():
+    stats = {"roi_frames": 100, "crops": 90, "crop_balls": 70, "full_balls": 10, "pixels": 25_600_000}
+    assert format_roi_stats(stats) == ("Two-tier detection: 100 frames, crop pass on 90 (90.0%), ball from the crop on 70 "
+                                       "and from the full frame on 10 (80.0% of the frames), 256k input pixels per frame")
@@ -0,0 +1,55 @@
+import threading
+import numpy as np
+from trackers.batch_inference import BatchInferenceEngine
+
+# Model with its own preprocess step, like OnnxDetector. Its results are (frame value, conf).
+class PreprocessingModel:
+    def __init__(self, out_of_memory_above=None):
+        self.out_of_memory_above = out_of_memory_above
+        self.preprocess_threads = []
+        self.predict_threads = []
+
+    def preprocess(self, frames, imgsz=None):
+        self.preprocess_threads.append(threading.current_thread())
+        return np.stack(frames)
+
+    def predict_preprocessed(self, blob, conf=0.25):
+        self.predict_threads.append(threading.current_thread())
+        if self.out_of_memory_above is not None and len(blob) > self.out_of_memory_above:
+            raise RuntimeError("CUDA out of memory")
+        return [(int(frame[0, 0]), conf) for frame in blob]
+
+    def predict(self, frames, conf=0.25):
+        return self.predict_preprocessed(self.preprocess(frames), conf)
+
+class PlainModel:
+    def predict(self, frames, conf=0.25):
+        return [(int(frame[0, 0]), conf) for frame in frames]
+
+def frames(num_frames):
+    return [np.full((4, 4), frame_num, dtype=np.uint8) for frame_num in range(num_frames)]
+
+def test_preprocess_runs_off_the_consumer_thread():
+    model = PreprocessingModel()
+    engine = BatchInferenceEngine(model, conf=0.3, batch_size=4, adaptive=False)
+    detections = list(engine.iter_detections(iter(frames(10))))
+
+    assert detections == [(frame_num, 0.3) for frame_num in range(10)]
+    assert len(model.preprocess_threads) == 3
+    assert threading.current_thread() not in model.preprocess_threads
+    assert set(model.preprocess_threads).isdisjoint(model.predict_threads)
+    assert engine.stats["frames"] == 10 and engine.stats["batches"] == 3
+
+def test_models_without_preprocess():
+    engine = BatchInferenceEngine(PlainModel(), batch_size=3, adaptive=False)
+    assert list(engine.iter_detections(iter(frames(7)))) == [(frame_num, 0.1) for frame_num in range(7)]
+    assert engine.stats["preprocess"] < 0.1
+
+# A batch out of memory is prepared again in halves
+def test_out_of_memory_split_of_a_prepared_batch():
+    model = PreprocessingModel(out_of_memory_above=2)
+    engine = BatchInferenceEngine(model, batch_size=8, adaptive=False)
+    detections = list(engine.iter_detections(iter(frames(8))))
+
+    assert detections == [(frame_num, 0.1) for frame_num in range(8)]
+    assert engine.batch_size.batch_size <= 4
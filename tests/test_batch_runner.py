@@ -0,0 +1,106 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import pipeline.batch_runner as batch_runner
+from pipeline import BatchRunner, load_batch, format_batch_progress
+
+def touch(path, content=b''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+def test_load_directory(tmp_path):
+    touch(tmp_path / 'b.mp4')
+    touch(tmp_path / 'a.MOV')
+    touch(tmp_path / 'a.json')
+    touch(tmp_path / 'notes.txt')
+    assert load_batch(str(tmp_path)) == [
+        {"video": str(tmp_path / 'a.MOV'), "calibration": str(tmp_path / 'a.json'), "name": 'a'},
+        {"video": str(tmp_path / 'b.mp4'), "calibration": None, "name": 'b'},
+    ]
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path / 'batch.json'
+    manifest.write_text(json.dumps(['videos/one.mp4', {"video": 'videos/two.mp4', "calibration": 'stadium.json', "name": 'final'}]))
+    assert load_batch(str(manifest)) == [
+        {"video": str(tmp_path / 'videos' / 'one.mp4'), "calibration": None, "name": 'one'},
+        {"video": str(tmp_path / 'videos' / 'two.mp4'), "calibration": str(tmp_path / 'stadium.json'), "name": 'final'},
+    ]
+
+    manifest.write_text(json.dumps(['day1/match.mp4', 'day2/match.mp4']))
+    with pytest.raises(ValueError, match='match'):
+        load_batch(str(manifest))
+
+# Stands in for the StreamingPipeline of a worker: videos whose content is "broken" fail, the others
+# give one frame per byte
+class FakePipeline:
+    def __init__(self):
+        self.possession = self
+        self.calibrations = []
+
+    def reset(self, calibration_path=None):
+        self.calibrations.append(calibration_path)
+
+    def run(self, video_path, output_video_path=None, overlay_path=None, **kwargs):
+        with open(video_path, 'rb') as f:
+            content = f.read()
+        if content == b'broken':
+            raise ValueError("Could not decode the video")
+        self.frame_count = len(content)
+        with open(output_video_path or overlay_path, 'w') as f:
+            f.write('output')
+        stats = {"consumer_wait": 0.0, "producer_wait": 0.0}
+        return {"read": stats, "write": stats}
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({}, f)
+
+# The process pool replaced by threads sharing one fake pipeline
+class InlineExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers, initializer, initargs):
+        super().__init__(max_workers=1)
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(batch_runner, 'worker_pipeline', FakePipeline())
+    monkeypatch.setattr(batch_runner, 'ProcessPoolExecutor', InlineExecutor)
+
+@pytest.mark.parametrize('output_params, output_name', [(None, 'output_video.avi'), ({'tracks_only': True}, 'overlay.jsonl'),
+                                                        ({'encoder': 'ffmpeg', 'encoder_params': {'codec': 'libvpx-vp9'}}, 'output_video.webm')])
+def test_process_video(tmp_path, fake_workers, output_params, output_name):
+    video = touch(tmp_path / 'match.mp4', b'12345')
+    result = batch_runner.process_video({"video": str(video), "calibration": 'stadium.json', "name": 'match'}, str(tmp_path / 'out'), output_params)
+    assert result["status"] == 'done' and result["frames"] == 5
+    assert result["output"] == str(tmp_path / 'out' / 'match' / output_name)
+    assert sorted(os.listdir(tmp_path / 'out' / 'match')) == sorted([output_name, 'possession.json'])
+    assert batch_runner.worker_pipeline.calibrations == ['stadium.json']
+
+def test_failed_video_keeps_no_output(tmp_path, fake_workers):
+    video = touch(tmp_path / 'match.mp4', b'broken')
+    result = batch_runner.process_video({"video": str(video), "calibration": None, "name": 'match'}, str(tmp_path / 'out'))
+    assert result["status"] == 'failed' and 'Could not decode the video' in result["error"]
+    assert not [name for name in os.listdir(tmp_path / 'out' / 'match') if not name.endswith('.tmp.avi')]
+
+def test_resume(tmp_path, fake_workers):
+    for name, content in (('a', b'123'), ('b', b'broken'), ('c', b'12')):
+        touch(tmp_path / 'videos' / f'{name}.mp4', content)
+    jobs = load_batch(str(tmp_path / 'videos'))
+    runner = BatchRunner('models/best.pt', str(tmp_path / 'out'), num_workers=2)
+    finished = []
+    progress = runner.run(jobs, on_result=lambda name, result: finished.append(name))
+    assert sorted(finished) == ['a', 'b', 'c']
+    assert {name: result["status"] for name, result in progress.items()} == {'a': 'done', 'b': 'failed', 'c': 'done'}
+    assert json.loads((tmp_path / 'out' / 'batch_progress.json').read_text()).keys() == progress.keys()
+
+    # Only the failed video runs again, and all of them without resume
+    touch(tmp_path / 'videos' / 'b.mp4', b'1234')
+    progress = runner.run(jobs)
+    assert runner.processed == ['b'] and progress['b']["status"] == 'done'
+    runner.run(jobs, resume=False)
+    assert runner.processed == ['a', 'b', 'c']
+
+    report = format_batch_progress(progress, elapsed=2.0, processed=['b'])
+    assert report.splitlines()[0] == "Batch:  3 done, 0 failed, 9 frames"
+    assert report.splitlines()[1] == "Time:   1 videos in 2.0s, 2.0 fps over all workers"
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+from camera_movement_estimator import CameraMovementEstimator
+from utils import TrackTable, measure_distance, measure_xy_distance
+
+# Textured frames panning 2 pixels per frame, wide enough for both feature strips of the mask
+@pytest.fixture(scope='module')
+def panning_frames():
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur((rng.random((300, 1100, 3)) * 255).astype(np.uint8), (5, 5), 0)
+    return [np.roll(texture, 2 * frame_num, axis=1) for frame_num in range(30)]
+
+# The loop over the features of the original estimator
+def reference_camera_movement(estimator, frames):
+    camera_movement = [[0, 0]] * len(frames)
+    old_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
+    old_features = cv2.goodFeaturesToTrack(old_gray, **estimator.features)
+    for frame_num in range(1, len(frames)):
+        frame_gray = cv2.cvtColor(frames[frame_num], cv2.COLOR_BGR2GRAY)
+        new_features, status, error = cv2.calcOpticalFlowPyrLK(old_gray, frame_gray, old_features, None, **estimator.lk_params)
+        max_distance = 0
+        camera_movement_x, camera_movement_y = 0, 0
+        for new, old in zip(new_features, old_features):
+            distance = measure_distance(new.ravel(), old.ravel())
+            if distance > max_distance:
+                max_distance = distance
+                camera_movement_x, camera_movement_y = measure_xy_distance(old.ravel(), new.ravel())
+        if max_distance < estimator.minimum_distance:
+            camera_movement[frame_num] = [camera_movement_x, camera_movement_y]
+            old_features = cv2.goodFeaturesToTrack(frame_gray, **estimator.features)
+        old_gray = frame_gray.copy()
+    return camera_movement
+
+def test_max_mode_matches_the_original_loop(panning_frames):
+    estimator = CameraMovementEstimator(panning_frames[0])
+    camera_movement = estimator.get_camera_movement(panning_frames)
+    expected = reference_camera_movement(CameraMovementEstimator(panning_frames[0]), panning_frames)
+    # Features whose displacements only differ by float32 rounding can be picked the other way round
+    np.testing.assert_allclose(np.asarray(camera_movement, dtype=np.float64), np.asarray(expected, dtype=np.float64), atol=1e-2)
+    assert np.abs(np.asarray(camera_movement)[1:, 0]).mean() > 1
+
+@pytest.mark.parametrize('params', [dict(mode='affine'), dict(mode='affine', pyramid_level=1), dict(pyramid_level=1)])
+def test_modes_follow_the_pan(panning_frames, params):
+    camera_movement = np.asarray(CameraMovementEstimator(panning_frames[0], **params).get_camera_movement(panning_frames))
+    np.testing.assert_allclose(camera_movement[1:, 0], -2, atol=0.5)
+    np.testing.assert_allclose(camera_movement[1:, 1], 0, atol=0.5)
+
+def test_unknown_mode(panning_frames):
+    with pytest.raises(ValueError):
+        CameraMovementEstimator(panning_frames[0], mode='homography')
+
+# Frame by frame estimation gives the same movement as the whole video
+def test_stream_matches_video(panning_frames):
+    expected = CameraMovementEstimator(panning_frames[0], mode='affine').get_camera_movement(panning_frames)
+    estimator = CameraMovementEstimator(panning_frames[0], mode='affine')
+    estimator.reset_stream(panning_frames[0])
+    camera_movement = [[0, 0]] + [estimator.get_frame_camera_movement(frame) for frame in panning_frames[1:]]
+    np.testing.assert_allclose(camera_movement, expected)
+
+def test_adjusted_positions(panning_frames):
+    tracks = {'players': [{1: {'bbox': [0.0, 0.0, 10.0, 20.0], 'position': (5, 20)}}, {1: {'bbox': [2.0, 0.0, 12.0, 20.0], 'position': (7, 20)}}],
+              'referees': [{}, {}], 'ball': [{}, {}]}
+    table = TrackTable.from_tracks(tracks)
+    camera_movement = [[0, 0], [-2.0, 0.5]]
+    estimator = CameraMovementEstimator(panning_frames[0])
+    estimator.add_adjust_positions_to_trackers(tracks, camera_movement)
+    estimator.add_adjust_positions_to_trackers(table, camera_movement)
+    assert tracks['players'][1][1]['position_adjusted'] == (9.0, 19.5)
+    assert table['players'][1][1]['position_adjusted'] == (9.0, 19.5)
@@ -0,0 +1,65 @@
+import pytest
+from utils import PipelineCache
+from trackers import Tracker
+from trackers.onnx_detector import resolve_onnx_path
+
+def empty_tracks(num_frames=3):
+    return {object: [{} for _ in range(num_frames)] for object in ('players', 'referees', 'ball')}
+
+@pytest.fixture
+def model_dir(tmp_path):
+    for name in ('best.pt', 'best.onnx', 'best_int8.onnx', 'video.mp4'):
+        (tmp_path / name).write_bytes(name.encode())
+    return tmp_path
+
+def test_resolve_onnx_path():
+    assert resolve_onnx_path('models/best.pt') == 'models/best.onnx'
+    assert resolve_onnx_path('models/best.pt', 'fp16') == 'models/best.onnx'
+    assert resolve_onnx_path('models/best.pt', 'int8') == 'models/best_int8.onnx'
+    assert resolve_onnx_path('models/best_int8.onnx', 'int8') == 'models/best_int8.onnx'
+    assert resolve_onnx_path('models/best.xml', 'int8') == 'models/best.xml'
+
+@pytest.mark.parametrize('backend, precision, expected', [
+    ('ultralytics', None, ['best.pt']),
+    ('onnxruntime', 'fp32', ['best.onnx']),
+    ('onnxruntime', 'fp16', ['best.onnx']),
+    ('onnxruntime', 'int8', ['best_int8.onnx']),
+])
+def test_detector_files(model_dir, backend, precision, expected):
+    backend_params = {'precision': precision} if precision else None
+    tracker = Tracker(str(model_dir / 'best.pt'), backend=backend, backend_params=backend_params)
+    assert tracker.detector_files() == [str(model_dir / name) for name in expected]
+    assert tracker.model is None
+
+# The cached tracks of a backend follow the model file it runs, not the .pt weights
+@pytest.mark.parametrize('precision, changed_file', [('fp32', 'best.onnx'), ('int8', 'best_int8.onnx')])
+def test_track_cache_follows_the_backend_model(model_dir, monkeypatch, precision, changed_file):
+    cache = PipelineCache(str(model_dir / 'cache'))
+    video_path = str(model_dir / 'video.mp4')
+    detections = []
+
+    def get_object_track(frames, camera_movement_per_frame=None):
+        detections.append(len(frames))
+        return empty_tracks(len(frames))
+
+    def get_track_table(precision):
+        tracker = Tracker(str(model_dir / 'best.pt'), backend='onnxruntime', backend_params={'precision': precision})
+        monkeypatch.setattr(tracker, 'get_object_track', get_object_track)
+        return tracker.get_track_table([None] * 3, video_path=video_path, cache=cache)
+
+    get_track_table(precision)
+    get_track_table(precision)
+    assert len(detections) == 1
+
+    # Another precision is another model
+    get_track_table('fp16')
+    assert len(detections) == 2
+
+    (model_dir / changed_file).write_bytes(b'new weights')
+    get_track_table(precision)
+    assert len(detections) == 3
+
+    # The .pt weights are not what the backend runs
+    (model_dir / 'best.pt').write_bytes(b'retrained')
+    get_track_table(precision)
+    assert len(detections) == 3
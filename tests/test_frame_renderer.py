@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+from player_ball_assigner import PossessionStats
+from renderer import FrameRenderer, LAYERS
+from renderer.frame_renderer import FONT
+
+def random_frame(seed=0, shape=(1080, 1920, 3)):
+    return np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+
+# The panels as they were drawn before the labels were cached: a filled copy of the whole frame blended
+# with addWeighted, then the labels and values in one putText each
+def reference_panel(frame, top_left, bottom_right, alpha, lines):
+    overlay = frame.copy()
+    cv2.rectangle(overlay, top_left, bottom_right, (255, 255, 255), -1)
+    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    for text, origin in lines:
+        cv2.putText(frame, text, origin, FONT, 1, (0, 0, 0), 3)
+
+def test_ball_control_panel_matches_reference():
+    possession = PossessionStats.from_team_ball_control([1, 1, 2, 0, 2, 2, 1], frame_rate=24)
+    renderer = FrameRenderer(['ball_control'])
+    for frame_num in range(7):
+        frame = random_frame(frame_num)
+        expected = frame.copy()
+        team_1, team_2 = possession.get_possession(frame_num)
+        reference_panel(expected, (1350, 850), (1900, 970), 0.4, [(f"Team 1 Ball Control: {team_1*100:.2f}%", (1400, 900)),
+                                                                  (f"Team 2 Ball Control: {team_2*100:.2f}%", (1400, 950))])
+        renderer.render(frame, frame_num, {}, {}, {}, possession)
+        np.testing.assert_array_equal(frame, expected)
+
+@pytest.mark.parametrize('camera_movement', [(0.0, 0.0), (-12.345, 3.5), (100.25, -0.75)])
+def test_camera_movement_panel_matches_reference(camera_movement):
+    frame = random_frame()
+    expected = frame.copy()
+    reference_panel(expected, (0, 0), (500, 100), 0.6, [(f"Camera Movement X: {camera_movement[0]:.2f}", (10, 30)),
+                                                        (f"Camera Movement Y: {camera_movement[1]:.2f}", (10, 80))])
+    FrameRenderer(['camera_movement']).render(frame, 0, {}, {}, {}, camera_movement=camera_movement)
+    np.testing.assert_array_equal(frame, expected)
+
+# Frames smaller than the panel positions: the panels are clipped, nothing fails
+def test_small_frame():
+    frame = random_frame(shape=(480, 640, 3))
+    possession = PossessionStats.from_team_ball_control([1, 2], frame_rate=24)
+    FrameRenderer().render(frame, 1, {}, {}, {}, possession, (1.0, 2.0))
+
+def test_layers_switch_on_and_off():
+    players = {7: {'bbox': [100, 100, 140, 200], 'team_color': (255, 0, 0), 'has_ball': True, 'speed': 12.5, 'distance': 30.0}}
+    referees = {3: {'bbox': [300, 100, 340, 200]}}
+    ball = {1: {'bbox': [500, 500, 510, 510]}}
+    frame = random_frame()
+
+    renderer = FrameRenderer([])
+    untouched = frame.copy()
+    assert renderer.render(untouched, 0, players, referees, ball) is untouched
+    np.testing.assert_array_equal(untouched, frame)
+
+    for layer in ('players', 'referees', 'ball', 'speed'):
+        renderer = FrameRenderer([layer])
+        drawn = frame.copy()
+        renderer.render(drawn, 0, players, referees, ball)
+        assert (drawn != frame).any(), layer
+        renderer.disable(layer)
+        drawn = frame.copy()
+        renderer.render(drawn, 0, players, referees, ball)
+        np.testing.assert_array_equal(drawn, frame)
+
+    with pytest.raises(ValueError):
+        FrameRenderer(['missing'])
+    assert set(LAYERS) == set(FrameRenderer().layers)
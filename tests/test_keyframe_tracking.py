@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pytest
+from trackers import compare_tracks
+from trackers.keyframe_tracking import KeyframeScheduler, BoxPropagator, box_iou
+
+def textured_frame(seed=0, size=(360, 640)):
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur((rng.random(size + (3,)) * 255).astype(np.uint8), (5, 5), 0)
+
+def test_keyframes_every_stride():
+    frames = [textured_frame()] * 10
+    assert KeyframeScheduler(stride=4).select_keyframes(frames) == [0, 4, 8]
+    assert KeyframeScheduler(stride=1).select_keyframes(frames) == list(range(10))
+
+def test_keyframes_on_scene_changes_and_fast_camera_moves():
+    frames = [textured_frame(0)] * 5 + [textured_frame(1) // 3] * 5 # Cut to a darker scene at frame 5
+    assert KeyframeScheduler(stride=4).select_keyframes(frames) == [0, 4, 5, 9]
+
+    camera_movement = [[0, 0]] * 10
+    camera_movement[2] = [15, 20] # 25 pixels in one frame
+    assert KeyframeScheduler(stride=4).select_keyframes([textured_frame()] * 10, camera_movement) == [0, 2, 6]
+
+# Boxes follow the content they cover, lost points fall back to the camera movement
+def test_box_propagation():
+    texture = textured_frame()
+    previous_gray = cv2.cvtColor(texture, cv2.COLOR_BGR2GRAY)
+    gray = cv2.cvtColor(np.roll(texture, (3, 5), axis=(0, 1)), cv2.COLOR_BGR2GRAY)
+    frame_tracks = {'players': {7: {'bbox': [100.0, 100.0, 160.0, 220.0]}}, 'referees': {3: {'bbox': [300.0, 50.0, 340.0, 150.0]}},
+                    'ball': {1: {'bbox': [10.0, 10.0, 20.0, 20.0]}}}
+
+    propagated = BoxPropagator().propagate(previous_gray, gray, frame_tracks, camera_movement=(-4, -2))
+    np.testing.assert_allclose(propagated['players'][7]['bbox'], [105, 103, 165, 223], atol=0.2)
+    np.testing.assert_allclose(propagated['referees'][3]['bbox'], [305, 53, 345, 153], atol=0.2)
+    assert propagated['ball'] == {}
+
+    # A flat image has nothing to track
+    flat = np.full_like(previous_gray, 128)
+    propagated = BoxPropagator().propagate(flat, flat, frame_tracks, camera_movement=(-4, -2))
+    np.testing.assert_allclose(propagated['players'][7]['bbox'], [104, 102, 164, 222])
+
+    assert BoxPropagator().propagate(previous_gray, gray, {'players': {}}) == {'players': {}, 'referees': {}, 'ball': {}}
+
+def test_box_iou():
+    ious = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    np.testing.assert_allclose(ious, [[1.0, 1 / 3, 0.0]])
+
+def test_compare_tracks():
+    reference = {'players': [{1: {'bbox': [0, 0, 10, 10]}, 2: {'bbox': [50, 50, 60, 60]}}], 'referees': [{}],
+                 'ball': [{1: {'bbox': [100, 100, 104, 104]}}]}
+    tracks = {'players': [{5: {'bbox': [1, 0, 11, 10]}}], 'referees': [{}], 'ball': [{1: {'bbox': [101, 100, 105, 104]}}]}
+    comparison = compare_tracks(reference, tracks)
+    assert comparison['players']['recall'] == 0.5 and comparison['players']['precision'] == 1.0
+    assert comparison['players']['mean_iou'] == pytest.approx(90 / 110)
+    assert comparison['ball']['mean_center_error'] == pytest.approx(1.0)
+    assert comparison['referees'] == {'recall': 1.0, 'precision': 1.0, 'mean_iou': 0.0, 'mean_center_error': 0.0}
@@ -0,0 +1,55 @@
+import threading
+import time
+import numpy as np
+import utils.video_io as video_io
+from utils import LiveVideoReader
+
+# Stand-in for cv2.VideoCapture of a live feed: a few frames, then read() blocks until `unblock` is set
+class StalledCapture:
+    unblock = threading.Event()
+
+    def __init__(self, source):
+        self.frames_left = 3
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 25.0
+
+    def read(self):
+        if self.frames_left > 0:
+            self.frames_left -= 1
+            return True, np.zeros((4, 4, 3), dtype=np.uint8)
+        self.unblock.wait()
+        return False, None
+
+    def release(self):
+        self.released = True
+
+def test_close_does_not_hang_on_a_stalled_read(monkeypatch):
+    monkeypatch.setattr(video_io.cv2, 'VideoCapture', StalledCapture)
+    StalledCapture.unblock.clear()
+    reader = LiveVideoReader('rtsp://camera', queue_size=8)
+    while reader.stats["captured"] < 3:
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    reader.close(timeout=0.2)
+    assert time.perf_counter() - start < 1.0
+    assert reader.thread.is_alive() and not reader.cap.released # Still inside read()
+
+    # The capture thread stops and releases the capture once the read returns
+    StalledCapture.unblock.set()
+    reader.thread.join(1.0)
+    assert not reader.thread.is_alive() and reader.cap.released
+
+def test_frames_are_dropped_when_the_consumer_falls_behind(monkeypatch):
+    monkeypatch.setattr(video_io.cv2, 'VideoCapture', StalledCapture)
+    StalledCapture.unblock.set() # The feed ends after its frames
+    with LiveVideoReader('0', queue_size=2) as reader:
+        reader.thread.join(1.0)
+        frames = list(reader)
+    assert reader.source == 0
+    assert len(frames) == 2 and reader.stats == {"captured": 3, "dropped": 1, "consumer_wait": reader.stats["consumer_wait"]}
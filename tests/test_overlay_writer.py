@@ -0,0 +1,86 @@
+import json
+import cv2
+import numpy as np
+import pytest
+from player_ball_assigner import PossessionStats
+from renderer import OverlayWriter, LAYERS
+from utils import TrackTable
+
+def sample_tracks(num_frames=3):
+    tracks = {'players': [], 'referees': [], 'ball': []}
+    for frame_num in range(num_frames):
+        tracks['players'].append({
+            7: {'bbox': [10.0 + frame_num, 20.0, 50.0, 120.0], 'team': 1, 'team_color': (255.0, 0.0, 0.0), 'has_ball': True,
+                'speed': 21.345, 'distance': 10.0 + frame_num},
+            9: {'bbox': [200.0, 20.0, 240.0, 120.0], 'team': 2, 'team_color': (0.0, 0.0, 255.0)},
+        })
+        tracks['referees'].append({3: {'bbox': [100.0, 20.0, 140.0, 120.0]}})
+        tracks['ball'].append({1: {'bbox': [60.0, 100.0, 70.0, 110.0]}} if frame_num != 1 else {})
+    return tracks
+
+def read_lines(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+def test_overlay_records(tmp_path):
+    path = tmp_path / 'overlay.jsonl'
+    possession = PossessionStats.from_team_ball_control([1, 1, 2])
+    with OverlayWriter(str(path), 25.0, (1920, 1080)) as writer:
+        writer.write_video(sample_tracks(), possession, [[0.5, -1.25]] * 3)
+
+    header, *records = read_lines(path)
+    assert header == {"fps": 25.0, "frame_size": [1920, 1080], "layers": list(LAYERS), "color_order": "bgr"}
+    assert [record["frame"] for record in records] == [0, 1, 2]
+    assert records[0]["players"][0] == {"id": 7, "bbox": [10.0, 20.0, 50.0, 120.0], "team": 1, "team_color": [255, 0, 0],
+                                        "has_ball": True, "speed": 21.34, "distance": 10.0}
+    assert records[0]["players"][1] == {"id": 9, "bbox": [200.0, 20.0, 240.0, 120.0], "team": 2, "team_color": [0, 0, 255], "has_ball": False}
+    assert records[0]["referees"] == [{"id": 3, "bbox": [100.0, 20.0, 140.0, 120.0]}]
+    assert records[1]["ball"] is None
+    assert records[2]["ball_control"] == [0.6667, 0.3333]
+    assert records[2]["camera_movement"] == [0.5, -1.25]
+
+def test_overlay_layers(tmp_path):
+    path = tmp_path / 'overlay.jsonl'
+    with OverlayWriter(str(path), 25.0, layers=('speed', 'ball')) as writer:
+        writer.write_video(sample_tracks(1))
+
+    header, record = read_lines(path)
+    assert header["layers"] == ['ball', 'speed']
+    assert set(record) == {"frame", "players", "ball"}
+    assert record["players"][0] == {"id": 7, "bbox": [10.0, 20.0, 50.0, 120.0], "speed": 21.34, "distance": 10.0}
+
+    with pytest.raises(ValueError):
+        OverlayWriter(str(path), 25.0, layers=('heatmap',))
+
+def test_track_table_overlay(tmp_path):
+    tracks = sample_tracks()
+    for name, video_tracks in (('dicts', tracks), ('table', TrackTable.from_tracks(tracks))):
+        with OverlayWriter(str(tmp_path / f'{name}.jsonl'), 25.0) as writer:
+            writer.write_video(video_tracks)
+    assert read_lines(tmp_path / 'dicts.jsonl') == read_lines(tmp_path / 'table.jsonl')
+
+# Tracks-only run of the streaming pipeline: the overlay is written, no frame is drawn or encoded
+def test_tracks_only_pipeline(tmp_path, monkeypatch):
+    from pipeline import StreamingPipeline
+
+    video_path = str(tmp_path / 'video.avi')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (320, 240))
+    rng = np.random.default_rng(0)
+    base = (rng.random((240, 320, 3)) * 255).astype(np.uint8)
+    for frame_num in range(8):
+        writer.write(np.roll(base, frame_num, axis=1))
+    writer.release()
+
+    tracks = sample_tracks(8)
+    pipeline = StreamingPipeline('models/best.pt')
+    monkeypatch.setattr(pipeline, 'iter_frame_tracks', lambda frames: ((frame, {object: dict(tracks[object][frame_num]) for object in tracks})
+                                                                        for frame_num, frame in enumerate(frames)))
+    monkeypatch.setattr(pipeline.renderer, 'render', lambda *args: pytest.fail("tracks-only frames are not drawn"))
+    overlay_path = tmp_path / 'overlay.jsonl'
+    pipeline.run(video_path, overlay_path=str(overlay_path))
+
+    header, *records = read_lines(overlay_path)
+    assert header["fps"] == 25.0 and header["frame_size"] == [320, 240]
+    assert [record["frame"] for record in records] == list(range(8))
+    assert all(len(record["players"]) == 2 for record in records)
+    assert pipeline.io_stats["write"]["frames"] == 0
@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+import camera_movement_estimator.parallel_camera_movement as parallel_camera_movement
+from camera_movement_estimator import CameraMovementEstimator, get_camera_movement_parallel, compare_camera_movement
+
+# A textured pitch panning 2 pixels per frame to the side, written to an MJPG video
+@pytest.fixture(scope='module')
+def panning_video(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    texture = cv2.GaussianBlur((rng.random((360, 640, 3)) * 255).astype(np.uint8), (5, 5), 0)
+    frames = [np.roll(texture, 2 * frame_num, axis=1) for frame_num in range(150)]
+    path = str(tmp_path_factory.mktemp('camera') / 'pan.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 24, (640, 360))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    # The sequential estimate runs on the decoded frames, like the workers
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return path, frames
+
+@pytest.fixture(scope='module')
+def sequential_camera_movement(panning_video):
+    _, frames = panning_video
+    return CameraMovementEstimator(frames[0]).get_camera_movement(frames)
+
+def test_parallel_matches_sequential(panning_video, sequential_camera_movement):
+    path, frames = panning_video
+    camera_movement = get_camera_movement_parallel(path, num_workers=2, chunk_size=50, overlap=12)
+    assert len(camera_movement) == len(frames)
+    assert np.abs(np.asarray(sequential_camera_movement)[1:, 0]).mean() > 1 # The camera does move
+    assert compare_camera_movement(camera_movement, sequential_camera_movement) < 0.5
+
+# The chunk starting at frame 50 comes back short after seeking. The pool runs it in a forked worker,
+# the calls made by the main process are recorded.
+estimate_chunk = parallel_camera_movement.estimate_chunk_camera_movement
+main_process_calls = []
+
+def short_after_seek(video_path, start, end, overlap, estimator_params, seek=True):
+    main_process_calls.append((start, end, seek))
+    camera_movement = estimate_chunk(video_path, start, end, overlap, estimator_params, seek)
+    return camera_movement[:-5] if start == 50 and seek else camera_movement
+
+# Only the short chunk is estimated again, without seeking
+def test_short_chunk_is_estimated_again(panning_video, sequential_camera_movement, monkeypatch):
+    path, frames = panning_video
+    monkeypatch.setattr(parallel_camera_movement, 'estimate_chunk_camera_movement', short_after_seek)
+    main_process_calls.clear()
+    camera_movement = get_camera_movement_parallel(path, num_workers=2, chunk_size=50, overlap=12)
+
+    assert len(camera_movement) == len(frames)
+    assert main_process_calls == [(50, 100, False)]
+    assert compare_camera_movement(camera_movement, sequential_camera_movement) < 0.5
+
+def test_compare_camera_movement_lengths():
+    assert compare_camera_movement([[0, 0], [1, 2]], [[0, 0], [1.5, 1]]) == 1.0
+    with pytest.raises(ValueError):
+        compare_camera_movement([[0, 0]], [[0, 0], [1, 1]])
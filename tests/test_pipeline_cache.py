@@ -0,0 +1,80 @@
+import os
+import numpy as np
+import pytest
+from utils import PipelineCache
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'frames' * 100)
+    return path
+
+def test_round_trip(tmp_path, video):
+    cache = PipelineCache(str(tmp_path / 'cache'))
+    key = cache.make_key('tracks', files=[str(video)], params={'stride': 2})
+    assert cache.get('tracks', key) is None
+
+    boxes = np.arange(12, dtype=np.float32).reshape(3, 4)
+    cache.put('tracks', key, {'boxes': boxes, 'num_frames': 3, 'names': ['ball', 'player']})
+
+    # Another instance reads the same directory
+    cached = PipelineCache(str(tmp_path / 'cache')).get('tracks', key)
+    np.testing.assert_array_equal(cached['boxes'], boxes)
+    assert isinstance(cached['boxes'], np.memmap) and not cached['boxes'].flags.writeable
+    assert cached['num_frames'] == 3 and cached['names'] == ['ball', 'player']
+    assert cache.stats == {'tracks': {'hits': 0, 'misses': 1}}
+    assert not [name for name in os.listdir(tmp_path / 'cache') if name.endswith('.tmp')]
+
+def test_keys(tmp_path, video):
+    cache = PipelineCache(str(tmp_path / 'cache'))
+    key = cache.make_key('tracks', files=[str(video)], params={'stride': 2})
+    assert cache.make_key('tracks', files=[str(video)], params={'stride': 2}) == key
+    assert cache.make_key('tracks', files=[str(video)], params={'stride': 1}) != key
+    assert cache.make_key('camera_movement', files=[str(video)], params={'stride': 2}) != key
+
+    # The key follows the content of the file, not its name or time
+    copy = video.parent / 'copy.mp4'
+    copy.write_bytes(video.read_bytes())
+    assert cache.make_key('tracks', files=[str(copy)], params={'stride': 2}) == key
+    video.write_bytes(b'other frames')
+    assert cache.make_key('tracks', files=[str(video)], params={'stride': 2}) != key
+
+    assert PipelineCache.array_digest([[1, 2], [3, 4]]) == PipelineCache.array_digest(np.array([[1, 2], [3, 4]], dtype=np.float32))
+    assert PipelineCache.array_digest([[1, 2], [3, 4]]) != PipelineCache.array_digest([1, 2, 3, 4])
+
+# An unchanged file is not read again to hash it
+def test_file_digest_is_remembered(tmp_path, video, monkeypatch):
+    cache = PipelineCache(str(tmp_path / 'cache'))
+    digest = cache.file_digest(str(video))
+    monkeypatch.setattr('builtins.open', lambda *args, **kwargs: pytest.fail("file read again"))
+    assert cache.file_digest(str(video)) == digest
+
+def test_least_recently_used_eviction(tmp_path):
+    cache = PipelineCache(str(tmp_path / 'cache'), max_size_bytes=2500)
+    array = np.zeros(100, dtype=np.float64) # About 1 kB with its header and meta.json, two fit
+    for name in ('a', 'b'):
+        cache.put('stage', name, {'values': array})
+    cache.index["entries"]['stage-a']["last_access"] += 10 # Read after b
+    cache.put('stage', 'c', {'values': array})
+
+    assert cache.get('stage', 'b') is None
+    assert cache.get('stage', 'a') is not None and cache.get('stage', 'c') is not None
+    assert not os.path.exists(cache.entry_dir('stage', 'b'))
+
+    cache.clear()
+    assert cache.get('stage', 'a') is None
+    assert cache.format_stats() == "stage: 2 hits, 2 misses"
+
+# The camera movement of a video is estimated once per set of estimator parameters
+def test_cached_camera_movement(tmp_path, video):
+    from camera_movement_estimator import CameraMovementEstimator
+
+    cache = PipelineCache(str(tmp_path / 'cache'))
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    estimates = []
+    estimate = lambda: estimates.append(1) or [[0, 0], [1.5, -2.0]]
+
+    for mode in ('max', 'max', 'affine'):
+        camera_movement = CameraMovementEstimator(frame, mode=mode).get_cached_camera_movement(cache, str(video), {}, estimate)
+        assert camera_movement == [[0, 0], [1.5, -2.0]]
+    assert len(estimates) == 2
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from utils import TrackTable
+from player_ball_assigner import PlayerBallAssigner
+
+# The vectorized ball assignment against the per-frame assignment it replaces, on the tracks of the sample video
+def test_ball_assignment_matches_per_frame(stub_tracks):
+    table = TrackTable.from_tracks(stub_tracks)
+    player_assigner = PlayerBallAssigner()
+    player_assigner.assign_ball_to_tracks(table)
+
+    for frame_num, players in enumerate(stub_tracks['players']):
+        ball = stub_tracks['ball'][frame_num]
+        expected = player_assigner.assign_ball_to_player(players, ball[1]['bbox']) if 1 in ball else -1
+        holders = [track_id for track_id, player in table['players'][frame_num].items() if player.get('has_ball', False)]
+        assert holders == ([expected] if expected != -1 else []), frame_num
+
+def crowded_players(num_frames=300, players_per_frame=30, seed=0):
+    rng = np.random.default_rng(seed)
+    player_frames = np.repeat(np.arange(num_frames), players_per_frame)
+    player_ids = np.tile(np.arange(1, players_per_frame + 1), num_frames)
+    feet = rng.uniform((0, 0), (600, 400), size=(len(player_frames), 2))
+    # Some boxes wider than a grid cell
+    half_width = rng.choice([15.0, 20.0, 90.0], size=len(player_frames), p=[0.45, 0.45, 0.1])
+    player_bboxes = np.stack([feet[:, 0] - half_width, feet[:, 1] - 80, feet[:, 0] + half_width, feet[:, 1]], axis=1)
+    ball_centers = rng.uniform((-50, -50), (650, 450), size=(num_frames, 2))
+    ball_centers[rng.random(num_frames) < 0.2] = np.nan
+    return player_frames, player_ids, player_bboxes, ball_centers
+
+@pytest.mark.parametrize('switch_margin', [0, 15])
+def test_grid_matches_brute_force(switch_margin):
+    player_assigner = PlayerBallAssigner(switch_margin=switch_margin)
+    arrays = crowded_players()
+    brute = player_assigner.assign_ball_to_players(*arrays, method='brute')
+    np.testing.assert_array_equal(player_assigner.assign_ball_to_players(*arrays, method='grid'), brute)
+    assert (brute >= 0).sum() > 100
+
+def test_grid_matches_brute_force_on_tracks(stub_tracks):
+    brute = PlayerBallAssigner().assign_ball_to_tracks(TrackTable.from_tracks(stub_tracks), method='brute')
+    grid = PlayerBallAssigner().assign_ball_to_tracks(TrackTable.from_tracks(stub_tracks), method='grid')
+    np.testing.assert_array_equal(grid, brute)
+
+# Two players next to the ball, the nearer one changing every frame by less than the switch margin
+def test_switch_margin_keeps_the_holder():
+    num_frames = 20
+    player_frames = np.repeat(np.arange(num_frames), 2)
+    player_ids = np.tile([7, 9], num_frames)
+    ball_x = np.where(np.arange(num_frames) % 2 == 0, 98.0, 102.0)
+    ball_x[15:] = 160 # Clearly nearer to player 9
+    player_bboxes = np.tile([[60, 0, 80, 100], [120, 0, 140, 100]], (num_frames, 1)).astype(np.float64)
+    ball_centers = np.stack([ball_x, np.full(num_frames, 100.0)], axis=1)
+
+    flicker = PlayerBallAssigner().assign_ball_to_players(player_frames, player_ids, player_bboxes, ball_centers)
+    assert len(set(player_ids[flicker[:15]])) == 2
+
+    steady = PlayerBallAssigner(switch_margin=10).assign_ball_to_players(player_frames, player_ids, player_bboxes, ball_centers)
+    assert (player_ids[steady[:15]] == 7).all() and (player_ids[steady[15:]] == 9).all()
+
+# The per-frame assignment of the streaming pipeline follows the same switch margin as the batch one
+def test_switch_margin_per_frame_matches_batch(stub_tracks):
+    table = TrackTable.from_tracks(stub_tracks)
+    PlayerBallAssigner(switch_margin=20).assign_ball_to_tracks(table)
+
+    player_assigner = PlayerBallAssigner(switch_margin=20)
+    for frame_num, players in enumerate(stub_tracks['players']):
+        ball = stub_tracks['ball'][frame_num]
+        expected = player_assigner.assign_ball_to_player(players, ball[1]['bbox']) if 1 in ball else -1
+        holders = [track_id for track_id, player in table['players'][frame_num].items() if player.get('has_ball', False)]
+        assert holders == ([expected] if expected != -1 else []), frame_num
+
+def test_first_frame_without_holder():
+    player_assigner = PlayerBallAssigner()
+    team_ball_control = player_assigner.assign_ball_to_tracks(TrackTable.from_tracks({
+        'players': [{1: {'bbox': [0, 0, 20, 50], 'team': 2}}, {1: {'bbox': [0, 0, 20, 50], 'team': 2}}],
+        'referees': [{}, {}],
+        'ball': [{1: {'bbox': [500, 500, 510, 510]}}, {1: {'bbox': [5, 45, 15, 55]}}],
+    }))
+    assert team_ball_control.tolist() == [0, 2]
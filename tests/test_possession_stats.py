@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from player_ball_assigner import PossessionStats
+
+# Prefix sum lookups of PossessionStats against counting the team_ball_control frames directly
+
+def counted_share(team_ball_control, start, end):
+    window = np.asarray(team_ball_control[max(start, 0):max(end, 0)])
+    team_1, team_2 = int(np.sum(window == 1)), int(np.sum(window == 2))
+    total = team_1 + team_2
+    return (team_1 / total, team_2 / total) if total else (0.0, 0.0)
+
+@pytest.fixture(scope='module')
+def team_ball_control():
+    rng = np.random.default_rng(0)
+    # Runs of possession like a match, nobody in control at the start, longer than the initial capacity
+    runs = rng.integers(1, 60, 200)
+    teams = rng.integers(1, 3, 200)
+    return np.r_[np.zeros(15, dtype=np.int64), np.repeat(teams, runs)]
+
+def test_possession_up_to_frame(team_ball_control):
+    possession = PossessionStats.from_team_ball_control(team_ball_control)
+    assert possession.num_frames == len(team_ball_control)
+    for frame_num in range(0, len(team_ball_control), 7):
+        assert possession.get_possession(frame_num) == pytest.approx(counted_share(team_ball_control, 0, frame_num + 1))
+
+def test_counts(team_ball_control):
+    possession = PossessionStats.from_team_ball_control(team_ball_control)
+    for start, end in [(0, 0), (0, 10), (15, 16), (100, 2000), (3000, len(team_ball_control)), (-5, 20), (50, 10 ** 9)]:
+        window = team_ball_control[max(start, 0):end]
+        assert possession.get_counts(start, end) == (int(np.sum(window == 1)), int(np.sum(window == 2)))
+
+def test_window_possession(team_ball_control):
+    possession = PossessionStats.from_team_ball_control(team_ball_control, frame_rate=24, window_seconds=10)
+    for frame_num in range(0, len(team_ball_control), 11):
+        expected = counted_share(team_ball_control, frame_num + 1 - 240, frame_num + 1)
+        assert possession.get_window_possession(frame_num) == pytest.approx(expected)
+
+def test_period_possession(team_ball_control):
+    second_half = len(team_ball_control) // 2
+    possession = PossessionStats.from_team_ball_control(team_ball_control, period_starts=[0, second_half])
+    assert possession.get_period(second_half - 1) == 0
+    assert possession.get_period(second_half) == 1
+    assert possession.get_period_possession(0) == pytest.approx(counted_share(team_ball_control, 0, second_half))
+    assert possession.get_period_possession(1) == pytest.approx(counted_share(team_ball_control, second_half, len(team_ball_control)))
+    assert possession.get_period_possession(1, second_half + 100) == pytest.approx(counted_share(team_ball_control, second_half, second_half + 101))
+
+def test_streamed_frames_match_whole_video(team_ball_control):
+    streamed = PossessionStats()
+    for team in team_ball_control:
+        streamed.append(team)
+    possession = PossessionStats.from_team_ball_control(team_ball_control)
+    assert streamed.to_dict() == possession.to_dict()
+    assert streamed.num_frames > 1024 # Grew past the initial capacity
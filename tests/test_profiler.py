@@ -0,0 +1,49 @@
+import json
+import time
+from utils import StageProfiler
+
+def test_stage_totals_and_self_time():
+    profiler = StageProfiler()
+    for frame_num in range(3):
+        with profiler.stage('detect', frames=2, frame_num=frame_num):
+            with profiler.stage('track'):
+                time.sleep(0.002)
+    detect, track = profiler.get_stage_stats('detect'), profiler.get_stage_stats('track')
+    assert detect['calls'] == 3 and detect['frames'] == 6
+    assert track['calls'] == 3 and track['frames'] == 3
+    assert detect['total'] >= track['total'] >= 0.006
+    assert abs(detect['self'] - (detect['total'] - track['total'])) < 1e-9
+
+def test_set_frames():
+    profiler = StageProfiler()
+    with profiler.stage('read') as stage:
+        stage.set_frames(120)
+    assert profiler.get_stage_stats('read')['frames'] == 120
+
+    # A disabled profiler hands out one shared stage, setting its frames changes nothing
+    disabled = StageProfiler(enabled=False)
+    with disabled.stage('read') as stage:
+        stage.set_frames(120)
+    assert disabled.stage('write') is stage
+    assert not hasattr(stage, 'frames') and disabled.stages == {}
+
+def test_iter_stage_counts_every_item():
+    profiler = StageProfiler()
+    assert list(profiler.iter_stage('read', range(5))) == list(range(5))
+    stats = profiler.get_stage_stats('read')
+    assert stats['calls'] == 6 and stats['frames'] == 5 # The last call only finds the end
+
+def test_pipeline_order_and_exports(tmp_path):
+    profiler = StageProfiler()
+    for name in ('custom', 'draw', 'positions', 'camera_motion', 'read'):
+        with profiler.stage(name):
+            pass
+    assert profiler.stage_names() == ['read', 'camera_motion', 'positions', 'draw', 'custom']
+
+    profiler.save_chrome_trace(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    assert [event['name'] for event in events] == ['custom', 'draw', 'positions', 'camera_motion', 'read']
+
+    metrics = profiler.to_prometheus()
+    assert 'football_analysis_stage_calls_total{stage="positions"} 1' in metrics
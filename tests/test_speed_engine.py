@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from speed_and_distance_estimator.speed_engine import compute_speed_and_distance, sort_by_track
+
+def synthetic_rows(num_frames=200, num_tracks=12, id_scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    frames, track_ids, positions = [], [], []
+    for track in range(num_tracks):
+        first, last = sorted(rng.integers(0, num_frames, 2))
+        track_frames = np.arange(first, last + 1)
+        track_frames = track_frames[rng.random(len(track_frames)) > 0.05] # Some missed frames
+        frames.append(track_frames)
+        track_ids.append(np.full(len(track_frames), (track + 1) * id_scale))
+        positions.append(np.cumsum(rng.normal(0, 0.3, (len(track_frames), 2)), axis=0))
+    order = np.argsort(np.concatenate(frames), kind='stable') # Frame order, like the TrackTable rows
+    return np.concatenate(frames)[order], np.concatenate(track_ids)[order], np.concatenate(positions)[order]
+
+@pytest.mark.parametrize('id_scale', [1, 100000]) # Track ids within and beyond a 16 bit range
+def test_sort_by_track(id_scale):
+    frames, track_ids, positions = synthetic_rows(id_scale=id_scale)
+    order, track_starts = sort_by_track(frames, track_ids)
+    expected = np.lexsort((frames, track_ids))
+    np.testing.assert_array_equal(order, expected)
+    np.testing.assert_array_equal(track_starts, np.flatnonzero(np.r_[True, np.diff(track_ids[expected]) != 0]))
+
+def test_row_order_does_not_change_the_result():
+    frames, track_ids, positions = synthetic_rows()
+    speed, acceleration, distance = compute_speed_and_distance(positions, frames, track_ids, frame_rate=24)
+
+    shuffle = np.random.default_rng(1).permutation(len(frames))
+    shuffled = compute_speed_and_distance(positions[shuffle], frames[shuffle], track_ids[shuffle], frame_rate=24)
+    for values, shuffled_values in zip((speed, acceleration, distance), shuffled):
+        np.testing.assert_allclose(shuffled_values, values[shuffle], equal_nan=True)
+
+def test_distance_is_the_sum_of_the_steps():
+    frames = np.arange(10)
+    positions = np.stack([np.arange(10) * 0.5, np.zeros(10)], axis=1)
+    speed, acceleration, distance = compute_speed_and_distance(positions, frames, np.ones(10, dtype=np.int32), frame_rate=24)
+    np.testing.assert_allclose(distance, np.arange(10) * 0.5)
+    np.testing.assert_allclose(speed, 0.5 * 24 * 3.6) # 0.5 m per frame
+    np.testing.assert_allclose(acceleration, 0.0, atol=1e-9)
+
+# Player tracks of num_frames frames: tracks come and go, miss frames, come back after short and long
+# gaps and sometimes have no pitch position
+def synthetic_player_tracks(num_frames=300, num_tracks=15, seed=0):
+    rng = np.random.default_rng(seed)
+    players = [{} for _ in range(num_frames)]
+    for track_id in range(1, num_tracks + 1):
+        position = rng.uniform(0, 20, 2)
+        frame_num = int(rng.integers(0, num_frames // 2))
+        while frame_num < num_frames:
+            position = position + rng.normal(0, 0.3, 2)
+            # float32 like the TrackTable columns
+            track = {'position_transformed': position.astype(np.float32).tolist() if rng.random() > 0.05 else None}
+            players[frame_num][track_id] = track
+            frame_num += 1 if rng.random() > 0.1 else int(rng.integers(2, 15))
+    return {'players': players}
+
+def test_streamed_speeds_match_the_whole_video():
+    from copy import deepcopy
+    from speed_and_distance_estimator import SpeedAndDistanceEstimator
+
+    tracks = synthetic_player_tracks()
+    expected = deepcopy(tracks)
+    SpeedAndDistanceEstimator(frame_rate=25, method='rolling').add_speed_and_distance_to_tracks(expected)
+
+    estimator = SpeedAndDistanceEstimator(frame_rate=25, method='rolling')
+    estimator.reset_stream()
+    players = tracks['players']
+    for frame_num, player_track in enumerate(players):
+        next_player_tracks = players[frame_num + 1:frame_num + 1 + estimator.stream_horizon]
+        estimator.add_speed_and_distance_to_frame(frame_num, player_track, next_player_tracks)
+
+    for frame_num, player_track in enumerate(players):
+        for track_id, track in player_track.items():
+            expected_track = expected['players'][frame_num][track_id]
+            for field in ('speed', 'acceleration', 'distance'):
+                assert (field in track) == (field in expected_track), (frame_num, track_id, field)
+                # The whole video values are stored as float32
+                if field in track:
+                    assert track[field] == pytest.approx(expected_track[field], rel=1e-5, abs=1e-4), (frame_num, track_id, field)
@@ -0,0 +1,14 @@
+import pytest
+from benchmarks.startup_time import SCENARIOS, run_scenario
+
+# Importing the packages, or building a pipeline, pulls in none of the heavy dependencies: they are
+# imported when first used (model loading, team colors, ...)
+@pytest.mark.parametrize('scenario', ['import utils', 'import trackers', 'import team_assigner', 'import pipeline', 'import main'])
+def test_imports_stay_light(scenario):
+    assert run_scenario(SCENARIOS[scenario])["heavy"] == []
+
+def test_pipeline_construction_stays_light():
+    code = ("from pipeline import StreamingPipeline\n"
+            "pipeline = StreamingPipeline('models/best.pt')\n"
+            "assert pipeline.tracker.model is None")
+    assert run_scenario(code)["heavy"] == []
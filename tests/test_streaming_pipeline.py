@@ -0,0 +1,55 @@
+import copy
+import numpy as np
+from benchmarks.synthetic_match import synthesize_tracks
+from camera_movement_estimator import CameraMovementEstimator
+from pipeline import StreamingPipeline
+from speed_and_distance_estimator import SpeedAndDistanceEstimator
+from trackers import Tracker
+from view_transformer import ViewTransformer
+
+def synthetic_video(num_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    base = (rng.random((240, 320, 3)) * 255).astype(np.uint8)
+    frames = [np.roll(base, frame_num, axis=1) for frame_num in range(num_frames)]
+    table = synthesize_tracks(num_frames, objects_per_frame=12, num_referees=2, mean_track_seconds=3, seed=seed)
+    return frames, table.to_tracks()
+
+# The offline stages of main.py on the whole video
+def offline_tracks(frames, tracks):
+    tracks = copy.deepcopy(tracks)
+    tracker = Tracker('models/best.pt')
+    tracker.add_position_to_track(tracks)
+    camera_movement_estimator = CameraMovementEstimator(frames[0])
+    camera_movement_estimator.add_adjust_positions_to_trackers(tracks, camera_movement_estimator.get_camera_movement(frames))
+    ViewTransformer().add_transformed_position_to_tracks(tracks)
+    tracks['ball'] = tracker.interpolate_ball_position(tracks['ball'])
+    SpeedAndDistanceEstimator(method='rolling').add_speed_and_distance_to_tracks(tracks)
+    return tracks
+
+# Frame by frame, with a few frames of lookahead, the streaming pipeline ends up with the same tracks
+def test_streaming_matches_offline(monkeypatch):
+    num_frames = 150
+    frames, tracks = synthetic_video(num_frames)
+    expected = offline_tracks(frames, tracks)
+
+    pipeline = StreamingPipeline('models/best.pt')
+    frame_tracks = [{object: copy.deepcopy(tracks[object][frame_num]) for object in tracks} for frame_num in range(num_frames)]
+    monkeypatch.setattr(pipeline, 'iter_frame_tracks', lambda frames: zip(frames, frame_tracks))
+    monkeypatch.setattr(pipeline.team_assigner, 'assign_team_color',
+                        lambda frame, player_detections: pipeline.team_assigner.team_colors.update({1: (255, 0, 0), 2: (0, 0, 255)}))
+    monkeypatch.setattr(pipeline.team_assigner, 'get_frame_teams',
+                        lambda frame, player_tracks, frame_num: {player_id: 1 + player_id % 2 for player_id in player_tracks})
+
+    output_frames = list(pipeline.process(frames))
+    assert len(output_frames) == num_frames
+
+    for frame_num in range(num_frames):
+        assert np.allclose(frame_tracks[frame_num]['ball'][1]['bbox'], expected['ball'][frame_num][1]['bbox']), frame_num
+        assert frame_tracks[frame_num]['players'].keys() == expected['players'][frame_num].keys()
+        for player_id, track in expected['players'][frame_num].items():
+            streamed = frame_tracks[frame_num]['players'][player_id]
+            assert streamed['team'] == 1 + player_id % 2
+            for key in ('position_adjusted', 'position_transformed', 'speed', 'acceleration', 'distance'):
+                assert (key in track) == (key in streamed), (frame_num, player_id, key)
+                if key in track and track[key] is not None:
+                    assert np.allclose(track[key], streamed[key], rtol=1e-5, atol=1e-4), (frame_num, player_id, key)
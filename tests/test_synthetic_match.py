@@ -0,0 +1,27 @@
+import numpy as np
+from utils import OBJECT_CLASSES
+from benchmarks.synthetic_match import synthesize_tracks
+
+# Every synthetic frame has all its players and referees, each with its own track id, so the nested dicts
+# the benchmarks time hold one entry per row
+def test_every_frame_has_distinct_track_ids():
+    num_frames, objects_per_frame, num_referees = 600, 25, 3
+    table = synthesize_tracks(num_frames, objects_per_frame, num_referees=num_referees, mean_track_seconds=2, seed=3)
+    num_slots = objects_per_frame - 1
+
+    rows = table.rows[table.rows['class'] != OBJECT_CLASSES.index('ball')]
+    for frame_num in range(num_frames):
+        frame_ids = rows['track_id'][rows['frame'] == frame_num]
+        assert len(np.unique(frame_ids)) == num_slots, frame_num
+
+    tracks = table.to_tracks()
+    assert sum(len(frame) for frame in tracks['players']) == num_frames * (num_slots - num_referees)
+    assert sum(len(frame) for frame in tracks['referees']) == num_frames * num_referees
+
+def test_lost_tracks_come_back_with_new_ids():
+    table = synthesize_tracks(600, 25, mean_track_seconds=2, seed=3)
+    rows = table.rows[table.rows['class'] != OBJECT_CLASSES.index('ball')]
+    first_ids = set(rows['track_id'][rows['frame'] == 0].tolist())
+    last_ids = set(rows['track_id'][rows['frame'] == 599].tolist())
+    assert len(np.unique(rows['track_id'])) > 24
+    assert first_ids != last_ids
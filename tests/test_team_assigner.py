@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from team_assigner import TeamAssigner, parse_team_override
+from team_assigner.color_extractor import JerseyColorExtractor
+
+RED = (0, 0, 200)
+BLUE = (200, 0, 0)
+
+# Green pitch with players 1-3 in red and 4-6 in blue, in a row
+def match_frame():
+    frame = np.zeros((200, 400, 3), dtype=np.uint8)
+    frame[:] = (40, 160, 40)
+    player_track = {}
+    for player_id in range(1, 7):
+        x = 20 + (player_id - 1) * 60
+        frame[40:120, x + 10:x + 30] = RED if player_id <= 3 else BLUE
+        player_track[player_id] = {'bbox': [x, 40, x + 40, 160]}
+    return frame, player_track
+
+def test_parse_team_override():
+    assert parse_team_override('94:1') == (94, 1)
+    for value in ('94', '94:3', 'goalkeeper:1', '94:1:2'):
+        with pytest.raises(ValueError):
+            parse_team_override(value)
+
+@pytest.mark.parametrize('online', [False, True])
+def test_teams_follow_the_colors_without_overrides(online):
+    frame, player_track = match_frame()
+    team_assigner = TeamAssigner(online=online)
+    team_assigner.assign_team_color(frame, player_track)
+    teams = team_assigner.get_frame_teams(frame, player_track, 0)
+
+    assert len({teams[player_id] for player_id in (1, 2, 3)}) == 1
+    assert len({teams[player_id] for player_id in (4, 5, 6)}) == 1
+    assert teams[1] != teams[4]
+
+# The team ids of the colors depend on the k-means fit, so the red player 2 is put in each team
+@pytest.mark.parametrize('online', [False, True])
+@pytest.mark.parametrize('team_id', [1, 2])
+def test_team_override(online, team_id):
+    frame, player_track = match_frame()
+    team_assigner = TeamAssigner(team_overrides={2: team_id}, online=online)
+    team_assigner.assign_team_color(frame, player_track)
+    teams = team_assigner.get_frame_teams(frame, player_track, 0)
+
+    assert teams[2] == team_id
+    assert teams[1] == teams[3] != teams[4]
+
+@pytest.mark.parametrize('method', ['kmeans', 'median'])
+def test_jersey_colors(method):
+    frame, player_track = match_frame()
+    extractor = JerseyColorExtractor(method=method)
+    colors = extractor.get_colors(frame, [player['bbox'] for player in player_track.values()])
+    np.testing.assert_allclose(colors[:3], [RED] * 3)
+    np.testing.assert_allclose(colors[3:], [BLUE] * 3)
+
+def test_unknown_color_method():
+    with pytest.raises(ValueError):
+        JerseyColorExtractor(method='histogram')
+
+# Cropping counter on a color extractor
+def count_crops(monkeypatch, extractor):
+    cropped = []
+    get_crops = extractor.get_crops
+    monkeypatch.setattr(extractor, 'get_crops', lambda frame, bboxes: cropped.append(len(bboxes)) or get_crops(frame, bboxes))
+    return cropped
+
+def test_color_cache(monkeypatch):
+    frame, player_track = match_frame()
+    bboxes = [player['bbox'] for player in player_track.values()]
+    extractor = JerseyColorExtractor(cache_size=4)
+    cropped = count_crops(monkeypatch, extractor)
+
+    colors = extractor.get_colors(frame, bboxes[:4], [1, 2, 3, 4])
+    np.testing.assert_array_equal(extractor.get_colors(frame, bboxes[:4], [1, 2, 3, 4]), colors)
+    assert cropped == [4]
+
+    # Least recently used first out: 2 is dropped, 1 was read again
+    extractor.get_colors(frame, [bboxes[0]], [1])
+    extractor.get_colors(frame, [bboxes[4]], [5])
+    assert list(extractor.color_cache) == [3, 4, 1, 5]
+    extractor.forget(3)
+    extractor.get_colors(frame, bboxes[:3], [1, 2, 3])
+    assert cropped == [4, 1, 2]
+
+# Without the online model the teams of the players seen before come from their cached colors
+def test_known_players_are_not_cropped_again(monkeypatch):
+    frame, player_track = match_frame()
+    team_assigner = TeamAssigner()
+    team_assigner.assign_team_color(frame, dict(list(player_track.items())[:5]))
+    cropped = count_crops(monkeypatch, team_assigner.color_extractor)
+
+    teams = team_assigner.get_frame_teams(frame, player_track)
+    assert cropped == [1] # Player 6, the others were cropped for the team colors
+    assert team_assigner.get_frame_teams(frame, player_track) == teams
+    assert team_assigner.get_player_team(frame, player_track[6]['bbox'], 6) == teams[6]
+    assert cropped == [1]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from utils import TrackExporter, TrackTable, read_tracks, read_export_metadata
+
+pa = pytest.importorskip('pyarrow')
+
+# One player, one referee and a ball on every other frame, values derived from the frame number
+def frame_tracks(frame_num):
+    player = {'bbox': [float(frame_num), 10.0, frame_num + 40.0, 110.0], 'team': 1 + frame_num % 2, 'has_ball': frame_num % 3 == 0,
+              'position_transformed': [frame_num * 0.5, 3.0], 'speed': 10.0 + frame_num, 'distance': frame_num * 0.5}
+    tracks = {'players': {7: player}, 'referees': {3: {'bbox': [0.0, 0.0, 20.0, 60.0]}}, 'ball': {}}
+    if frame_num % 2 == 0:
+        tracks['ball'][1] = {'bbox': [5.0, 5.0, 10.0, 10.0]}
+    return tracks
+
+def export(path, num_frames, chunk_frames=10):
+    with TrackExporter(str(path), chunk_frames=chunk_frames, metadata={'fps': 25.0}) as exporter:
+        for frame_num in range(num_frames):
+            exporter.append_frame(frame_num, frame_tracks(frame_num))
+
+def test_frame_range_reads(tmp_path):
+    export(tmp_path, 35)
+    assert len(list(tmp_path.glob('part-*.parquet'))) == 4
+    assert read_export_metadata(str(tmp_path)) == {'fps': 25.0}
+
+    table = read_tracks(str(tmp_path), start_frame=8, end_frame=23)
+    frames = table.column('frame').to_numpy()
+    assert frames.min() == 8 and frames.max() == 22
+    assert len(table) == 15 * 2 + len(range(8, 23, 2))
+
+    players = read_tracks(str(tmp_path), start_frame=8, end_frame=23, columns=['frame', 'track_id', 'speed', 'team'], objects=['players'])
+    assert players.column_names == ['frame', 'track_id', 'speed', 'team']
+    np.testing.assert_array_equal(players.column('frame').to_numpy(), np.arange(8, 23))
+    np.testing.assert_allclose(players.column('speed').to_numpy(), 10.0 + np.arange(8, 23))
+    assert players.column('team').to_pylist() == [1 + frame_num % 2 for frame_num in range(8, 23)]
+
+    # Missing values are nulls
+    referees = read_tracks(str(tmp_path), end_frame=5, objects=['referees'])
+    assert referees.column('speed').null_count == 5
+    assert referees.column('team').null_count == 5
+
+    assert len(read_tracks(str(tmp_path), start_frame=100)) == 0
+
+# Complete parts are readable while the exporter is still appending, the unfinished chunk is not
+def test_read_while_appending(tmp_path):
+    exporter = TrackExporter(str(tmp_path), chunk_frames=10)
+    for frame_num in range(25):
+        exporter.append_frame(frame_num, frame_tracks(frame_num))
+    assert not list(tmp_path.glob('*.tmp'))
+    frames = read_tracks(str(tmp_path), objects=['players']).column('frame').to_numpy()
+    np.testing.assert_array_equal(frames, np.arange(20))
+
+    exporter.close()
+    frames = read_tracks(str(tmp_path), objects=['players']).column('frame').to_numpy()
+    np.testing.assert_array_equal(frames, np.arange(25))
+
+    # Appending to an export continues its parts, writing again replaces them
+    with TrackExporter(str(tmp_path), mode='a', chunk_frames=10) as exporter:
+        exporter.append_frame(25, frame_tracks(25))
+    assert read_tracks(str(tmp_path), start_frame=25, objects=['players']).column('frame').to_pylist() == [25]
+    export(tmp_path, 3)
+    assert read_tracks(str(tmp_path), objects=['players']).column('frame').to_pylist() == [0, 1, 2]
+
+# Whole video tracks give the same rows as the frames appended one by one
+def test_append_tracks(tmp_path):
+    tracks = {object: [frame_tracks(frame_num)[object] for frame_num in range(12)] for object in ('players', 'referees', 'ball')}
+    with TrackExporter(str(tmp_path / 'video'), chunk_frames=5) as exporter:
+        exporter.append_tracks(TrackTable.from_tracks(tracks))
+    export(tmp_path / 'frames', 12, chunk_frames=5)
+    assert read_tracks(str(tmp_path / 'video')).equals(read_tracks(str(tmp_path / 'frames')))
@@ -0,0 +1,54 @@
+import numpy as np
+from trackers import TrackPredictor
+
+def moving_box(frame_num, velocity=(6.0, -2.0), start=(100.0, 300.0), size=(40.0, 80.0)):
+    x = start[0] + velocity[0] * frame_num
+    y = start[1] + velocity[1] * frame_num
+    return [x, y, x + size[0], y + size[1]]
+
+def test_predicts_constant_velocity():
+    predictor = TrackPredictor()
+    for frame_num in range(20):
+        predictor.update({"players": {4: {"bbox": moving_box(frame_num)}}, "referees": {}, "ball": {}})
+
+    # Detection skipped on the next 4 frames
+    for frame_num in range(20, 24):
+        predicted = predictor.predict()
+        np.testing.assert_allclose(predicted["players"][4]["bbox"], moving_box(frame_num), atol=1.0)
+        assert predicted["ball"] == {} and predicted["referees"] == {}
+
+def test_stationary_and_new_tracks_stay_in_place():
+    predictor = TrackPredictor()
+    predictor.update({"players": {1: {"bbox": [10, 20, 50, 100]}}, "referees": {9: {"bbox": [200, 20, 240, 100]}}})
+    predictor.update({"players": {1: {"bbox": [10, 20, 50, 100]}}, "referees": {9: {"bbox": [200, 20, 240, 100]}}})
+    predicted = predictor.predict()
+    np.testing.assert_allclose(predicted["players"][1]["bbox"], [10, 20, 50, 100], atol=1e-6)
+    np.testing.assert_allclose(predicted["referees"][9]["bbox"], [200, 20, 240, 100], atol=1e-6)
+
+# After skipped frames the next detection resumes the tracks: known ids keep their motion, lost ids are
+# dropped and new ids start from their detection
+def test_skip_and_resume():
+    predictor = TrackPredictor()
+    for frame_num in range(20):
+        predictor.update({"players": {4: {"bbox": moving_box(frame_num)}, 5: {"bbox": moving_box(frame_num, (0, 0), (600, 400))}}})
+    for _ in range(3):
+        predictor.predict()
+
+    predictor.update({"players": {4: {"bbox": moving_box(23)}, 7: {"bbox": [900, 500, 940, 580]}}})
+    predicted = predictor.predict()
+    assert set(predicted["players"]) == {4, 7}
+    np.testing.assert_allclose(predicted["players"][4]["bbox"], moving_box(24), atol=1.0)
+    np.testing.assert_allclose(predicted["players"][7]["bbox"], [900, 500, 940, 580], atol=1e-6)
+
+    # The filter keeps following the track when detection resumes with a change of speed
+    for frame_num in range(25, 60):
+        box = moving_box(24) + np.array([3.0, 1.0, 3.0, 1.0]) * (frame_num - 24)
+        predictor.update({"players": {4: {"bbox": box.tolist()}}})
+    expected = np.array(moving_box(24)) + np.array([3.0, 1.0, 3.0, 1.0]) * 36
+    np.testing.assert_allclose(predictor.predict()["players"][4]["bbox"], expected, atol=1.5)
+
+def test_empty_predictor():
+    predictor = TrackPredictor()
+    assert predictor.predict() == {"players": {}, "referees": {}, "ball": {}}
+    predictor.update({"players": {}, "referees": {}, "ball": {}})
+    assert predictor.predict()["players"] == {}
@@ -0,0 +1,76 @@
+import copy
+import numpy as np
+import pytest
+from utils import TrackTable
+from trackers import Tracker
+from camera_movement_estimator import CameraMovementEstimator
+from view_transformer import ViewTransformer
+from speed_and_distance_estimator import SpeedAndDistanceEstimator
+
+# The TrackTable stages against the nested dict stages they replace, on the tracks of the sample video.
+# The table stores float32, so values agree up to float32 rounding.
+ATOL = 1e-3
+
+def run_stages(tracks, camera_movement):
+    tracker = Tracker('models/best.pt') # The model is not loaded
+    tracker.add_position_to_track(tracks)
+    camera_movement_estimator = CameraMovementEstimator(np.zeros((1080, 1920, 3), dtype=np.uint8))
+    camera_movement_estimator.add_adjust_positions_to_trackers(tracks, camera_movement)
+    ViewTransformer().add_transformed_position_to_tracks(tracks)
+    SpeedAndDistanceEstimator().add_speed_and_distance_to_tracks(tracks)
+    return tracks
+
+def assert_values_close(value, table_value, context):
+    if value is None:
+        assert table_value is None, context
+    else:
+        assert table_value is not None, context
+        values, table_values = np.ravel(value), np.ravel(table_value)
+        assert len(values) == len(table_values) and all(abs(a - b) <= ATOL for a, b in zip(values, table_values)), (context, value, table_value)
+
+@pytest.fixture(scope='module')
+def stage_results(stub_tracks, stub_camera_movement):
+    tracks = run_stages(copy.deepcopy(stub_tracks), stub_camera_movement)
+    table = run_stages(TrackTable.from_tracks(stub_tracks), stub_camera_movement)
+    return tracks, table.to_tracks()
+
+def test_round_trip(stub_tracks):
+    table = TrackTable.from_tracks(stub_tracks)
+    round_trip = table.to_tracks()
+    for object, object_tracks in stub_tracks.items():
+        assert len(round_trip[object]) == len(object_tracks)
+        for frame_num, frame_tracks in enumerate(object_tracks):
+            assert set(round_trip[object][frame_num]) == set(frame_tracks)
+            for track_id, track in frame_tracks.items():
+                assert_values_close(track['bbox'], round_trip[object][frame_num][track_id]['bbox'], (object, frame_num, track_id))
+
+@pytest.mark.parametrize('field', ['position', 'position_adjusted', 'position_transformed'])
+def test_positions_match_nested_dicts(stage_results, field):
+    tracks, table_tracks = stage_results
+    for object, object_tracks in tracks.items():
+        for frame_num, frame_tracks in enumerate(object_tracks):
+            for track_id, track in frame_tracks.items():
+                table_track = table_tracks[object][frame_num][track_id]
+                assert_values_close(track.get(field), table_track.get(field), (object, frame_num, track_id))
+
+@pytest.mark.parametrize('field', ['speed', 'distance'])
+def test_speed_and_distance_match_nested_dicts(stage_results, field):
+    tracks, table_tracks = stage_results
+    measured = 0
+    for frame_num, frame_tracks in enumerate(tracks['players']):
+        for track_id, track in frame_tracks.items():
+            table_track = table_tracks['players'][frame_num][track_id]
+            assert (field in track) == (field in table_track), (frame_num, track_id)
+            if field in track:
+                assert_values_close(track[field], table_track[field], (frame_num, track_id))
+                measured += 1
+    assert measured > 0
+
+def test_ball_interpolation_matches_nested_dicts(stub_tracks):
+    ball_positions = Tracker('models/best.pt').interpolate_ball_position(stub_tracks['ball'])
+    table = TrackTable.from_tracks(stub_tracks)
+    table.interpolate_ball_position()
+    for frame_num, ball in enumerate(ball_positions):
+        assert set(table['ball'][frame_num]) == set(ball)
+        if 1 in ball:
+            np.testing.assert_allclose(table['ball'][frame_num][1]['bbox'], ball[1]['bbox'], atol=ATOL)
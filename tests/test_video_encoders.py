@@ -0,0 +1,85 @@
+import stat
+import numpy as np
+import pytest
+from utils import OpenCVEncoder, FFmpegEncoder, make_encoder, video_extension
+
+# Executable standing in for ffmpeg
+def fake_ffmpeg(tmp_path, script):
+    path = tmp_path / 'ffmpeg'
+    path.write_text('#!/bin/sh\n' + script)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def frame(value=0):
+    return np.full((16, 32, 3), value, dtype=np.uint8)
+
+@pytest.mark.parametrize('encoder, encoder_params, extension', [
+    ('opencv', None, '.avi'),
+    ('opencv', {'fourcc': 'MJPG'}, '.avi'),
+    ('ffmpeg', None, '.mp4'),
+    ('ffmpeg', {'codec': 'h264_nvenc'}, '.mp4'),
+    ('ffmpeg', {'codec': 'libvpx-vp9'}, '.webm'),
+])
+def test_video_extension(encoder, encoder_params, extension):
+    assert video_extension(encoder, encoder_params) == extension
+
+def test_unknown_encoder():
+    with pytest.raises(ValueError):
+        video_extension('gstreamer')
+    with pytest.raises(ValueError):
+        make_encoder('out.mp4', 25, encoder='gstreamer')
+
+def test_make_encoder(tmp_path):
+    assert isinstance(make_encoder(str(tmp_path / 'out.avi'), 25), OpenCVEncoder)
+    encoder = make_encoder(str(tmp_path / 'out.mp4'), 25, encoder='ffmpeg', codec='libx265', ffmpeg_path=fake_ffmpeg(tmp_path, 'cat > /dev/null\n'))
+    assert isinstance(encoder, FFmpegEncoder)
+    assert encoder.codec == 'libx265'
+
+def test_missing_ffmpeg(tmp_path):
+    with pytest.raises(RuntimeError, match='ffmpeg not found'):
+        make_encoder(str(tmp_path / 'out.mp4'), 25, encoder='ffmpeg', ffmpeg_path=str(tmp_path / 'missing'))
+
+@pytest.mark.parametrize('codec, has_preset, has_crf', [
+    ('libx264', True, True),
+    ('h264_nvenc', True, False),
+    ('mpeg4', False, False),
+])
+def test_ffmpeg_command_options(tmp_path, codec, has_preset, has_crf):
+    encoder = FFmpegEncoder('out.mp4', 25, codec=codec, extra_args=['-b:v', '8M'], ffmpeg_path=fake_ffmpeg(tmp_path, ''))
+    command = encoder.command(32, 16)
+    assert command[command.index('-s') + 1] == '32x16'
+    assert command[command.index('-c:v') + 1] == codec
+    assert ('-preset' in command) == has_preset
+    assert ('-crf' in command) == has_crf
+    assert command[-3:] == ['-b:v', '8M', 'out.mp4']
+
+# Raw frames reach ffmpeg in order
+def test_ffmpeg_frames(tmp_path):
+    output_path = tmp_path / 'out.raw'
+    encoder = FFmpegEncoder(str(output_path), 25, ffmpeg_path=fake_ffmpeg(tmp_path, 'for a; do last=$a; done\ncat > "$last"\n'))
+    for value in range(3):
+        encoder.write(frame(value))
+    encoder.close()
+    raw = np.frombuffer(output_path.read_bytes(), dtype=np.uint8).reshape(3, 16, 32, 3)
+    assert [int(values.max()) for values in raw] == [0, 1, 2]
+
+def test_ffmpeg_failure_on_close(tmp_path):
+    encoder = FFmpegEncoder('out.mp4', 25, ffmpeg_path=fake_ffmpeg(tmp_path, 'cat > /dev/null\necho "Unknown encoder" >&2\nexit 3\n'))
+    encoder.write(frame())
+    with pytest.raises(RuntimeError, match='exit code 3: Unknown encoder'):
+        encoder.close()
+
+# ffmpeg exiting early: the write raises with its errors, the close after it has nothing left to report
+def test_ffmpeg_stopped_while_writing(tmp_path):
+    encoder = FFmpegEncoder('out.mp4', 25, ffmpeg_path=fake_ffmpeg(tmp_path, 'echo "No space left on device" >&2\nexit 1\n'))
+    with pytest.raises(RuntimeError, match='exit code 1: No space left on device'):
+        for _ in range(1000):
+            encoder.write(np.zeros((1080, 1920, 3), dtype=np.uint8))
+    encoder.close()
+
+def test_frame_size_change(tmp_path):
+    encoder = FFmpegEncoder('out.mp4', 25, ffmpeg_path=fake_ffmpeg(tmp_path, 'cat > /dev/null\n'))
+    encoder.write(frame())
+    with pytest.raises(ValueError):
+        encoder.write(np.zeros((8, 8, 3), dtype=np.uint8))
+    encoder.close()
@@ -0,0 +1,79 @@
+import stat
+import cv2
+import numpy as np
+import pytest
+from utils import read_video, read_video_stream, save_video, save_video_stream
+from utils import ThreadedVideoReader, ThreadedVideoWriter, format_io_stats
+
+# Small MJPG video with a different brightness per frame
+def write_video(path, num_frames=10, size=(32, 16)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 25, size)
+    for value in range(num_frames):
+        writer.write(np.full((size[1], size[0], 3), value * 20 % 256, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def frame_values(frames):
+    return [int(round(frame.mean() / 20)) for frame in frames]
+
+def test_reader_order(tmp_path):
+    path = write_video(tmp_path / 'in.avi', num_frames=10)
+    with ThreadedVideoReader(path, queue_size=2) as reader:
+        frames = list(reader)
+    assert frame_values(frames) == list(range(10))
+    assert reader.stats["frames"] == 10
+    assert all(np.array_equal(a, b) for a, b in zip(frames, read_video(path)))
+
+# Closing the reader early stops the decoder even when the queue is full
+def test_reader_close_early(tmp_path):
+    path = write_video(tmp_path / 'in.avi', num_frames=20)
+    reader = ThreadedVideoReader(path, queue_size=1)
+    assert frame_values([next(iter(reader))]) == [0]
+    reader.close()
+    assert not reader.thread.is_alive()
+
+def test_reader_missing_file(tmp_path):
+    with ThreadedVideoReader(str(tmp_path / 'missing.avi')) as reader:
+        assert list(reader) == []
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / 'out.avi')
+    frames = [np.full((16, 32, 3), value * 20, dtype=np.uint8) for value in range(8)]
+    with ThreadedVideoWriter(path, fps=25, fourcc='MJPG', queue_size=2) as writer:
+        for frame in frames:
+            writer.write(frame)
+    assert writer.stats["frames"] == 8
+
+    saved = read_video(path)
+    assert frame_values(saved) == list(range(8))
+    assert saved[0].shape == (16, 32, 3)
+
+def test_save_video_stream(tmp_path):
+    input_path = write_video(tmp_path / 'in.avi', num_frames=6)
+    output_path = str(tmp_path / 'out.avi')
+    save_video_stream(read_video_stream(input_path), output_path, fps=25, fourcc='MJPG')
+    assert frame_values(read_video(output_path)) == list(range(6))
+
+    save_video(read_video(input_path), output_path, fps=25, fourcc='MJPG')
+    assert frame_values(read_video(output_path)) == list(range(6))
+
+# An encoder failure is raised from write() or close(), never left to hang the producer
+def test_writer_encoder_error(tmp_path):
+    ffmpeg_path = tmp_path / 'ffmpeg'
+    ffmpeg_path.write_text('#!/bin/sh\necho "no encoder" >&2\nexit 1\n')
+    ffmpeg_path.chmod(ffmpeg_path.stat().st_mode | stat.S_IEXEC)
+
+    writer = ThreadedVideoWriter(str(tmp_path / 'out.mp4'), fps=25, queue_size=1, encoder='ffmpeg',
+                                 encoder_params={'ffmpeg_path': str(ffmpeg_path)})
+    with pytest.raises(RuntimeError, match='no encoder'):
+        for _ in range(50):
+            writer.write(np.zeros((16, 32, 3), dtype=np.uint8))
+        writer.close()
+
+def test_format_io_stats():
+    reader_stats = {"frames": 10, "decode": 1.0, "producer_wait": 0.5, "consumer_wait": 2.0}
+    writer_stats = {"frames": 10, "encode": 1.5, "producer_wait": 1.0, "consumer_wait": 0.25}
+    lines = format_io_stats(reader_stats, writer_stats, 5.0).splitlines()
+    assert lines[0] == "Decode:    10 frames, 1.00s decoding, 0.50s waiting for the pipeline"
+    assert lines[1] == "Pipeline:  2.00s processing, 2.00s waiting for decode, 1.00s waiting for encode"
+    assert lines[2] == "Encode:    10 frames, 1.50s encoding, 0.25s waiting for the pipeline"
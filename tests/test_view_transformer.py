@@ -0,0 +1,75 @@
+import json
+import os
+import cv2
+import numpy as np
+import pytest
+from utils import TrackTable
+from view_transformer import ViewTransformer
+from view_transformer.view_transformer import points_in_polygon
+
+# Reference of the original single point transform
+def reference_transform(transformer, point):
+    int_point = (int(point[0]), int(point[1]))
+    if cv2.pointPolygonTest(transformer.pixel_vertices, int_point, False) < 0:
+        return None
+    return cv2.perspectiveTransform(np.array(point, dtype=np.float32).reshape(-1, 1, 2), transformer.perspective_transformer).reshape(-1, 2)
+
+def test_batch_matches_single_points():
+    transformer = ViewTransformer()
+    points = np.random.default_rng(0).uniform([-100, -100], [2100, 1200], (2000, 2))
+    points = np.concatenate([points, transformer.pixel_vertices, [[150.0, 650.0], [np.nan, 10.0]]])
+    transformed, is_valid = transformer.transform_points(points)
+
+    for point, transformed_point, valid in zip(points, transformed, is_valid):
+        expected = None if np.isnan(point).any() else reference_transform(transformer, point)
+        assert valid == (expected is not None), point
+        if valid:
+            np.testing.assert_allclose(transformed_point, expected[0], rtol=1e-5, atol=1e-3)
+        else:
+            assert np.isnan(transformed_point).all()
+
+def test_points_in_polygon_edges():
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float32)
+    points = np.array([[5, 5], [0, 5], [10, 10], [5, 10], [11, 5], [-1, -1]], dtype=np.float64)
+    np.testing.assert_array_equal(points_in_polygon(points, square), [True, True, True, True, False, False])
+
+# Two courts: the first calibration containing a point transforms it
+def test_calibrations(tmp_path):
+    left = {"name": "left", "pixel_vertices": [[0, 100], [0, 0], [100, 0], [100, 100]], "target_vertices": [[0, 10], [0, 0], [10, 0], [10, 10]]}
+    right = {"name": "right", "pixel_vertices": [[50, 100], [50, 0], [250, 0], [250, 100]], "target_vertices": [[100, 10], [100, 0], [120, 0], [120, 10]]}
+    config_path = tmp_path / 'stadium.json'
+    config_path.write_text(json.dumps({"calibrations": [left, right]}))
+    transformer = ViewTransformer.from_config(str(config_path))
+
+    transformed, is_valid = transformer.transform_points([[20, 50], [80, 50], [200, 50], [300, 50]])
+    np.testing.assert_array_equal(is_valid, [True, True, True, False])
+    np.testing.assert_allclose(transformed[:3], [[2, 5], [8, 5], [115, 5]], atol=1e-4)
+
+    with pytest.raises(ValueError):
+        ViewTransformer([])
+    with pytest.raises(ValueError):
+        ViewTransformer([{"pixel_vertices": [[0, 0], [1, 1], [2, 2]], "target_vertices": [[0, 0], [1, 1], [2, 2]]}])
+
+def test_stadium_calibration_file():
+    transformer = ViewTransformer.from_config(os.path.join(os.path.dirname(__file__), '..', 'view_transformer', 'calibrations', '08fd33.json'))
+    assert len(transformer.calibrations) >= 1
+
+def test_tracks_and_table_agree():
+    tracks = {'players': [{1: {'position_adjusted': (300.0, 600.0)}, 2: {'position_adjusted': (5.0, 5.0)}}],
+              'referees': [{3: {'position_adjusted': (1000.0, 500.0)}}],
+              'ball': [{}]}
+    for track_info in (tracks['players'][0][1], tracks['players'][0][2], tracks['referees'][0][3]):
+        track_info['bbox'] = [0.0, 0.0, 1.0, 1.0]
+    table = TrackTable.from_tracks(tracks)
+    transformer = ViewTransformer()
+    transformer.add_transformed_position_to_tracks(tracks)
+    transformer.add_transformed_position_to_tracks(table)
+
+    assert tracks['players'][0][2]['position_transformed'] is None
+    for object, track_id in (('players', 1), ('players', 2), ('referees', 3)):
+        expected = tracks[object][0][track_id]['position_transformed']
+        actual = table[object][0][track_id]['position_transformed']
+        if expected is None:
+            assert actual is None
+        else:
+            np.testing.assert_allclose(actual, expected, rtol=1e-6)
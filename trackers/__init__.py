@@ -1 +1,7 @@
-from .tracker import Tracker
+from .tracker import Tracker, DETECTOR_BACKENDS
+from .ball_interpolator import BallGapFiller
+from .track_predictor import TrackPredictor
+from .keyframe_tracking import KeyframeScheduler, BoxPropagator, compare_tracks, format_track_comparison
+from .ball_roi import TwoTierInferenceEngine, BallTrajectory, format_roi_stats
+from .onnx_detector import OnnxDetector, export_onnx, quantize_onnx, letterbox_batch
+from .detection_result import DetectionResult
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Fills the frames where the ball was not detected while the frames stream in.
+# Frames are emitted in order as (frame_num, bbox) once their value is known:
+# - a gap between two detections is linearly interpolated when the next detection arrives
+# - frames before the first detection take that detection (back fill)
+# - frames after the last detection keep it (forward fill), also the oldest frames of a gap longer than max_gap
+# - a detection that moved more than max_jump pixels per frame from the last ball is treated as a miss
+# bbox is None when no ball has been seen yet (only before the first detection when the gap is too long).
+class BallGapFiller:
+    def __init__(self, max_gap=None, max_jump=None):
+        self.max_gap = max_gap
+        self.max_jump = max_jump
+        self.last_frame_num = None # Frame of the last emitted ball
+        self.last_bbox = None
+        self.gap = [] # Frames waiting for the next detection
+
+    # Add the detection of the next frame (bbox or None), returns the frames whose value is now known
+    def push(self, frame_num, bbox):
+        if bbox is not None and self.is_jump(frame_num, bbox):
+            bbox = None
+
+        if bbox is None:
+            self.gap.append(frame_num)
+            if self.max_gap is not None and len(self.gap) > self.max_gap:
+                # Too long to wait for the next detection, keep the last ball for the oldest frame
+                return [self.emit(self.gap.pop(0), self.last_bbox)]
+            return []
+
+        bbox = list(bbox)
+        emitted = [(gap_frame_num, gap_bbox) for gap_frame_num, gap_bbox in zip(self.gap, self.fill_gap(frame_num, bbox))]
+        self.gap = []
+        emitted.append(self.emit(frame_num, bbox))
+        return emitted
+
+    # Frames still waiting at the end of the stream keep the last ball
+    def flush(self):
+        emitted = [(frame_num, self.last_bbox) for frame_num in self.gap]
+        self.gap = []
+        return emitted
+
+    def fill_gap(self, frame_num, bbox):
+        if not self.gap:
+            return []
+        if self.last_bbox is None:
+            return [list(bbox) for _ in self.gap]
+
+        # Same as a linear interpolation between the last ball and this detection
+        gap_frames = np.array(self.gap, dtype=np.float64)
+        known_frames = [self.last_frame_num, frame_num]
+        gap_bboxes = np.stack([np.interp(gap_frames, known_frames, [self.last_bbox[i], bbox[i]]) for i in range(4)], axis=1)
+        return gap_bboxes.tolist()
+
+    def emit(self, frame_num, bbox):
+        if bbox is not None:
+            self.last_frame_num = frame_num
+            self.last_bbox = bbox
+        return frame_num, bbox
+
+    def is_jump(self, frame_num, bbox):
+        if self.max_jump is None or self.last_bbox is None:
+            return False
+        last_center = np.array([(self.last_bbox[0] + self.last_bbox[2]) / 2, (self.last_bbox[1] + self.last_bbox[3]) / 2])
+        center = np.array([(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2])
+        frames_elapsed = frame_num - self.last_frame_num
+        return np.linalg.norm(center - last_center) > self.max_jump * frames_elapsed
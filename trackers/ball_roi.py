@@ -0,0 +1,155 @@
+import numpy as np
+from .batch_inference import BatchInferenceEngine
+from .detection_result import DetectionResult, to_detections
+
+# Where the ball should be in the next frames, from its centers in the last frames it was seen in
+# (constant velocity fitted over the last `history` sightings). No prediction once the ball has been
+# missing for more than max_lost frames.
+class BallTrajectory:
+    def __init__(self, history=5, max_lost=12):
+        self.history = history
+        self.max_lost = max_lost
+        self.centers = {} # {frame_num: (x, y)}
+
+    # Center of the ball in a frame, a later observation of the same frame replaces the earlier one
+    def observe(self, frame_num, bbox):
+        self.centers[frame_num] = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+        for old_frame_num in sorted(self.centers)[:-self.history]:
+            del self.centers[old_frame_num]
+
+    def predict(self, frame_num):
+        if not self.centers:
+            return None
+        frames = sorted(self.centers)
+        if frame_num - frames[-1] > self.max_lost:
+            return None
+        centers = np.array([self.centers[observed_frame] for observed_frame in frames])
+        if len(frames) == 1:
+            return centers[-1]
+        velocity = np.polyfit(frames, centers, 1)[0]
+        return centers[-1] + velocity * (frame_num - frames[-1])
+
+    def reset(self):
+        self.centers = {}
+
+# Pixels the model sees for a frame of frame_shape at imgsz (longest side, padded to the stride)
+def input_pixels(frame_shape, imgsz, stride=32):
+    height, width = frame_shape[:2]
+    scale = imgsz / max(height, width)
+    return int(np.ceil(width * scale / stride) * stride * np.ceil(height * scale / stride) * stride)
+
+# Two-tier detection for a small ball:
+# 1. the full frames at a low resolution (imgsz) for the players, referees and a first guess of the ball
+# 2. a crop_size crop at full resolution around the ball of every frame, from the first pass or, when it
+#    missed the ball, predicted from the trajectory of the ball in the previous frames. Only the ball class
+#    is kept from this pass, its best box replaces the ball of the first pass.
+# The detections are returned as DetectionResult, the full frame pass with the ball of the crop pass.
+# Both passes run on whole batches. The ball is small and fast, so at the same number of pixels a full
+# resolution crop finds it far more often than a downscaled full frame.
+# stats: roi_frames (frames detected), crops (frames with a crop pass), crop_balls (ball found in the crop),
+# full_balls (ball of the first pass kept), pixels (model input pixels of both passes)
+class TwoTierInferenceEngine(BatchInferenceEngine):
+    def __init__(self, model, conf=0.1, imgsz=480, crop_size=256, ball_conf=None, history=5, max_lost=12, **kwargs):
+        super().__init__(model, conf=conf, **kwargs)
+        self.imgsz = imgsz
+        self.crop_size = crop_size
+        self.ball_conf = ball_conf if ball_conf is not None else conf
+        self.trajectory = BallTrajectory(history, max_lost)
+        self.frame_count = 0 # Number of the next frame when the frame numbers are not given
+        self.stats.update(roi_frames=0, crops=0, crop_balls=0, full_balls=0, pixels=0)
+
+    # New video: the ball trajectory is forgotten
+    def reset(self):
+        self.trajectory.reset()
+        self.frame_count = 0
+
+    # Input of the full frame pass. The crops depend on its detections, so they are prepared in predict_batch.
+    def prepare_batch(self, batch_frames):
+        if hasattr(self.model, 'predict_preprocessed'):
+            return self.model.preprocess(batch_frames, imgsz=self.imgsz)
+        return None
+
+    # frame_nums: numbers of the frames in the video when not every frame is detected (detection stride,
+    # live frames skipped), so the trajectory velocity and max_lost are in video frames
+    def predict_batch(self, batch_frames, frame_nums=None, prepared=None):
+        import supervision as sv
+
+        if frame_nums is None:
+            frame_nums = range(self.frame_count, self.frame_count + len(batch_frames))
+        if prepared is not None:
+            full_results = self.model.predict_preprocessed(prepared, conf=self.conf)
+        else:
+            full_results = list(self.model.predict(batch_frames, conf=self.conf, imgsz=self.imgsz))
+        names = full_results[0].names
+        ball_class_id = {name: class_id for class_id, name in names.items()}['ball']
+        self.stats["pixels"] += sum(input_pixels(frame.shape, self.imgsz) for frame in batch_frames)
+
+        # Crop windows, the ball of the first pass also counts for the prediction of the next frames
+        detections = []
+        crops = []
+        for index, (frame, result) in enumerate(zip(batch_frames, full_results)):
+            frame_num = frame_nums[index]
+            detection = to_detections(result)
+            detections.append(detection)
+            ball = detection[detection.class_id == ball_class_id]
+            if len(ball):
+                bbox = ball.xyxy[np.argmax(ball.confidence)]
+                self.trajectory.observe(frame_num, bbox)
+                center = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+            else:
+                center = self.trajectory.predict(frame_num)
+            if center is not None:
+                crops.append((index, self.crop_window(frame.shape, center)))
+
+        crop_results = []
+        if crops:
+            crop_frames = [batch_frames[index][y1:y2, x1:x2] for index, (x1, y1, x2, y2) in crops]
+            crop_results = list(self.model.predict(crop_frames, conf=self.ball_conf, imgsz=self.crop_size, classes=[ball_class_id]))
+            self.stats["pixels"] += sum(input_pixels(crop_frame.shape, self.crop_size) for crop_frame in crop_frames)
+        crop_balls = {}
+        for (index, (x1, y1, x2, y2)), crop_result in zip(crops, crop_results):
+            ball = to_detections(crop_result)
+            ball = ball[ball.class_id == ball_class_id]
+            if len(ball):
+                best = ball[int(np.argmax(ball.confidence))]
+                best.xyxy = best.xyxy + np.array([x1, y1, x1, y1], dtype=best.xyxy.dtype)
+                crop_balls[index] = best
+
+        roi_detections = []
+        for index, detection in enumerate(detections):
+            frame_num = frame_nums[index]
+            is_ball = detection.class_id == ball_class_id
+            if index in crop_balls:
+                detection = sv.Detections.merge([detection[~is_ball], crop_balls[index]])
+                self.stats["crop_balls"] += 1
+            elif is_ball.any():
+                # Only the best ball of the first pass, like the crop pass
+                balls = np.flatnonzero(is_ball)
+                keep = ~is_ball
+                keep[balls[np.argmax(detection.confidence[balls])]] = True
+                detection = detection[keep]
+                self.stats["full_balls"] += 1
+            ball = detection[detection.class_id == ball_class_id]
+            if len(ball):
+                self.trajectory.observe(frame_num, ball.xyxy[0])
+            roi_detections.append(DetectionResult(detection, names))
+
+        self.stats["roi_frames"] += len(batch_frames)
+        self.stats["crops"] += len(crops)
+        self.frame_count = frame_nums[-1] + 1
+        return roi_detections
+
+    # (x1, y1, x2, y2) of the crop around center, inside the frame
+    def crop_window(self, frame_shape, center):
+        height, width = frame_shape[:2]
+        crop_width, crop_height = min(self.crop_size, width), min(self.crop_size, height)
+        x1 = int(np.clip(round(center[0] - crop_width / 2), 0, width - crop_width))
+        y1 = int(np.clip(round(center[1] - crop_height / 2), 0, height - crop_height))
+        return x1, y1, x1 + crop_width, y1 + crop_height
+
+def format_roi_stats(stats):
+    frames = max(stats["roi_frames"], 1)
+    return (f"Two-tier detection: {stats['roi_frames']} frames, crop pass on {stats['crops']} ({stats['crops'] / frames * 100:.1f}%), "
+            f"ball from the crop on {stats['crop_balls']} and from the full frame on {stats['full_balls']} "
+            f"({(stats['crop_balls'] + stats['full_balls']) / frames * 100:.1f}% of the frames), "
+            f"{stats['pixels'] / frames / 1000:.0f}k input pixels per frame")
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+
+_END_OF_STREAM = object()
+
+# Picks the batch size from the measured throughput (frames/s) of the batches run so far.
+# The size grows while throughput keeps improving, settles on the best size seen, and shrinks when
+# the GPU memory use goes over memory_fraction or a batch runs out of memory.
+class AdaptiveBatchSize:
+    def __init__(self, batch_size=20, min_batch_size=1, max_batch_size=64, growth=1.5, memory_fraction=0.9, adaptive=True):
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.growth = growth
+        self.memory_fraction = memory_fraction
+        self.adaptive = adaptive
+
+        self.throughput = {} # {batch_size: best frames/s}
+        self.settled = False
+
+    def update(self, batch_size, elapsed):
+        if not self.adaptive or elapsed <= 0:
+            return
+        # Partial batches at the end of the stream say nothing about the chosen size
+        if batch_size != self.batch_size:
+            return
+
+        throughput = batch_size / elapsed
+        self.throughput[batch_size] = max(throughput, self.throughput.get(batch_size, 0))
+
+        if memory_usage() > self.memory_fraction:
+            self.shrink(batch_size)
+            return
+
+        if self.settled:
+            return
+
+        best_batch_size = max(self.throughput, key=self.throughput.get)
+        if best_batch_size == batch_size and batch_size < self.max_batch_size:
+            self.batch_size = min(int(batch_size * self.growth) + 1, self.max_batch_size)
+        else:
+            self.batch_size = best_batch_size
+            self.settled = True
+
+    # Halve the size of a batch that was too large (batches queued before the last shrink can still be)
+    def shrink(self, batch_size):
+        self.batch_size = min(self.batch_size, max(batch_size // 2, self.min_batch_size))
+        self.max_batch_size = self.batch_size
+        self.settled = True
+
+# Fraction of the GPU memory in use, 0 when running on CPU
+def memory_usage():
+    try:
+        import torch
+    except ImportError:
+        return 0.0
+    if not torch.cuda.is_available():
+        return 0.0
+    total = torch.cuda.get_device_properties(0).total_memory
+    return torch.cuda.memory_reserved(0) / total
+
+def is_out_of_memory(error):
+    return isinstance(error, MemoryError) or (isinstance(error, RuntimeError) and 'out of memory' in str(error).lower())
+
+# Runs YOLO over a stream of frames in batches.
+# One worker gathers the next batch from the frame source while another runs inference on the current one,
+# and the detections are yielded in frame order as soon as their batch is done.
+# The gather worker also letterboxes and normalizes the batch for models with a preprocess step of their own
+# (OnnxDetector). ultralytics does that inside YOLO.predict, on the inference worker: about 3.5 ms per 1080p
+# frame on a CPU core (letterbox_batch to 640), which the GPU waits for. Its boxes come back in the
+# coordinates of the input it is given, so handing it a prepared tensor would also mean mapping them back.
+class BatchInferenceEngine:
+    def __init__(self, model, conf=0.1, batch_size=20, min_batch_size=1, max_batch_size=64, adaptive=True, prefetch_batches=2):
+        self.model = model
+        self.conf = conf
+        self.batch_size = AdaptiveBatchSize(batch_size, min_batch_size, max_batch_size, adaptive=adaptive)
+        self.prefetch_batches = prefetch_batches # Batches waiting on each side of the inference worker
+        self.stats = {"frames": 0, "batches": 0, "preprocess": 0.0, "inference": 0.0, "consumer_wait": 0.0}
+
+    # Model input of a batch, prepared on the gather worker. None when the model preprocesses in predict().
+    def prepare_batch(self, batch_frames):
+        if hasattr(self.model, 'predict_preprocessed'):
+            return self.model.preprocess(batch_frames)
+        return None
+
+    # Detections of one batch of frames, in order. frame_nums are the numbers of the frames in the video
+    # (None when they follow each other), for the engines that track objects over time. prepared is the
+    # output of prepare_batch.
+    def predict_batch(self, batch_frames, frame_nums=None, prepared=None):
+        if prepared is not None:
+            return self.model.predict_preprocessed(prepared, conf=self.conf)
+        return list(self.model.predict(batch_frames, conf=self.conf))
+
+    def predict(self, batch_frames, frame_nums=None, prepared=None):
+        try:
+            return self.predict_batch(batch_frames, frame_nums, prepared)
+        except Exception as e:
+            if not is_out_of_memory(e) or len(batch_frames) <= self.batch_size.min_batch_size:
+                raise
+            # Retry the batch in two halves with a smaller batch size from now on (prepared again by the model)
+            self.batch_size.shrink(len(batch_frames))
+            half = len(batch_frames) // 2
+            first_frame_nums, last_frame_nums = (frame_nums[:half], frame_nums[half:]) if frame_nums is not None else (None, None)
+            return self.predict(batch_frames[:half], first_frame_nums) + self.predict(batch_frames[half:], last_frame_nums)
+
+    # Yields a detection per frame (with the frame if return_frames is True).
+    # frame_nums: numbers in the video of the frames, when only some of its frames are detected
+    def iter_detections(self, frames, return_frames=False, frame_nums=None):
+        batches = queue.Queue(maxsize=self.prefetch_batches)
+        results = queue.Queue(maxsize=self.prefetch_batches)
+        stop_event = threading.Event()
+        errors = []
+
+        def put(target, item):
+            while not stop_event.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(source):
+            while not stop_event.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END_OF_STREAM
+
+        def prepare(batch_frames, batch_frame_nums):
+            start = time.perf_counter()
+            prepared = self.prepare_batch(batch_frames)
+            self.stats["preprocess"] += time.perf_counter() - start
+            return batch_frames, batch_frame_nums, prepared
+
+        def gather():
+            try:
+                batch_frames = []
+                batch_frame_nums = [] if frame_nums is not None else None
+                frame_num_iter = iter(frame_nums) if frame_nums is not None else None
+                for frame in frames:
+                    batch_frames.append(frame)
+                    if frame_num_iter is not None:
+                        batch_frame_nums.append(next(frame_num_iter))
+                    if len(batch_frames) >= self.batch_size.batch_size:
+                        put(batches, prepare(batch_frames, batch_frame_nums))
+                        batch_frames = []
+                        batch_frame_nums = [] if frame_nums is not None else None
+                    if stop_event.is_set():
+                        return
+                if batch_frames:
+                    put(batches, prepare(batch_frames, batch_frame_nums))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(batches, _END_OF_STREAM)
+
+        def infer():
+            try:
+                while True:
+                    batch = get(batches)
+                    if batch is _END_OF_STREAM:
+                        break
+                    batch_frames, batch_frame_nums, prepared = batch
+                    start = time.perf_counter()
+                    batch_detections = self.predict(batch_frames, batch_frame_nums, prepared)
+                    elapsed = time.perf_counter() - start
+                    self.batch_size.update(len(batch_frames), elapsed)
+                    self.stats["inference"] += elapsed
+                    self.stats["batches"] += 1
+                    put(results, (batch_frames, batch_detections))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(results, _END_OF_STREAM)
+
+        workers = [threading.Thread(target=gather, daemon=True), threading.Thread(target=infer, daemon=True)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                start = time.perf_counter()
+                result = get(results)
+                self.stats["consumer_wait"] += time.perf_counter() - start
+                if result is _END_OF_STREAM:
+                    break
+
+                batch_frames, batch_detections = result
+                for frame, detection in zip(batch_frames, batch_detections):
+                    self.stats["frames"] += 1
+                    yield (frame, detection) if return_frames else detection
+
+            if errors:
+                raise errors[0]
+        finally:
+            stop_event.set()
+            for worker in workers:
+                worker.join()
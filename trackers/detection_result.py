@@ -0,0 +1,13 @@
+# Detections of a frame already in supervision format, with the class names of the model ({class_id: name}).
+# Used like an ultralytics result by the detectors that do not run through ultralytics and by the two-tier detection.
+class DetectionResult:
+    def __init__(self, detections, names):
+        self.detections = detections
+        self.names = names
+
+# supervision Detections of a detector result (DetectionResult or ultralytics result)
+def to_detections(result):
+    if isinstance(result, DetectionResult):
+        return result.detections
+    import supervision as sv
+    return sv.Detections.from_ultralytics(result)
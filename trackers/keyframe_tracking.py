@@ -0,0 +1,137 @@
+import warnings
+import cv2
+import numpy as np
+
+# Chooses the frames YOLO runs on when detecting with a stride: every stride-th frame, plus the frames
+# where the scene changes (cut, replay) or the camera moves too fast for the boxes to be carried over.
+class KeyframeScheduler:
+    # scene_change_threshold: mean absolute difference (0-255) between the thumbnails of two frames
+    # max_camera_motion: camera movement in pixels per frame
+    def __init__(self, stride=4, scene_change_threshold=30.0, max_camera_motion=20.0, thumbnail_size=(64, 36)):
+        self.stride = stride
+        self.scene_change_threshold = scene_change_threshold
+        self.max_camera_motion = max_camera_motion
+        self.thumbnail_size = thumbnail_size
+
+    def thumbnail(self, frame):
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.thumbnail_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    # Sorted indices of the keyframes
+    def select_keyframes(self, frames, camera_movement_per_frame=None):
+        keyframes = []
+        previous_thumbnail = None
+        for frame_num, frame in enumerate(frames):
+            thumbnail = self.thumbnail(frame)
+            is_keyframe = not keyframes or frame_num - keyframes[-1] >= self.stride
+            if not is_keyframe and np.abs(thumbnail - previous_thumbnail).mean() > self.scene_change_threshold:
+                is_keyframe = True
+            if not is_keyframe and camera_movement_per_frame is not None:
+                is_keyframe = np.hypot(*camera_movement_per_frame[frame_num]) > self.max_camera_motion
+            if is_keyframe:
+                keyframes.append(frame_num)
+            previous_thumbnail = thumbnail
+        return keyframes
+
+# Carries the boxes of a frame over to the next one with sparse optical flow.
+# A few points inside each box are tracked with Lucas-Kanade, starting from where the camera movement
+# alone would put them, and the box moves by their median displacement. Boxes whose points are lost
+# only follow the camera. The ball is not propagated, it is interpolated between keyframes.
+class BoxPropagator:
+    def __init__(self, objects=("players", "referees"), grid_size=3, min_points=2):
+        self.objects = objects
+        self.grid_size = grid_size
+        self.min_points = min_points
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+            flags=cv2.OPTFLOW_USE_INITIAL_FLOW,
+        )
+        # Points over the torso, the legs move on their own
+        grid = (np.arange(grid_size) + 0.5) / grid_size
+        grid_x, grid_y = np.meshgrid(0.25 + 0.5 * grid, 0.2 + 0.4 * grid)
+        self.box_points = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1).astype(np.float32) # Fractions of the bbox
+
+    # camera_movement: movement of the camera from previous_gray to gray (old minus new position, like
+    # CameraMovementEstimator), [0, 0] if unknown
+    def propagate(self, previous_gray, gray, frame_tracks, camera_movement=(0, 0)):
+        camera_shift = -np.asarray(camera_movement, dtype=np.float32)
+        boxes = [(object, track_id, np.array(track["bbox"], dtype=np.float32))
+                 for object in self.objects for track_id, track in frame_tracks.get(object, {}).items()]
+
+        propagated = {"players": {}, "referees": {}, "ball": {}}
+        if not boxes:
+            return propagated
+
+        bboxes = np.stack([bbox for _, _, bbox in boxes])
+        sizes = bboxes[:, 2:] - bboxes[:, :2]
+        points = bboxes[:, None, :2] + self.box_points[None] * sizes[:, None] # (boxes, points, 2)
+        points = points.reshape(-1, 1, 2)
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, points, points + camera_shift, **self.lk_params)
+        displacement = (new_points - points).reshape(len(boxes), -1, 2)
+        tracked = status.reshape(len(boxes), -1).astype(bool)
+
+        # Median displacement of the tracked points of each box, the camera shift if too few were tracked
+        displacement = np.where(tracked[:, :, None], displacement, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # All-NaN boxes, replaced below
+            shifts = np.nanmedian(displacement, axis=1)
+        shifts[tracked.sum(axis=1) < self.min_points] = camera_shift
+
+        for (object, track_id, bbox), shift in zip(boxes, shifts):
+            propagated[object][track_id] = {"bbox": (bbox + np.tile(shift, 2)).tolist()}
+        return propagated
+
+def box_iou(boxes_a, boxes_b):
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+# Accuracy of tracks against reference tracks (full detection), frame by frame and regardless of track ids.
+# Boxes are matched greedily by IoU. Per class: recall and precision at iou_threshold, mean IoU of the
+# matched boxes, and for the ball the mean center error in pixels.
+def compare_tracks(reference_tracks, tracks, iou_threshold=0.5):
+    comparison = {}
+    for object in ("players", "referees", "ball"):
+        matched_ious = []
+        center_errors = []
+        num_reference = 0
+        num_predicted = 0
+        for reference_frame, frame in zip(reference_tracks[object], tracks[object]):
+            reference_boxes = [track["bbox"] for track in reference_frame.values()]
+            boxes = [track["bbox"] for track in frame.values()]
+            num_reference += len(reference_boxes)
+            num_predicted += len(boxes)
+            if not reference_boxes or not boxes:
+                continue
+
+            ious = box_iou(reference_boxes, boxes)
+            while ious.size and ious.max() >= iou_threshold:
+                i, j = np.unravel_index(np.argmax(ious), ious.shape)
+                matched_ious.append(ious[i, j])
+                reference_center = (np.array(reference_boxes[i][:2]) + np.array(reference_boxes[i][2:])) / 2
+                center = (np.array(boxes[j][:2]) + np.array(boxes[j][2:])) / 2
+                center_errors.append(np.linalg.norm(reference_center - center))
+                ious[i, :] = -1
+                ious[:, j] = -1
+
+        comparison[object] = {
+            "recall": len(matched_ious) / num_reference if num_reference else 1.0,
+            "precision": len(matched_ious) / num_predicted if num_predicted else 1.0,
+            "mean_iou": float(np.mean(matched_ious)) if matched_ious else 0.0,
+            "mean_center_error": float(np.mean(center_errors)) if center_errors else 0.0,
+        }
+    return comparison
+
+def format_track_comparison(comparison):
+    return "\n".join(
+        f"{object:<9} recall {stats['recall']*100:.1f}%, precision {stats['precision']*100:.1f}%, "
+        f"mean IoU {stats['mean_iou']:.3f}, center error {stats['mean_center_error']:.1f}px"
+        for object, stats in comparison.items()
+    )
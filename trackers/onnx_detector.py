@@ -0,0 +1,260 @@
+import ast
+import os
+import cv2
+import numpy as np
+from .detection_result import DetectionResult
+
+RUNTIMES = ('onnxruntime', 'openvino')
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+# Frames resized to fit imgsz and padded (gray, centered) to a multiple of stride, as one NCHW float32
+# RGB batch in [0, 1]. With auto the padding is the smallest that fits (only when all the frames have the
+# same size), otherwise every frame is padded to imgsz x imgsz. Returns the batch and the
+# (scale, pad_x, pad_y) of every frame to map the boxes back.
+def letterbox_batch(frames, imgsz=640, stride=32, auto=True, dtype=np.float32):
+    if isinstance(imgsz, int):
+        imgsz = (imgsz, imgsz)
+    same_size = len({frame.shape[:2] for frame in frames}) == 1
+    if auto and same_size:
+        height, width = frames[0].shape[:2]
+        scale = min(imgsz[0] / height, imgsz[1] / width)
+        batch_height = int(np.ceil(round(height * scale) / stride) * stride)
+        batch_width = int(np.ceil(round(width * scale) / stride) * stride)
+    else:
+        batch_height, batch_width = imgsz
+
+    batch = np.full((len(frames), batch_height, batch_width, 3), 114, dtype=np.uint8)
+    transforms = []
+    for index, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        scale = min(batch_height / height, batch_width / width)
+        resized_width, resized_height = round(width * scale), round(height * scale)
+        pad_x, pad_y = (batch_width - resized_width) // 2, (batch_height - resized_height) // 2
+        resized = frame if (resized_width, resized_height) == (width, height) else \
+            cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+        batch[index, pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = resized
+        transforms.append((scale, pad_x, pad_y))
+
+    # BGR NHWC uint8 -> RGB NCHW in [0, 1], in one pass
+    blob = np.empty((len(frames), 3, batch_height, batch_width), dtype=dtype)
+    np.multiply(batch[..., ::-1].transpose(0, 3, 1, 2), 1 / 255, out=blob, casting='unsafe')
+    return blob, transforms
+
+# supervision Detections of one image from the raw YOLOv8 output (4 + classes, anchors): the best class of every
+# anchor above conf, non-maximum suppression per class, boxes mapped back to the frame
+def postprocess(prediction, transform, frame_shape, names, conf=0.25, iou=0.7, classes=None, max_det=300):
+    import supervision as sv
+
+    prediction = prediction.T
+    scores = prediction[:, 4:]
+    class_id = scores.argmax(axis=1)
+    confidence = scores[np.arange(len(scores)), class_id]
+    keep = confidence > conf
+    if classes is not None:
+        keep &= np.isin(class_id, classes)
+    boxes, class_id, confidence = prediction[keep, :4], class_id[keep], confidence[keep]
+
+    if len(boxes):
+        top_left_boxes = np.column_stack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, 2:]]) # (x, y, w, h) for OpenCV
+        indices = cv2.dnn.NMSBoxesBatched(top_left_boxes.tolist(), confidence.tolist(), class_id.tolist(), conf, iou)
+        indices = np.array(indices, dtype=int).reshape(-1)[:max_det]
+        boxes, class_id, confidence = boxes[indices], class_id[indices], confidence[indices]
+
+    scale, pad_x, pad_y = transform
+    height, width = frame_shape[:2]
+    xyxy = np.column_stack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2]).reshape(-1, 4).astype(np.float32)
+    xyxy = (xyxy - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / scale
+    xyxy = np.clip(xyxy, 0, [width, height, width, height]).astype(np.float32)
+
+    return sv.Detections(xyxy=xyxy,
+                         confidence=confidence.astype(np.float32),
+                         class_id=class_id.astype(int),
+                         data={"class_name": np.array([names[int(c)] for c in class_id], dtype=str)})
+
+# File OnnxDetector loads for model_path and precision: the .onnx next to a .pt, its _int8.onnx version for
+# int8. The fp16 model of ONNX Runtime is converted from the returned file when it is loaded.
+def resolve_onnx_path(model_path, precision='fp32'):
+    stem, extension = os.path.splitext(model_path)
+    if extension == '.pt':
+        model_path = stem + '.onnx'
+    if precision == 'int8' and model_path.endswith('.onnx') and not model_path.endswith('_int8.onnx'):
+        model_path = model_path[:-len('.onnx')] + '_int8.onnx'
+    return model_path
+
+# YOLOv8 detector exported to ONNX (export_onnx), run on the CPU with ONNX Runtime or OpenVINO instead of
+# ultralytics and torch. predict() takes the same arguments as YOLO.predict and returns DetectionResult,
+# so it can stand in for the YOLO model of BatchInferenceEngine and TwoTierInferenceEngine.
+# - model_path: the .onnx file (a .pt path means the .onnx next to it), or an OpenVINO .xml
+# - precision: fp32, fp16 (ONNX Runtime: the model converted to float16, OpenVINO: f16 inference hint) or
+#   int8 (the <name>_int8.onnx made by quantize_onnx, ONNX Runtime quantizes the weights itself if it is missing)
+# - num_threads: inference threads (None: the runtime default, all the cores)
+# - names: {class_id: name}, read from the ultralytics export metadata when not given
+class OnnxDetector:
+    def __init__(self, model_path, runtime='onnxruntime', precision='fp32', num_threads=None, imgsz=None, iou=0.7, names=None):
+        if runtime not in RUNTIMES:
+            raise ValueError(f"Unknown runtime: {runtime}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.runtime = runtime
+        self.precision = precision
+        self.num_threads = num_threads
+        self.iou = iou
+        self.model_path = self.resolve_model_path(model_path)
+        if runtime == 'onnxruntime':
+            self.load_onnxruntime()
+            metadata = parse_metadata(self.session.get_modelmeta().custom_metadata_map)
+        else:
+            self.load_openvino()
+            metadata = parse_metadata(read_metadata_properties(self.model_path))
+
+        self.names = names or metadata.get("names")
+        if self.names is None:
+            raise ValueError(f"No class names in {self.model_path}, pass names={{class_id: name}}")
+        self.imgsz = imgsz or metadata.get("imgsz", 640)
+
+    def resolve_model_path(self, model_path):
+        onnx_path = resolve_onnx_path(model_path)
+        if not os.path.exists(onnx_path) and onnx_path != model_path:
+            raise FileNotFoundError(f"{onnx_path} not found, export it first: export_onnx('{model_path}')")
+        resolved_path = resolve_onnx_path(model_path, self.precision)
+        if resolved_path != onnx_path and not os.path.exists(resolved_path):
+            if self.runtime == 'openvino':
+                raise FileNotFoundError(f"{resolved_path} not found, make it with quantize_onnx('{onnx_path}', calibration_frames=...)")
+            quantize_onnx(onnx_path, resolved_path)
+        return resolved_path
+
+    def load_onnxruntime(self):
+        import onnxruntime as ort
+
+        model_path = self.model_path
+        if self.precision == 'fp16':
+            model_path = convert_fp16(model_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_shape = [dim if isinstance(dim, int) else None for dim in model_input.shape]
+        self.input_dtype = np.float16 if model_input.type == 'tensor(float16)' else np.float32
+        self.infer = lambda blob: self.session.run(None, {self.input_name: blob})[0]
+
+    def load_openvino(self):
+        import openvino as ov
+
+        core = ov.Core()
+        model = core.read_model(self.model_path)
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if self.num_threads:
+            config["INFERENCE_NUM_THREADS"] = self.num_threads
+        if self.precision == 'fp16':
+            config["INFERENCE_PRECISION_HINT"] = "f16"
+        self.compiled_model = core.compile_model(model, 'CPU', config)
+        self.input_shape = [dim.get_length() if dim.is_static else None for dim in model.inputs[0].get_partial_shape()]
+        self.input_dtype = np.float32
+        output = self.compiled_model.output(0)
+        self.infer = lambda blob: self.compiled_model([blob])[output]
+
+    # Same arguments as YOLO.predict. A model exported with a fixed input size always runs at that size.
+    def predict(self, frames, conf=0.25, imgsz=None, classes=None, **kwargs):
+        return self.predict_preprocessed(self.preprocess(frames, imgsz), conf, classes)
+
+    # Letterboxed and normalized input of the frames with what is needed to map the boxes back, so a batch
+    # can be prepared on another thread than the one running the model
+    def preprocess(self, frames, imgsz=None):
+        frames = list(frames)
+        if not frames:
+            return None, [], []
+        static_size = self.input_shape[2] is not None and self.input_shape[3] is not None
+        if static_size:
+            blob, transforms = letterbox_batch(frames, (self.input_shape[2], self.input_shape[3]), auto=False, dtype=self.input_dtype)
+        else:
+            blob, transforms = letterbox_batch(frames, imgsz or self.imgsz, dtype=self.input_dtype)
+        return blob, transforms, [frame.shape for frame in frames]
+
+    def predict_preprocessed(self, preprocessed, conf=0.25, classes=None):
+        blob, transforms, frame_shapes = preprocessed
+        if blob is None:
+            return []
+        predictions = self.run(blob)
+        return [DetectionResult(postprocess(prediction, transform, frame_shape, self.names, conf, self.iou, classes), self.names)
+                for prediction, transform, frame_shape in zip(predictions, transforms, frame_shapes)]
+
+    # A model exported with a fixed batch size runs the batch in chunks of that size
+    def run(self, blob):
+        batch_size = self.input_shape[0]
+        if batch_size is None or batch_size == len(blob):
+            return self.infer(blob)
+        predictions = []
+        for start in range(0, len(blob), batch_size):
+            chunk = blob[start:start + batch_size]
+            if len(chunk) < batch_size:
+                chunk = np.concatenate([chunk, np.zeros((batch_size - len(chunk),) + chunk.shape[1:], dtype=chunk.dtype)])
+            predictions.append(self.infer(chunk)[:len(blob) - start])
+        return np.concatenate(predictions)
+
+# Metadata ultralytics writes into its ONNX export (metadata.yaml next to an OpenVINO export), for OpenVINO
+def read_metadata_properties(model_path):
+    if model_path.endswith('.onnx'):
+        import onnx
+        return {prop.key: prop.value for prop in onnx.load(model_path, load_external_data=False).metadata_props}
+    metadata_path = os.path.join(os.path.dirname(model_path), 'metadata.yaml')
+    if not os.path.exists(metadata_path):
+        return {}
+    import yaml
+    with open(metadata_path) as f:
+        return {key: str(value) for key, value in yaml.safe_load(f).items()}
+
+# Class names and input size of the model from the export metadata
+def parse_metadata(properties):
+    metadata = {}
+    if "names" in properties:
+        metadata["names"] = {int(class_id): name for class_id, name in ast.literal_eval(properties["names"]).items()}
+    if "imgsz" in properties:
+        metadata["imgsz"] = tuple(ast.literal_eval(properties["imgsz"]))
+    return metadata
+
+# Export the ultralytics weights to ONNX, with a dynamic batch and input size by default (needs ultralytics and torch,
+# only where the model is exported)
+def export_onnx(model_path='models/best.pt', imgsz=640, dynamic=True, simplify=True):
+    from ultralytics import YOLO
+    return YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=dynamic, simplify=simplify)
+
+# int8 version of an ONNX model. With calibration_frames (a few hundred frames of the kind of video it will
+# see) the weights and activations are quantized statically (QDQ, also runs on OpenVINO), otherwise only the
+# weights are (dynamic quantization, ONNX Runtime only).
+def quantize_onnx(onnx_path, output_path=None, calibration_frames=None, imgsz=640, batch_size=8):
+    from onnxruntime.quantization import quantize_dynamic, quantize_static, CalibrationDataReader, QuantFormat, QuantType
+
+    output_path = output_path or onnx_path[:-len('.onnx')] + '_int8.onnx'
+    if calibration_frames is None:
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+        return output_path
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.batches = (letterbox_batch(calibration_frames[start:start + batch_size], imgsz, auto=False)[0]
+                            for start in range(0, len(calibration_frames), batch_size))
+            self.input_name = input_name
+
+        def get_next(self):
+            blob = next(self.batches, None)
+            return None if blob is None else {self.input_name: blob}
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    quantize_static(onnx_path, output_path, FrameReader(input_name), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return output_path
+
+# float16 version of an ONNX model next to it (<name>_fp16.onnx), inputs and outputs stay float32.
+# Needs onnxconverter-common.
+def convert_fp16(onnx_path):
+    output_path = onnx_path[:-len('.onnx')] + '_fp16.onnx'
+    if not os.path.exists(output_path):
+        import onnx
+        from onnxconverter_common import float16
+        onnx.save(float16.convert_float_to_float16(onnx.load(onnx_path), keep_io_types=True), output_path)
+    return output_path
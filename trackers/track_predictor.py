@@ -0,0 +1,96 @@
+import numpy as np
+
+# Motion model of ByteTrack's Kalman filter: the state is the box center, aspect ratio and height (x, y, a, h)
+# with their velocities, the noise scales with the box height
+STD_WEIGHT_POSITION = 1 / 20
+STD_WEIGHT_VELOCITY = 1 / 160
+
+# Predicts the boxes of the tracked players and referees on frames where detection is skipped.
+# ByteTrack predicts its tracks with a constant velocity Kalman filter, but supervision keeps that state inside
+# its tracker and only steps it when it gets detections. So this is the same filter (ByteTrack's matrices and
+# noise weights) run on the boxes ByteTrack returns: corrected on every detected frame, stepped once per
+# skipped frame. The ball is not predicted, the ball gap filler interpolates it.
+class TrackPredictor:
+    def __init__(self, objects=("players", "referees")):
+        self.objects = objects
+        self.motion = np.eye(8)
+        self.motion[:4, 4:] = np.eye(4) # One frame per step
+        self.track_keys = [] # (object, track_id) of each row of means and covariances
+        self.means = np.zeros((0, 8))
+        self.covariances = np.zeros((0, 8, 8))
+
+    # Tracks of a frame that went through detection. Tracks missing from it are dropped, new ones start
+    # with no velocity.
+    def update(self, frame_tracks):
+        self.step()
+        rows = {key: row for row, key in enumerate(self.track_keys)}
+        track_keys, measurements, previous_rows = [], [], []
+        for object in self.objects:
+            for track_id, track in frame_tracks.get(object, {}).items():
+                track_keys.append((object, track_id))
+                measurements.append(bbox_to_xyah(track["bbox"]))
+                previous_rows.append(rows.get((object, track_id), -1))
+
+        measurements = np.array(measurements, dtype=np.float64).reshape(-1, 4)
+        previous_rows = np.array(previous_rows, dtype=np.int64)
+        means, covariances = self.initiate(measurements)
+        tracked = previous_rows >= 0
+        if tracked.any():
+            means[tracked], covariances[tracked] = self.correct(self.means[previous_rows[tracked]],
+                                                                self.covariances[previous_rows[tracked]],
+                                                                measurements[tracked])
+        self.track_keys, self.means, self.covariances = track_keys, means, covariances
+
+    # Tracks of the next frame, one step of the filter after the previous frame
+    def predict(self):
+        self.step()
+        frame_tracks = {"players": {}, "referees": {}, "ball": {}}
+        for (object, track_id), mean in zip(self.track_keys, self.means):
+            frame_tracks[object][track_id] = {"bbox": xyah_to_bbox(mean[:4])}
+        return frame_tracks
+
+    def initiate(self, measurements):
+        means = np.concatenate([measurements, np.zeros_like(measurements)], axis=1)
+        height = measurements[:, 3]
+        std = np.stack([2 * STD_WEIGHT_POSITION * height, 2 * STD_WEIGHT_POSITION * height, np.full_like(height, 1e-2),
+                        2 * STD_WEIGHT_POSITION * height, 10 * STD_WEIGHT_VELOCITY * height, 10 * STD_WEIGHT_VELOCITY * height,
+                        np.full_like(height, 1e-5), 10 * STD_WEIGHT_VELOCITY * height], axis=1)
+        return means, diagonal(std ** 2)
+
+    # Advance every track by one frame
+    def step(self):
+        height = self.means[:, 3]
+        std = np.stack([STD_WEIGHT_POSITION * height, STD_WEIGHT_POSITION * height, np.full_like(height, 1e-2),
+                        STD_WEIGHT_POSITION * height, STD_WEIGHT_VELOCITY * height, STD_WEIGHT_VELOCITY * height,
+                        np.full_like(height, 1e-5), STD_WEIGHT_VELOCITY * height], axis=1)
+        self.means = self.means @ self.motion.T
+        self.covariances = self.motion @ self.covariances @ self.motion.T + diagonal(std ** 2)
+
+    def correct(self, means, covariances, measurements):
+        height = means[:, 3]
+        std = np.stack([STD_WEIGHT_POSITION * height, STD_WEIGHT_POSITION * height, np.full_like(height, 1e-1),
+                        STD_WEIGHT_POSITION * height], axis=1)
+        projected_covariances = covariances[:, :4, :4] + diagonal(std ** 2)
+        # Kalman gain K = P H^T S^-1, solved instead of inverting S
+        gains = np.linalg.solve(projected_covariances, covariances[:, :4, :]).transpose(0, 2, 1)
+        innovations = measurements - means[:, :4]
+        means = means + np.einsum('nij,nj->ni', gains, innovations)
+        covariances = covariances - gains @ projected_covariances @ gains.transpose(0, 2, 1)
+        return means, covariances
+
+# Stack of diagonal matrices, one per row of values
+def diagonal(values):
+    matrices = np.zeros(values.shape + (values.shape[-1],))
+    index = np.arange(values.shape[-1])
+    matrices[:, index, index] = values
+    return matrices
+
+def bbox_to_xyah(bbox):
+    x1, y1, x2, y2 = bbox
+    height = y2 - y1
+    return [(x1 + x2) / 2, (y1 + y2) / 2, (x2 - x1) / height if height else 0.0, height]
+
+def xyah_to_bbox(xyah):
+    x, y, aspect_ratio, height = xyah
+    width = aspect_ratio * height
+    return np.array([x - width / 2, y - height / 2, x + width / 2, y + height / 2]).tolist()
@@ -1,20 +1,78 @@
-from ultralytics import YOLO
-import supervision as sv
 import pickle
 import os
 import numpy as np
-import pandas as pd
 import cv2
-import sys
-sys.path.append('../')
-from utils import get_center_of_bbox, get_bbox_width, get_foot_position
+from utils import get_center_of_bbox, get_foot_position, TrackTable, StageProfiler
+from .batch_inference import BatchInferenceEngine
+from .ball_roi import TwoTierInferenceEngine
+from .detection_result import to_detections
+from .onnx_detector import OnnxDetector, resolve_onnx_path
+from .ball_interpolator import BallGapFiller
+from .keyframe_tracking import KeyframeScheduler, BoxPropagator
+
+# Detector backends: ultralytics (YOLO weights, torch) or the ONNX export on ONNX Runtime or OpenVINO (CPU)
+DETECTOR_BACKENDS = ('ultralytics', 'onnxruntime', 'openvino')
 
 class Tracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        self.tracker = sv.ByteTrack()
+    # detection_stride: run the detector on every detection_stride-th frame (and on scene changes and fast
+    # camera moves, see KeyframeScheduler for keyframe_params), the boxes of the other frames are carried
+    # over with optical flow
+    # ball_roi: two-tier detection, the full frames at a low resolution then a full resolution crop around the
+    # ball (see TwoTierInferenceEngine for ball_roi_params: imgsz, crop_size, ball_conf, ...)
+    # backend: one of DETECTOR_BACKENDS, backend_params are passed to OnnxDetector (precision, num_threads, ...)
+    def __init__(self, model_path, batch_size=20, max_batch_size=64, adaptive_batch_size=True, conf=0.1, detection_stride=1, keyframe_params=None,
+                 ball_roi=False, ball_roi_params=None, backend='ultralytics', backend_params=None):
+        if backend not in DETECTOR_BACKENDS:
+            raise ValueError(f"Unknown detector backend: {backend}")
+        self.model_path = model_path
+        self.backend = backend
+        self.backend_params = backend_params or {}
+        self.conf = conf
+        self.detection_stride = detection_stride
+        self.keyframe_params = keyframe_params or {}
+        self.keyframe_scheduler = KeyframeScheduler(detection_stride, **self.keyframe_params)
+        self.box_propagator = BoxPropagator()
+        self.keyframe_stats = {"frames": 0, "keyframes": 0}
+        self.profiler = StageProfiler(enabled=False) # Replaced by the pipeline's profiler to time the tracking
+        self.batch_params = {"batch_size": batch_size, "max_batch_size": max_batch_size, "adaptive": adaptive_batch_size}
+        self.ball_roi = ball_roi
+        self.ball_roi_params = ball_roi_params or {}
+
+        # The detector, supervision and the weights are only loaded once something is detected, runs on stubs
+        # or cached tracks never pay for them
+        self.model = None
+        self.inference_engine = None
+        self.tracker = None # ByteTrack
+
+    def load_model(self):
+        if self.model is None:
+            if self.backend == 'ultralytics':
+                from ultralytics import YOLO
+                self.model = YOLO(self.model_path)
+            else:
+                self.model = OnnxDetector(self.model_path, runtime=self.backend, **self.backend_params)
+            if self.ball_roi:
+                self.inference_engine = TwoTierInferenceEngine(self.model, conf=self.conf, **self.batch_params, **self.ball_roi_params)
+            else:
+                self.inference_engine = BatchInferenceEngine(self.model, conf=self.conf, **self.batch_params)
+        return self.model
+
+    # Weight files the detector runs: the YOLO weights, or the ONNX (int8) model or OpenVINO IR of the backend
+    def detector_files(self):
+        if self.backend == 'ultralytics':
+            return [self.model_path]
+        model_path = resolve_onnx_path(self.model_path, self.backend_params.get('precision', 'fp32'))
+        if not os.path.exists(model_path):
+            self.load_model() # Quantizes the int8 model, or raises if there is no export
+        if model_path.endswith('.xml'):
+            return [model_path, model_path[:-len('.xml')] + '.bin']
+        return [model_path]
 
     def add_position_to_track(self, tracks):
+        if isinstance(tracks, TrackTable):
+            self.add_position_to_table(tracks)
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -25,39 +83,44 @@ class Tracker:
                         position = get_foot_position(bbox)
                     tracks[object][frame_num][track_id]['position'] = position
 
-    # Interpolate the ball position (Ball is not detected in all frames)
-    def interpolate_ball_position(self, ball_positions):
-        ball_positions = [x.get(1, {}).get('bbox', []) for x in ball_positions]
-        df_ball_positions = pd.DataFrame(ball_positions, columns=['x1', 'y1', 'x2', 'y2'])
+    # Same as add_position_to_track on the whole table at once (truncated to int like get_center_of_bbox)
+    def add_position_to_table(self, table):
+        bbox = table.rows['bbox'].astype(np.float64)
+        is_ball = table.class_mask('ball')
+        table.rows['position'][:, 0] = np.trunc((bbox[:, 0] + bbox[:, 2]) / 2)
+        table.rows['position'][:, 1] = np.where(is_ball, np.trunc((bbox[:, 1] + bbox[:, 3]) / 2), np.trunc(bbox[:, 3]))
 
-        # Interpolate the missing values
-        df_ball_positions = df_ball_positions.interpolate()
-        df_ball_positions = df_ball_positions.bfill()
+    # Interpolate the ball position (Ball is not detected in all frames)
+    def interpolate_ball_position(self, ball_positions, max_gap=None, max_jump=None):
+        ball_gap_filler = BallGapFiller(max_gap, max_jump)
+        interpolated = []
+        for frame_num, ball in enumerate(ball_positions):
+            bbox = ball[1]['bbox'] if 1 in ball else None
+            interpolated += ball_gap_filler.push(frame_num, bbox)
+        interpolated += ball_gap_filler.flush()
 
-        ball_positions = [{1: {"bbox":x}} for x in df_ball_positions.to_numpy().tolist()]
+        ball_positions = [{1: {"bbox": bbox}} if bbox is not None else {} for frame_num, bbox in interpolated]
 
         return ball_positions
 
 
     # Detect objects in the frames
     def detect_frames(self, frames):
-        batch_size = 20
-        detections = []
-        # Split the frames into batches
-        for i in range(0, len(frames), batch_size):
-            batch_frames = frames[i:i+batch_size]
-            batch_detections = self.model.predict(batch_frames, conf = 0.1)
-            detections += batch_detections
-        return detections
-
-    def get_object_track(self, frames, read_from_stubs=False, stub_path=None):
+        return list(self.iter_detections(frames))
+
+    # Detections are yielded as soon as their batch is done while the next batch is being prepared.
+    # frame_nums: numbers of the frames in the video when only some of them are detected
+    def iter_detections(self, frames, frame_nums=None):
+        self.load_model()
+        return self.inference_engine.iter_detections(frames, frame_nums=frame_nums)
+
+    # camera_movement_per_frame (from CameraMovementEstimator) seeds the optical flow between keyframes
+    def get_object_track(self, frames, read_from_stubs=False, stub_path=None, camera_movement_per_frame=None):
         # If read_from_stubs is True, read the tracks from the stub file
         if read_from_stubs and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path, 'rb') as f:
                 tracks = pickle.load(f)
             return tracks
-        # Detect objects in the frames
-        detections = self.detect_frames(frames)
 
         tracks = {
             "players" : [], 
@@ -65,13 +128,103 @@ class Tracker:
             "ball" : []
         }
 
-        # Convert the detections to supervision format
-        for frame_num, detection in enumerate(detections):
+        # Track the objects while the following frames are still being detected
+        if self.detection_stride > 1:
+            frame_tracks_iter = self.iter_keyframe_tracks(frames, camera_movement_per_frame)
+        else:
+            frame_tracks_iter = (self.track_detection(detection) for detection in self.iter_detections(frames))
+
+        for frame_tracks in frame_tracks_iter:
+            for object, object_track in frame_tracks.items():
+                tracks[object].append(object_track)
+
+        # Save the tracks to a file
+        if stub_path is not None:
+            with open(stub_path, 'wb') as f:
+                pickle.dump(tracks, f)
+
+        return tracks
+
+    # Tracks of the whole video as a TrackTable. With a PipelineCache the result is reused as long as
+    # the video, the model weights and the detection parameters are unchanged.
+    def get_track_table(self, frames, video_path=None, cache=None, camera_movement_per_frame=None):
+        if cache is not None and video_path is not None:
+            params = {'conf': self.conf, 'tracker': 'bytetrack'}
+            if self.detection_stride > 1:
+                params.update(detection_stride=self.detection_stride, **self.keyframe_params)
+                # The boxes between keyframes are moved with the camera movement, a different estimate
+                # (stub, mode, pyramid level, workers) gives different tracks
+                if camera_movement_per_frame is not None:
+                    params.update(camera_movement=cache.array_digest(camera_movement_per_frame))
+            if self.ball_roi:
+                params.update(ball_roi=True, **self.ball_roi_params)
+            if self.backend != 'ultralytics':
+                params.update(backend=self.backend, precision=self.backend_params.get('precision', 'fp32'))
+            key = cache.make_key('tracks', files=[video_path] + self.detector_files(), params=params)
+            cached = cache.get('tracks', key)
+            if cached is not None:
+                return TrackTable(cached['rows'], cached['num_frames'])
+
+        table = TrackTable.from_tracks(self.get_object_track(frames, camera_movement_per_frame=camera_movement_per_frame))
+
+        if cache is not None and video_path is not None:
+            cache.put('tracks', key, {'rows': table.rows, 'num_frames': table.num_frames})
+
+        return table
+
+    # Tracks of every frame with detection on the keyframes only. ByteTrack only sees the keyframes, the
+    # boxes of the frames in between are propagated from the previous frame with optical flow seeded by
+    # the camera movement. The ball is left out of those frames, ball interpolation fills it in.
+    def iter_keyframe_tracks(self, frames, camera_movement_per_frame=None):
+        keyframes = self.keyframe_scheduler.select_keyframes(frames, camera_movement_per_frame)
+        self.keyframe_stats = {"frames": len(frames), "keyframes": len(keyframes)}
+        detections = self.iter_detections([frames[frame_num] for frame_num in keyframes], frame_nums=keyframes)
+        keyframes = set(keyframes)
+
+        previous_gray = None
+        frame_tracks = None
+        for frame_num, frame in enumerate(frames):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if frame_num in keyframes:
+                frame_tracks = self.track_detection(next(detections))
+            else:
+                camera_movement = camera_movement_per_frame[frame_num] if camera_movement_per_frame is not None else (0, 0)
+                with self.profiler.stage('track'):
+                    frame_tracks = self.box_propagator.propagate(previous_gray, gray, frame_tracks, camera_movement)
+            previous_gray = gray
+            yield frame_tracks
+
+    # New track ids from the next frame on, for another video
+    def reset_tracking(self):
+        self.tracker = None
+        if isinstance(self.inference_engine, TwoTierInferenceEngine):
+            self.inference_engine.reset()
+
+    # Detect and track a single frame, for live sources where frames cannot be batched
+    # (frame_num in the stream, some frames are not detected)
+    def detect_frame_tracks(self, frame, frame_num=None):
+        self.load_model()
+        detection = self.inference_engine.predict([frame], [frame_num] if frame_num is not None else None)[0]
+        return self.track_detection(detection)
+
+    # Detect and track a stream of frames, yielding (frame, frame_tracks) in order
+    def iter_frame_tracks(self, frames):
+        self.load_model()
+        for frame, detection in self.inference_engine.iter_detections(frames, return_frames=True):
+            yield frame, self.track_detection(detection)
+
+    # Convert the detection of a single frame into {"players": {...}, "referees": {...}, "ball": {...}}
+    def track_detection(self, detection):
+        import supervision as sv
+        if self.tracker is None:
+            self.tracker = sv.ByteTrack()
+
+        with self.profiler.stage('track'):
             cls_names = detection.names   # Original {0:Person, 1:Car, 2:Motorcycle}
             cls_names_inv = {value:key for key, value in cls_names.items()}  # Inverted {'Person':0, 'Car':1, 'Motorcycle':2}
 
-            # Convert to supervision format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+            # Convert to supervision format (the ONNX and two-tier detections already are)
+            detection_supervision = to_detections(detection)
 
             # Convert Goalkeeper to Player (For simplicity)
             for object_index, class_id in enumerate(detection_supervision.class_id):
@@ -80,11 +233,13 @@ class Tracker:
 
             # Track the objects
             detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
-            
-            # Append a dictionary where key is the track_id and value is the bounding box
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
+
+            # A dictionary where key is the track_id and value is the bounding box
+            frame_tracks = {
+                "players" : {},
+                "referees" : {},
+                "ball" : {}
+            }
 
             for frame_detection in detection_with_tracks:
                 bbox = frame_detection[0].tolist()
@@ -92,10 +247,10 @@ class Tracker:
                 track_id = frame_detection[4]
 
                 if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox": bbox}
+                    frame_tracks["players"][track_id] = {"bbox": bbox}
 
                 if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox": bbox}
+                    frame_tracks["referees"][track_id] = {"bbox": bbox}
 
                 # No need to do for ball since there is only one ball in each frame
 
@@ -104,122 +259,6 @@ class Tracker:
                 cls_id = frame_detection[3]
 
                 if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox": bbox}  # Only one ball
-
-        # Save the tracks to a file
-        if stub_path is not None:
-            with open(stub_path, 'wb') as f:
-                pickle.dump(tracks, f)
-
-        return tracks
-
-    def draw_ellipse(self, frame, bbox, color, track_id=None):
-        y2 = int(bbox[3])
-
-        x_center, y2_center = get_center_of_bbox(bbox)  # Use y2 instead of y2_center to draw the ellipse at the bottom of the bbox
-        width = get_bbox_width(bbox) # One of the 2 radius for the ellipse (There is major and minor axis for an ellipse)
-        
-        cv2.ellipse(
-            frame,
-            center = (x_center, y2),
-            axes = (int(width), int(0.35*width)),  # Major and minor radius
-            angle = 0.0,
-            startAngle = -45,
-            endAngle = 235,
-            color = color,
-            thickness = 2,
-            lineType = cv2.LINE_4
-        )
-
-        rectangle_width = 40
-        rectangle_height = 20
-        x1_rect = x_center - rectangle_width // 2
-        x2_rect = x_center + rectangle_width // 2
-        y1_rect = (y2 - (rectangle_height // 2)) + 15
-        y2_rect = (y2 + (rectangle_height // 2)) + 15
-
-        if track_id is not None:
-            cv2.rectangle(frame, (int(x1_rect), int(y1_rect)), (int(x2_rect), int(y2_rect)), color, cv2.FILLED)
-            
-            x1_text = x1_rect + 12
-            if track_id > 99:
-                x1_text -= 10
-
-            cv2.putText(frame, str(track_id), (int(x1_text), int(y2_rect - 2)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-
-        return frame
-
-
-    def draw_triangle(self, frame, bbox, color):
-        y = int(bbox[1])
-        x, y_center = get_center_of_bbox(bbox)
-
-        triangle_points = np.array([
-            [x,y],
-            [x-10,y-20],
-            [x+10,y-20],
-        ])
-
-        cv2.drawContours(frame, [triangle_points], 0, color, cv2.FILLED)
-        cv2.drawContours(frame, [triangle_points], 0, (0,0,0), 2)
-
-        return frame
-
-
-    def draw_team_ball_control(self, frame, frame_num, team_ball_control):
-        # Draw a semi-transparent rectangle at the bottom-right of the frame
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), cv2.FILLED)
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]
-
-        # Get the number of frames each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 2].shape[0]
-        team_1 = team_1_num_frames / (team_1_num_frames + team_2_num_frames)
-        team_2 = team_2_num_frames / (team_1_num_frames + team_2_num_frames)
-
-        cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%", (1400, 900), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-        cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%", (1400, 950), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-
-        return frame
-
-
-    def draw_annotations(self, video_frames, tracks, team_ball_control):
-        output_video_frames = []
-        for frame_num, frame in enumerate(video_frames):
-            # print(f"Processing frame {frame_num}...")
-            # Make a copy of the frame so we don't modify the original frame
-            frame = frame.copy()
-
-            player_dict = tracks["players"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
-
-            # Draw the players
-            for track_id, player in player_dict.items():
-                color = player.get("team_color", (0,0,255))
-                frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
-
-                if player.get("has_ball", False):
-                    frame = self.draw_triangle(frame, player["bbox"], (0, 0, 255))
-
-            # Draw the referees
-            for track_id, referee in referee_dict.items():
-                # print(f"Drawing ellipse for player {track_id} on frame {frame_num}.")
-                frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255), track_id)
-
-            # Draw the ball
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_triangle(frame, ball["bbox"], (0, 255, 0))
-
-
-            # Draw team ball control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
-
+                    frame_tracks["ball"][1] = {"bbox": bbox}  # Only one ball
 
-            output_video_frames.append(frame)
-        # print("Finished drawing all frames.")
-        return output_video_frames
+            return frame_tracks
@@ -1,3 +1,9 @@
 # Description: This file is used to import all the utility functions in the package.
-from .video_utils import read_video, save_video
+from .video_utils import read_video, save_video, read_video_stream, save_video_stream, get_video_fps, get_video_size
+from .video_io import ThreadedVideoReader, ThreadedVideoWriter, LiveVideoReader, format_io_stats
+from .video_encoders import OpenCVEncoder, FFmpegEncoder, make_encoder, video_extension, ENCODERS
 from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance, measure_xy_distance, get_foot_position
+from .track_table import TrackTable, TRACK_DTYPE, OBJECT_CLASSES
+from .track_export import TrackExporter, read_tracks, read_export_metadata
+from .pipeline_cache import PipelineCache
+from .profiler import StageProfiler, PIPELINE_STAGES
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+# Bump when a cached stage changes its output for the same inputs
+CACHE_VERSION = 3
+
+# Stage results keyed by a hash of the input files (video, model weights) and the stage parameters.
+# Each entry is a directory of .npy arrays loaded memory-mapped, the least recently used entries are
+# evicted once the cache grows over max_size_bytes.
+class PipelineCache:
+    def __init__(self, cache_dir='cache', max_size_bytes=4 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.stats = {}  # {stage: {"hits": 0, "misses": 0}}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {"entries": {}, "file_digests": {}}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # Content hash of a file, remembered by (size, mtime) so an unchanged video is not read again
+    def file_digest(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self.index["file_digests"].get(path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        self.index["file_digests"][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        self.save_index()
+        return digest
+
+    # Key of a stage result: the content of every input file plus the stage parameters (JSON serialisable)
+    def make_key(self, stage, files=(), params=None):
+        key = {
+            "version": CACHE_VERSION,
+            "stage": stage,
+            "files": [self.file_digest(path) for path in files],
+            "params": params or {},
+        }
+        key = json.dumps(key, sort_keys=True, default=str)
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    # Content hash of an array input of a stage (e.g. the camera movement of the video), for make_key params
+    @staticmethod
+    def array_digest(array):
+        array = np.ascontiguousarray(np.asarray(array, dtype=np.float64))
+        digest = hashlib.blake2b(array.tobytes(), digest_size=16)
+        digest.update(str(array.shape).encode())
+        return digest.hexdigest()
+
+    def entry_dir(self, stage, key):
+        return os.path.join(self.cache_dir, f'{stage}-{key}')
+
+    def record(self, stage, outcome):
+        stage_stats = self.stats.setdefault(stage, {"hits": 0, "misses": 0})
+        stage_stats[outcome] += 1
+
+    # {name: array} memory-mapped read only, or None if the stage result is not cached
+    def get(self, stage, key):
+        entry_name = f'{stage}-{key}'
+        entry_dir = self.entry_dir(stage, key)
+        if entry_name not in self.index["entries"] or not os.path.isdir(entry_dir):
+            self.record(stage, "misses")
+            return None
+
+        with open(os.path.join(entry_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in meta["arrays"]}
+        arrays.update(meta["values"])
+
+        self.index["entries"][entry_name]["last_access"] = time.time()
+        self.save_index()
+        self.record(stage, "hits")
+        return arrays
+
+    # Store {name: array or JSON value} as the result of a stage
+    def put(self, stage, key, values):
+        entry_name = f'{stage}-{key}'
+        entry_dir = self.entry_dir(stage, key)
+        tmp_dir = entry_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        arrays = {name: value for name, value in values.items() if isinstance(value, np.ndarray)}
+        meta = {
+            "arrays": list(arrays),
+            "values": {name: value for name, value in values.items() if name not in arrays},
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # Swap the finished entry in so a crash never leaves a half written one behind
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+        size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+        self.index["entries"][entry_name] = {"size": size, "last_access": time.time()}
+        self.evict()
+        self.save_index()
+
+    # Drop the least recently used entries until the cache fits in max_size_bytes
+    def evict(self):
+        entries = self.index["entries"]
+        total_size = sum(entry["size"] for entry in entries.values())
+        for entry_name in sorted(entries, key=lambda name: entries[name]["last_access"]):
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= entries[entry_name]["size"]
+            shutil.rmtree(os.path.join(self.cache_dir, entry_name), ignore_errors=True)
+            del entries[entry_name]
+
+    def clear(self):
+        for entry_name in list(self.index["entries"]):
+            shutil.rmtree(os.path.join(self.cache_dir, entry_name), ignore_errors=True)
+        self.index["entries"] = {}
+        self.save_index()
+
+    def format_stats(self):
+        lines = []
+        for stage, stage_stats in self.stats.items():
+            lines.append(f"{stage}: {stage_stats['hits']} hits, {stage_stats['misses']} misses")
+        return "\n".join(lines)
@@ -0,0 +1,242 @@
+from collections import deque
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import numpy as np
+try:
+    import resource # Peak RSS, not available on Windows
+except ImportError:
+    resource = None
+
+# Stage names used by the pipelines, in pipeline order
+PIPELINE_STAGES = ('read', 'detect', 'track', 'camera_motion', 'positions', 'view_transform', 'interpolation',
+                   'speed', 'team', 'possession', 'draw', 'write')
+
+class ProfiledStage:
+    def __init__(self, profiler, name, frames, frame_num):
+        self.profiler = profiler
+        self.name = name
+        self.frames = frames
+        self.frame_num = frame_num
+
+    def __enter__(self):
+        self.profiler.enter(self)
+        return self
+
+    # Frames covered by the call, when they are only known once the stage ran
+    def set_frames(self, frames):
+        self.frames = frames
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.exit(self)
+
+# Wall time of every pipeline stage, per call (one call per frame in the streaming pipeline, one per
+# video in main) and in total. Stages can be nested, the self time of a stage excludes its sub-stages
+# (e.g. track inside detect). With trace_memory the peak memory (tracemalloc, slow) and the net
+# allocated blocks of every stage are recorded too. A disabled profiler costs one method call per stage.
+class StageProfiler:
+    # max_trace_events bounds the events kept for the Chrome trace and max_durations the calls the percentiles
+    # are computed from (the latest ones), the stage totals are always complete
+    def __init__(self, enabled=True, trace_memory=False, max_trace_events=500000, max_durations=100000):
+        self.enabled = enabled
+        self.trace_memory = trace_memory and enabled
+        self.max_trace_events = max_trace_events
+        self.max_durations = max_durations
+        self.stages = {} # {name: {"calls", "frames", "total", "self", "durations", "peak_memory", "allocated_blocks"}}
+        self.events = []
+        self.dropped_events = 0
+        self.local = threading.local() # Stack of the active stages of every thread
+        self.start_time = time.perf_counter()
+        self.null_stage = NullStage()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Context manager timing one call of a stage covering `frames` frames
+    def stage(self, name, frames=1, frame_num=None):
+        if not self.enabled:
+            return self.null_stage
+        return ProfiledStage(self, name, frames, frame_num)
+
+    # Times every next() of an iterable as a call of the stage (decoding, batched detection)
+    def iter_stage(self, name, iterable):
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    stage.set_frames(0) # Only the end of the iterable
+                    return
+            yield item
+
+    def enter(self, stage):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak) # The peak is reset for the sub-stage
+            tracemalloc.reset_peak()
+            stage.start_memory = current
+            stage.peak = current
+            stage.start_blocks = sys.getallocatedblocks()
+        stage.child_time = 0.0
+        stack.append(stage)
+        stage.start = time.perf_counter()
+
+    def exit(self, stage):
+        end = time.perf_counter()
+        duration = end - stage.start
+        stack = self.local.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_time += duration
+
+        stats = self.stages.get(stage.name)
+        if stats is None:
+            stats = self.stages[stage.name] = {"calls": 0, "frames": 0, "total": 0.0, "self": 0.0, "durations": deque(maxlen=self.max_durations),
+                                               "peak_memory": 0, "allocated_blocks": 0}
+        stats["calls"] += 1
+        stats["frames"] += stage.frames
+        stats["total"] += duration
+        stats["self"] += duration - stage.child_time
+        stats["durations"].append(duration)
+
+        args = {} if stage.frame_num is None else {"frame": stage.frame_num}
+        if self.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], stage.peak)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            stats["peak_memory"] = max(stats["peak_memory"], peak - stage.start_memory)
+            stats["allocated_blocks"] += sys.getallocatedblocks() - stage.start_blocks
+            args["peak_memory"] = peak - stage.start_memory
+
+        if len(self.events) < self.max_trace_events:
+            self.events.append((stage.name, stage.start, duration, threading.get_ident(), args))
+        else:
+            self.dropped_events += 1
+
+    def get_stage_stats(self, name):
+        stats = self.stages[name]
+        durations = np.array(stats["durations"])
+        return {
+            "calls": stats["calls"],
+            "frames": stats["frames"],
+            "total": stats["total"],
+            "self": stats["self"],
+            "fps": stats["frames"] / stats["total"] if stats["total"] > 0 else 0.0,
+            "per_frame_ms": stats["total"] / stats["frames"] * 1000 if stats["frames"] else 0.0,
+            "p50_ms": float(np.percentile(durations, 50)) * 1000,
+            "p95_ms": float(np.percentile(durations, 95)) * 1000,
+            "max_ms": float(durations.max()) * 1000,
+            "peak_memory": stats["peak_memory"],
+            "allocated_blocks": stats["allocated_blocks"],
+        }
+
+    # Stages in pipeline order, then the others in the order they first ran
+    def stage_names(self):
+        return [name for name in PIPELINE_STAGES if name in self.stages] + \
+               [name for name in self.stages if name not in PIPELINE_STAGES]
+
+    def to_dict(self):
+        return {
+            "elapsed": time.perf_counter() - self.start_time,
+            "max_rss": get_max_rss(),
+            "trace_memory": self.trace_memory,
+            "stages": {name: self.get_stage_stats(name) for name in self.stage_names()},
+        }
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    # Trace Event Format, opens in chrome://tracing and Perfetto
+    def save_chrome_trace(self, path):
+        pid = os.getpid()
+        thread_ids = {}
+        events = []
+        for name, start, duration, thread, args in self.events:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.start_time) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": thread_ids.setdefault(thread, len(thread_ids)),
+                "args": args,
+            })
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    # Prometheus text exposition format, for a node exporter textfile collector or a push gateway
+    def to_prometheus(self, prefix='football_analysis'):
+        metrics = [
+            ("stage_seconds_total", "counter", "Wall time spent in the stage", "total"),
+            ("stage_self_seconds_total", "counter", "Wall time spent in the stage excluding its sub-stages", "self"),
+            ("stage_calls_total", "counter", "Calls of the stage", "calls"),
+            ("stage_frames_total", "counter", "Frames processed by the stage", "frames"),
+            ("stage_frames_per_second", "gauge", "Frames per second of the stage", "fps"),
+            ("stage_p95_seconds", "gauge", "95th percentile of the duration of a call", "p95_ms"),
+        ]
+        if self.trace_memory:
+            metrics += [
+                ("stage_peak_memory_bytes", "gauge", "Peak traced memory above the start of the stage", "peak_memory"),
+                ("stage_allocated_blocks_total", "counter", "Net memory blocks allocated by the stage", "allocated_blocks"),
+            ]
+
+        stats = {name: self.get_stage_stats(name) for name in self.stage_names()}
+        lines = []
+        for metric, metric_type, help, key in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for name, stage_stats in stats.items():
+                value = stage_stats[key] / 1000 if key == "p95_ms" else stage_stats[key]
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {value}')
+        max_rss = get_max_rss()
+        if max_rss is not None:
+            lines.append(f"# HELP {prefix}_max_rss_bytes Peak resident memory of the process")
+            lines.append(f"# TYPE {prefix}_max_rss_bytes gauge")
+            lines.append(f"{prefix}_max_rss_bytes {max_rss}")
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path, prefix='football_analysis'):
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+
+    def format_stats(self):
+        lines = [f"{'Stage':<15}{'calls':>7}{'total s':>10}{'self s':>9}{'fps':>11}{'p95 ms':>9}" +
+                 (f"{'peak MB':>9}" if self.trace_memory else "")]
+        for name in self.stage_names():
+            stats = self.get_stage_stats(name)
+            line = f"{name:<15}{stats['calls']:>7}{stats['total']:>10.2f}{stats['self']:>9.2f}{stats['fps']:>11.1f}{stats['p95_ms']:>9.1f}"
+            if self.trace_memory:
+                line += f"{stats['peak_memory'] / 1024**2:>9.1f}"
+            lines.append(line)
+        max_rss = get_max_rss()
+        if max_rss is not None:
+            lines.append(f"Peak RSS: {max_rss / 1024**2:.0f} MB")
+        return "\n".join(lines)
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def set_frames(self, frames):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+# Peak resident memory of the process in bytes (None where unknown)
+def get_max_rss():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
@@ -0,0 +1,170 @@
+import glob
+import json
+import os
+import re
+import numpy as np
+from .track_table import TrackTable, OBJECT_CLASSES, TRACK_FIELDS, empty_rows, TrackView
+
+# Name of a part file: sequence number then the frames it holds (inclusive)
+PART_PATTERN = re.compile(r'part-(\d+)_frames-(\d+)-(\d+)\.parquet$')
+
+# pyarrow is only needed by the export, it is imported when used
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The track export needs pyarrow: pip install pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+# Writes the tracks with their derived fields (position_transformed, speed, distance, team, has_ball) as a
+# directory of zstd compressed Parquet files, one file per chunk_frames frames:
+#   part-00000_frames-00000000-00000999.parquet, part-00001_frames-00001000-00001999.parquet, ...
+# A part is renamed into place once complete, so the directory can be read (read_tracks) while the
+# pipeline still appends to it. mode 'w' removes the parts already there, 'a' adds to them.
+# metadata (fps, video, ...) is stored as JSON in the schema metadata of every part.
+class TrackExporter:
+    def __init__(self, output_dir, mode='w', chunk_frames=1000, compression='zstd', metadata=None):
+        if mode not in ('w', 'a'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.pa, self.pq = import_pyarrow()
+        self.output_dir = output_dir
+        self.chunk_frames = chunk_frames
+        self.compression = compression
+        self.metadata = {b"football_analysis": json.dumps(metadata or {}).encode()}
+        os.makedirs(output_dir, exist_ok=True)
+
+        parts = list_parts(output_dir)
+        if mode == 'w':
+            for part in parts:
+                os.remove(part["path"])
+            parts = []
+        self.next_part = max((part["part"] for part in parts), default=-1) + 1
+        self.pending = [] # Rows of the frames not written yet
+        self.pending_frames = 0
+        self.rows_written = 0
+
+    # Tracks of one frame, {object: {track_id: {field: value}}} as in the streaming pipeline
+    def append_frame(self, frame_num, frame_tracks):
+        if not self.pending:
+            self.pending_first_frame = frame_num
+        self.pending_last_frame = frame_num
+        self.pending.append(frame_rows(frame_num, frame_tracks))
+        self.pending_frames += 1
+        if self.pending_frames >= self.chunk_frames:
+            self.flush()
+
+    # All the tracks of a video (TrackTable or nested dicts), written chunk by chunk
+    def append_tracks(self, tracks, first_frame=0):
+        if not isinstance(tracks, TrackTable):
+            tracks = TrackTable.from_tracks(tracks)
+        self.flush()
+        for start in range(0, tracks.num_frames, self.chunk_frames):
+            end = min(start + self.chunk_frames, tracks.num_frames)
+            rows = tracks.rows[tracks.frame_offsets[start]:tracks.frame_offsets[end]].copy()
+            rows["frame"] += first_frame
+            self.write_part(rows, start + first_frame, end - 1 + first_frame)
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = np.concatenate(self.pending)
+        self.pending = []
+        self.pending_frames = 0
+        self.write_part(rows, self.pending_first_frame, self.pending_last_frame)
+
+    def write_part(self, rows, first_frame, last_frame):
+        name = f"part-{self.next_part:05d}_frames-{first_frame:08d}-{last_frame:08d}.parquet"
+        path = os.path.join(self.output_dir, name)
+        tmp_path = path + '.tmp'
+        self.pq.write_table(rows_to_table(self.pa, rows, self.metadata), tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+        self.next_part += 1
+        self.rows_written += len(rows)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# TrackTable rows to an Arrow table, the missing values (NaN, team 0) become nulls
+def rows_to_table(pa, rows, metadata=None):
+    nullable = lambda values, missing: pa.array(values, mask=missing)
+    table = pa.table({
+        "frame": pa.array(rows["frame"]),
+        "object": pa.DictionaryArray.from_arrays(pa.array(rows["class"]), pa.array(OBJECT_CLASSES)),
+        "track_id": pa.array(rows["track_id"]),
+        "x1": pa.array(rows["bbox"][:, 0]),
+        "y1": pa.array(rows["bbox"][:, 1]),
+        "x2": pa.array(rows["bbox"][:, 2]),
+        "y2": pa.array(rows["bbox"][:, 3]),
+        "position_transformed_x": nullable(rows["position_transformed"][:, 0], np.isnan(rows["position_transformed"][:, 0])),
+        "position_transformed_y": nullable(rows["position_transformed"][:, 1], np.isnan(rows["position_transformed"][:, 1])),
+        "speed": nullable(rows["speed"], np.isnan(rows["speed"])),
+        "distance": nullable(rows["distance"], np.isnan(rows["distance"])),
+        "team": nullable(rows["team"], rows["team"] == 0),
+        "has_ball": pa.array(rows["has_ball"]),
+    })
+    return table.replace_schema_metadata(metadata) if metadata else table
+
+# TrackTable rows of one frame of tracks, only the fields of the table are kept
+def frame_rows(frame_num, frame_tracks):
+    rows = empty_rows(sum(len(frame_tracks.get(object, {})) for object in OBJECT_CLASSES))
+    row = 0
+    for class_id, object in enumerate(OBJECT_CLASSES):
+        for track_id, track_info in frame_tracks.get(object, {}).items():
+            rows["frame"][row] = frame_num
+            rows["track_id"][row] = track_id
+            rows["class"][row] = class_id
+            TrackView(rows, row).update({field: value for field, value in track_info.items() if field in TRACK_FIELDS})
+            row += 1
+    return rows
+
+# Complete part files of an export directory in write order: [{"path", "part", "first_frame", "last_frame"}]
+def list_parts(export_dir):
+    parts = []
+    for path in glob.glob(os.path.join(export_dir, 'part-*.parquet')):
+        match = PART_PATTERN.search(os.path.basename(path))
+        if match:
+            part, first_frame, last_frame = (int(value) for value in match.groups())
+            parts.append({"path": path, "part": part, "first_frame": first_frame, "last_frame": last_frame})
+    return sorted(parts, key=lambda part: part["part"])
+
+# Arrow table of the frames start_frame <= frame < end_frame (None: no bound) of an export directory.
+# Only the parts holding these frames are opened, and only the given columns and objects are read.
+# Use .to_pandas() for a DataFrame.
+def read_tracks(export_dir, start_frame=None, end_frame=None, columns=None, objects=None):
+    pa, pq = import_pyarrow()
+    filters = []
+    if start_frame is not None:
+        filters.append(("frame", ">=", start_frame))
+    if end_frame is not None:
+        filters.append(("frame", "<", end_frame))
+    if objects is not None:
+        filters.append(("object", "in", list(objects)))
+
+    tables = []
+    for part in list_parts(export_dir):
+        if start_frame is not None and part["last_frame"] < start_frame:
+            continue
+        if end_frame is not None and part["first_frame"] >= end_frame:
+            continue
+        tables.append(pq.read_table(part["path"], columns=columns, filters=filters or None))
+
+    if not tables:
+        table = rows_to_table(pa, empty_rows(0))
+        return table.select(columns) if columns else table
+    return pa.concat_tables(tables)
+
+# Metadata given to the TrackExporter of an export directory
+def read_export_metadata(export_dir):
+    _, pq = import_pyarrow()
+    parts = list_parts(export_dir)
+    if not parts:
+        return {}
+    metadata = pq.read_schema(parts[0]["path"]).metadata or {}
+    return json.loads(metadata.get(b"football_analysis", b"{}"))
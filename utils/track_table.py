@@ -0,0 +1,218 @@
+from collections.abc import Mapping, MutableMapping, Sequence
+import numpy as np
+
+OBJECT_CLASSES = ("players", "referees", "ball")
+
+# One row per tracked object per frame. Missing float values are NaN, a missing team is 0.
+TRACK_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("track_id", np.int32),
+    ("class", np.int8), # Index into OBJECT_CLASSES
+    ("bbox", np.float32, 4),
+    ("position", np.float32, 2),
+    ("position_adjusted", np.float32, 2),
+    ("position_transformed", np.float32, 2),
+    ("speed", np.float32),
+    ("acceleration", np.float32),
+    ("distance", np.float32),
+    ("team", np.int8),
+    ("team_color", np.float32, 3),
+    ("has_ball", np.bool_),
+])
+
+TRACK_FIELDS = ("bbox", "position", "position_adjusted", "position_transformed", "speed", "acceleration", "distance", "team", "team_color", "has_ball")
+
+def empty_rows(num_rows):
+    rows = np.zeros(num_rows, dtype=TRACK_DTYPE)
+    for field in ("bbox", "position", "position_adjusted", "position_transformed", "speed", "acceleration", "distance", "team_color"):
+        rows[field] = np.nan
+    return rows
+
+# Columnar store of all the tracks of a video, sorted by frame then class.
+# Rows of frame f are rows[frame_offsets[f]:frame_offsets[f+1]].
+# It can be used like the nested tracks dict: tracks["players"][frame_num][track_id]["bbox"]
+class TrackTable(Mapping):
+    def __init__(self, rows, num_frames):
+        self.num_frames = num_frames
+        self.set_rows(rows)
+
+    def set_rows(self, rows):
+        order = np.lexsort((rows["class"], rows["frame"])) # Stable, keeps the track order within a class
+        self.rows = rows[order]
+        self.frame_offsets = np.searchsorted(self.rows["frame"], np.arange(self.num_frames + 1))
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        num_frames = len(tracks[OBJECT_CLASSES[0]])
+        num_rows = sum(len(track) for object_tracks in tracks.values() for track in object_tracks)
+        rows = empty_rows(num_rows)
+
+        row = 0
+        for class_id, object in enumerate(OBJECT_CLASSES):
+            for frame_num, track in enumerate(tracks.get(object, [])):
+                for track_id, track_info in track.items():
+                    rows["frame"][row] = frame_num
+                    rows["track_id"][row] = track_id
+                    rows["class"][row] = class_id
+                    TrackView(rows, row).update(track_info)
+                    row += 1
+
+        return cls(rows, num_frames)
+
+    # Nested dicts {object: [{track_id: {field: value}}]} like the ones returned by Tracker.get_object_track
+    def to_tracks(self):
+        return {object: [{track_id: dict(track) for track_id, track in frame.items()} for frame in self[object]]
+                for object in OBJECT_CLASSES}
+
+    def __getitem__(self, object):
+        if object not in OBJECT_CLASSES:
+            raise KeyError(object)
+        return ObjectTracksView(self, OBJECT_CLASSES.index(object))
+
+    def __iter__(self):
+        return iter(OBJECT_CLASSES)
+
+    def __len__(self):
+        return len(OBJECT_CLASSES)
+
+    def class_mask(self, object):
+        return self.rows["class"] == OBJECT_CLASSES.index(object)
+
+    def frame_rows(self, frame_num):
+        return self.rows[self.frame_offsets[frame_num]:self.frame_offsets[frame_num + 1]]
+
+    # Row index of (frame, track_id) for each query of the given class, -1 if the track is not in that frame
+    def find_rows(self, object, frames, track_ids):
+        class_rows = np.flatnonzero(self.class_mask(object))
+        keys = self.rows["frame"][class_rows].astype(np.int64) << 32 | self.rows["track_id"][class_rows].astype(np.int64)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+
+        query = np.asarray(frames, dtype=np.int64) << 32 | np.asarray(track_ids, dtype=np.int64)
+        result = np.full(len(query), -1, dtype=np.int64)
+        if len(keys) == 0:
+            return result
+
+        index = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+        found = keys[index] == query
+        result[found] = class_rows[order[index[found]]]
+        return result
+
+    # Fill the missing ball frames with linear interpolation (back and forward fill at the edges)
+    def interpolate_ball_position(self):
+        ball_mask = self.class_mask("ball")
+        ball_rows = self.rows[ball_mask]
+        if len(ball_rows) == 0:
+            return
+
+        missing_frames = np.setdiff1d(np.arange(self.num_frames), ball_rows["frame"])
+        new_rows = empty_rows(len(missing_frames))
+        new_rows["frame"] = missing_frames
+        new_rows["track_id"] = 1
+        new_rows["class"] = OBJECT_CLASSES.index("ball")
+        for i in range(4):
+            new_rows["bbox"][:, i] = np.interp(missing_frames, ball_rows["frame"], ball_rows["bbox"][:, i])
+
+        self.set_rows(np.concatenate([self.rows, new_rows]))
+
+# tracks[object]: one FrameTracksView per frame
+class ObjectTracksView(Sequence):
+    def __init__(self, table, class_id):
+        self.table = table
+        self.class_id = class_id
+
+    def __len__(self):
+        return self.table.num_frames
+
+    def __getitem__(self, frame_num):
+        if isinstance(frame_num, slice):
+            return [self[i] for i in range(*frame_num.indices(len(self)))]
+        if frame_num < 0:
+            frame_num += len(self)
+        if not 0 <= frame_num < len(self):
+            raise IndexError(frame_num)
+
+        start, end = self.table.frame_offsets[frame_num], self.table.frame_offsets[frame_num + 1]
+        rows = np.flatnonzero(self.table.rows["class"][start:end] == self.class_id) + start
+        return FrameTracksView(self.table.rows, rows)
+
+# tracks[object][frame_num]: {track_id: TrackView}
+class FrameTracksView(Mapping):
+    def __init__(self, rows, row_indices):
+        self.rows = rows
+        self.row_index = {int(rows["track_id"][row]): int(row) for row in row_indices}
+
+    def __getitem__(self, track_id):
+        return TrackView(self.rows, self.row_index[int(track_id)])
+
+    def __iter__(self):
+        return iter(self.row_index)
+
+    def __len__(self):
+        return len(self.row_index)
+
+# tracks[object][frame_num][track_id]: {field: value}, writes go straight to the table.
+# Fields holding the missing value behave like absent keys, except position_transformed which is None.
+class TrackView(MutableMapping):
+    def __init__(self, rows, row):
+        self.rows = rows
+        self.row = row
+
+    def __getitem__(self, field):
+        if field not in TRACK_FIELDS:
+            raise KeyError(field)
+        value = self.rows[field][self.row]
+
+        if field == "position_transformed":
+            return None if np.isnan(value[0]) else value.tolist()
+        if field == "team":
+            if value == 0:
+                raise KeyError(field)
+            return int(value)
+        if field == "has_ball":
+            if not value:
+                raise KeyError(field)
+            return True
+        if np.isnan(value).any():
+            raise KeyError(field)
+        if field == "bbox":
+            return value.tolist()
+        if field == "position":
+            return tuple(int(v) for v in value)
+        if field in ("position_adjusted", "team_color"):
+            return tuple(value.tolist())
+        return float(value)
+
+    def __setitem__(self, field, value):
+        if field not in TRACK_FIELDS:
+            raise KeyError(field)
+        if value is None:
+            del self[field]
+            return
+        self.rows[field][self.row] = value
+
+    def __delitem__(self, field):
+        if field not in TRACK_FIELDS:
+            raise KeyError(field)
+        if field == "team":
+            self.rows[field][self.row] = 0
+        elif field == "has_ball":
+            self.rows[field][self.row] = False
+        else:
+            self.rows[field][self.row] = np.nan
+
+    def __iter__(self):
+        return (field for field in TRACK_FIELDS if field in self)
+
+    def __contains__(self, field):
+        # position_transformed is set (possibly to None) together with position_adjusted
+        if field == "position_transformed":
+            return "position_adjusted" in self
+        try:
+            self[field]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,116 @@
+import shutil
+import subprocess
+import tempfile
+import cv2
+import numpy as np
+
+ENCODERS = ('opencv', 'ffmpeg')
+
+# Codecs that take the x264 style -preset and -crf options
+X264_STYLE_CODECS = ('libx264', 'libx265')
+
+# Encoders are opened on the first frame, the output size is the size of the frames written.
+
+# cv2.VideoWriter (XVID AVI by default)
+class OpenCVEncoder:
+    def __init__(self, output_video_path, fps, fourcc='XVID'):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.out = None
+
+    def write(self, frame):
+        if self.out is None:
+            self.out = cv2.VideoWriter(self.output_video_path, self.fourcc, self.fps, (frame.shape[1], frame.shape[0]))
+            if not self.out.isOpened():
+                raise IOError(f"Could not open video writer: {self.output_video_path}")
+        self.out.write(frame)
+
+    def close(self):
+        if self.out is not None:
+            self.out.release()
+
+# Raw BGR frames piped to an ffmpeg process, which encodes with any codec it was built with:
+# libx264/libx265 (preset and crf apply), hardware encoders such as h264_nvenc, h264_qsv or
+# h264_videotoolbox (preset applies for nvenc), mpeg4, ...
+# extra_args are added to the output options, e.g. ['-b:v', '8M'] for a hardware encoder.
+class FFmpegEncoder:
+    def __init__(self, output_video_path, fps, codec='libx264', preset='veryfast', crf=23, pixel_format='yuv420p',
+                 extra_args=None, ffmpeg_path='ffmpeg'):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.pixel_format = pixel_format
+        self.extra_args = list(extra_args or [])
+        self.ffmpeg_path = shutil.which(ffmpeg_path)
+        if self.ffmpeg_path is None:
+            raise RuntimeError(f"ffmpeg not found: {ffmpeg_path} (install it or use the opencv encoder)")
+        self.process = None
+        self.frame_shape = None
+
+    def command(self, width, height):
+        command = [self.ffmpeg_path, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(self.fps), '-i', '-',
+                   '-an', '-c:v', self.codec]
+        if self.preset is not None and (self.codec in X264_STYLE_CODECS or self.codec.endswith('_nvenc')):
+            command += ['-preset', self.preset]
+        if self.crf is not None and self.codec in X264_STYLE_CODECS:
+            command += ['-crf', str(self.crf)]
+        if self.pixel_format is not None:
+            command += ['-pix_fmt', self.pixel_format]
+        return command + self.extra_args + [self.output_video_path]
+
+    def write(self, frame):
+        if self.process is None:
+            self.frame_shape = frame.shape
+            # ffmpeg errors go to a file, a pipe nobody reads could fill up and block it
+            self.stderr = tempfile.TemporaryFile()
+            self.process = subprocess.Popen(self.command(frame.shape[1], frame.shape[0]), stdin=subprocess.PIPE, stderr=self.stderr)
+        elif frame.shape != self.frame_shape:
+            raise ValueError(f"Frame size changed from {self.frame_shape} to {frame.shape}")
+
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            return_code, errors = self.finish()
+            raise RuntimeError(f"ffmpeg stopped with exit code {return_code}: {errors}")
+
+    def close(self):
+        if self.process is None:
+            return
+        return_code, errors = self.finish()
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {return_code}: {errors}")
+
+    # Wait for ffmpeg to exit and read its errors, once: a later close() has nothing left to do
+    def finish(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return_code = self.process.wait()
+        self.process = None
+        self.stderr.seek(0)
+        errors = self.stderr.read().decode(errors='replace').strip()
+        self.stderr.close()
+        return return_code, errors
+
+# File extension of the container matching the encoder and its codec: AVI for the OpenCV fourccs,
+# WebM for the VP8/VP9 codecs of ffmpeg and MP4 for the others (H.264, HEVC, MPEG-4, AV1, ...)
+def video_extension(encoder='opencv', encoder_params=None):
+    if encoder == 'opencv':
+        return '.avi'
+    if encoder == 'ffmpeg':
+        codec = (encoder_params or {}).get('codec', 'libx264')
+        return '.webm' if codec.startswith('libvpx') else '.mp4'
+    raise ValueError(f"Unknown encoder: {encoder}")
+
+# encoder is one of ENCODERS, encoder_params are passed to its class (fourcc, or codec, preset, crf, ...)
+def make_encoder(output_video_path, fps, encoder='opencv', **encoder_params):
+    if encoder == 'opencv':
+        return OpenCVEncoder(output_video_path, fps, **encoder_params)
+    if encoder == 'ffmpeg':
+        return FFmpegEncoder(output_video_path, fps, **encoder_params)
+    raise ValueError(f"Unknown encoder: {encoder}")
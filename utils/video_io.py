@@ -0,0 +1,225 @@
+from collections import deque
+import queue
+import threading
+import time
+import cv2
+from .video_encoders import make_encoder
+
+_END_OF_STREAM = object()
+
+# Decodes frames on a background thread into a bounded queue.
+# stats: decode = time spent in cap.read, producer_wait = decoder blocked on a full queue (consumer is slower),
+# consumer_wait = consumer blocked on an empty queue (decoding is the bottleneck)
+class ThreadedVideoReader:
+    def __init__(self, video_path, queue_size=32):
+        self.video_path = video_path
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.error = None
+        self.stats = {"frames": 0, "decode": 0.0, "producer_wait": 0.0, "consumer_wait": 0.0}
+
+        self.thread = threading.Thread(target=self._decode, daemon=True)
+        self.thread.start()
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                self.stats["decode"] += time.perf_counter() - start
+                if not ret:
+                    break
+                self._put(frame)
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self._put(_END_OF_STREAM)
+
+    # Blocks while the queue is full (backpressure) but gives up once the reader is closed
+    def _put(self, item):
+        start = time.perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.stats["producer_wait"] += time.perf_counter() - start
+
+    def __iter__(self):
+        while True:
+            start = time.perf_counter()
+            frame = self.frames.get()
+            self.stats["consumer_wait"] += time.perf_counter() - start
+            if frame is _END_OF_STREAM:
+                break
+            self.stats["frames"] += 1
+            yield frame
+
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Captures a live source (RTSP/HTTP URL, device index or file) on a background thread.
+# Only the newest queue_size frames are kept: when the consumer falls behind, the oldest frames are
+# dropped so it always works on recent frames. Frames are yielded as (frame, capture_time).
+# throttle paces the reads to the source frame rate, for a file standing in for a live feed.
+# stats: captured, dropped (never handed to the consumer), consumer_wait
+class LiveVideoReader:
+    def __init__(self, source, queue_size=2, throttle=False):
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.frames = deque(maxlen=queue_size)
+        self.frame_ready = threading.Condition()
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.error = None
+        self.throttle = throttle
+        self.stats = {"captured": 0, "dropped": 0, "consumer_wait": 0.0}
+
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source: {source}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25.0
+
+        self.thread = threading.Thread(target=self._capture, daemon=True)
+        self.thread.start()
+
+    def _capture(self):
+        next_time = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if self.throttle:
+                    next_time += 1 / self.fps
+                    time.sleep(max(next_time - time.perf_counter(), 0))
+
+                with self.frame_ready:
+                    if len(self.frames) == self.frames.maxlen:
+                        self.stats["dropped"] += 1
+                    self.frames.append((frame, time.perf_counter()))
+                    self.stats["captured"] += 1
+                    self.frame_ready.notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.cap.release()
+            with self.frame_ready:
+                self.finished = True
+                self.frame_ready.notify()
+
+    def __iter__(self):
+        while True:
+            start = time.perf_counter()
+            with self.frame_ready:
+                while not self.frames and not self.finished:
+                    self.frame_ready.wait()
+                item = self.frames.popleft() if self.frames else None
+            self.stats["consumer_wait"] += time.perf_counter() - start
+            if item is None:
+                break
+            yield item
+
+        if self.error is not None:
+            raise self.error
+
+    # A live source can stall inside cap.read() (a network feed that stopped sending), the capture thread
+    # then only sees the stop after the read returns. close() waits at most `timeout` seconds for it, the
+    # daemon thread releases the capture itself once the read returns. The capture is not released from
+    # here, VideoCapture is not safe to release while another thread reads from it.
+    def close(self, timeout=2.0):
+        self.stop_event.set()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Capture of {self.source} still waiting for a frame, not waiting for it to stop")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Encodes frames on a background thread from a bounded queue, in the order they were written.
+# encoder is one of video_encoders.ENCODERS, encoder_params are passed to it (fourcc for opencv, codec, preset, ... for ffmpeg).
+# stats: encode = time spent in the encoder, producer_wait = write() blocked on a full queue (encoding is the bottleneck),
+# consumer_wait = encoder idle on an empty queue
+class ThreadedVideoWriter:
+    def __init__(self, output_video_path, fps=24.0, fourcc='XVID', queue_size=32, encoder='opencv', encoder_params=None):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        encoder_params = dict(encoder_params or {})
+        if encoder == 'opencv':
+            encoder_params.setdefault('fourcc', fourcc)
+        self.encoder = make_encoder(output_video_path, fps, encoder, **encoder_params) # ffmpeg is looked up before any frame is queued
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.stats = {"frames": 0, "encode": 0.0, "producer_wait": 0.0, "consumer_wait": 0.0}
+
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def _encode(self):
+        try:
+            while True:
+                start = time.perf_counter()
+                frame = self.frames.get()
+                self.stats["consumer_wait"] += time.perf_counter() - start
+                if frame is _END_OF_STREAM:
+                    break
+
+                start = time.perf_counter()
+                self.encoder.write(frame)
+                self.stats["encode"] += time.perf_counter() - start
+                self.stats["frames"] += 1
+        except Exception as e:
+            self.error = e
+            # Keep draining so write() never blocks forever after a failure
+            while self.frames.get() is not _END_OF_STREAM:
+                pass
+        finally:
+            try:
+                self.encoder.close()
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+        self.frames.put(frame)
+        self.stats["producer_wait"] += time.perf_counter() - start
+
+    def close(self):
+        self.frames.put(_END_OF_STREAM)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# One line per stage with the time it spent working and waiting
+def format_io_stats(reader_stats, writer_stats, total_time):
+    busy_time = max(total_time - reader_stats["consumer_wait"] - writer_stats["producer_wait"], 0.0)
+    return "\n".join([
+        f"Decode:    {reader_stats['frames']} frames, {reader_stats['decode']:.2f}s decoding, {reader_stats['producer_wait']:.2f}s waiting for the pipeline",
+        f"Pipeline:  {busy_time:.2f}s processing, {reader_stats['consumer_wait']:.2f}s waiting for decode, {writer_stats['producer_wait']:.2f}s waiting for encode",
+        f"Encode:    {writer_stats['frames']} frames, {writer_stats['encode']:.2f}s encoding, {writer_stats['consumer_wait']:.2f}s waiting for the pipeline",
+    ])
@@ -1,20 +1,44 @@
 import cv2
+from .video_io import ThreadedVideoWriter
 
 # Read the video and return the frames
 def read_video(video_path):
+    return list(read_video_stream(video_path))
+
+# Read the video one frame at a time
+def read_video_stream(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+# Frame rate of the video, default when the container does not report one
+def get_video_fps(video_path, default=24):
     cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    return frames
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+# (width, height) of the video frames, None when the video cannot be read
+def get_video_size(video_path):
+    cap = cv2.VideoCapture(video_path)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return (width, height) if width > 0 and height > 0 else None
+
+# Save the frames as a video, encoded on a background thread while the next frames are produced.
+# fps should be the frame rate of the input video (get_video_fps). encoder is 'opencv' (XVID AVI) or 'ffmpeg'
+# (raw frames piped to ffmpeg), encoder_params are passed to it, e.g. codec='h264_nvenc', preset='p4'.
+def save_video(output_video_frames, output_video_path, fps=24, encoder='opencv', **encoder_params):
+    save_video_stream(output_video_frames, output_video_path, fps, encoder, **encoder_params)
 
-# Save the frames as a video
-def save_video(output_video_frames, output_video_path):
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(output_video_path,fourcc,20.0,(output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    for frame in output_video_frames:
-        out.write(frame)
-    out.release()
+# Save the frames as a video while they are produced (any iterable of frames)
+def save_video_stream(output_video_frames, output_video_path, fps=24, encoder='opencv', **encoder_params):
+    with ThreadedVideoWriter(output_video_path, fps, encoder=encoder, encoder_params=encoder_params) as writer:
+        for frame in output_video_frames:
+            writer.write(frame)
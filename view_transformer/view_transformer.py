@@ -1,8 +1,45 @@
+import json
 import numpy as np
 import cv2
+from utils import TrackTable
 
 class ViewTransformer():
-    def __init__(self):
+    # calibrations: list of {"pixel_vertices": [[x, y], ...], "target_vertices": [[x, y], ...]}.
+    # A point is transformed with the first calibration whose pixel polygon contains it.
+    def __init__(self, calibrations=None):
+        if calibrations is None:
+            calibrations = [self.default_calibration()]
+        if len(calibrations) == 0:
+            raise ValueError("At least one calibration is needed")
+
+        self.calibrations = []
+        for calibration in calibrations:
+            pixel_vertices = np.array(calibration["pixel_vertices"], dtype=np.float32)
+            target_vertices = np.array(calibration["target_vertices"], dtype=np.float32)
+            if pixel_vertices.shape != (4, 2) or target_vertices.shape != (4, 2):
+                raise ValueError("A calibration needs 4 pixel vertices and 4 target vertices")
+
+            self.calibrations.append({
+                "name": calibration.get("name"),
+                "pixel_vertices": pixel_vertices,
+                "target_vertices": target_vertices,
+                "perspective_transformer": cv2.getPerspectiveTransform(pixel_vertices, target_vertices),
+            })
+
+        # The first calibration, kept for code using a single court
+        self.pixel_vertices = self.calibrations[0]["pixel_vertices"]
+        self.target_vertices = self.calibrations[0]["target_vertices"]
+        self.perspective_transformer = self.calibrations[0]["perspective_transformer"]
+
+    # Load the calibrations of a stadium from a JSON file: {"calibrations": [{"name": ..., "pixel_vertices": ..., "target_vertices": ...}]}
+    @classmethod
+    def from_config(cls, config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+        return cls(config["calibrations"])
+
+    @staticmethod
+    def default_calibration():
         court_width = 68
         court_length = 23.32
 
@@ -13,44 +50,82 @@ class ViewTransformer():
             [1640, 915]
         '''
 
-        self.pixel_vertices = np.array([
-            [90, 1065],
-            [245, 245],
-            [1110, 230],
-            [2040, 945]
-        ])
+        return {
+            "name": "default",
+            "pixel_vertices": [
+                [90, 1065],
+                [245, 245],
+                [1110, 230],
+                [2040, 945]
+            ],
+            "target_vertices": [
+                [0, court_width],
+                [0, 0],
+                [court_length, 0],
+                [court_length, court_width]
+            ],
+        }
 
-        self.target_vertices = np.array([
-            [0, court_width],
-            [0, 0],
-            [court_length, 0],
-            [court_length, court_width]
-        ])
+    def transform_point(self, point):
+        transformed_points, is_valid = self.transform_points(np.asarray(point).reshape(1, 2))
+        if not is_valid[0]:
+            return None
 
-        self.pixel_vertices = self.pixel_vertices.astype(np.float32)
-        self.target_vertices = self.target_vertices.astype(np.float32)
+        return transformed_points
 
-        self.perspective_transformer = cv2.getPerspectiveTransform(self.pixel_vertices, self.target_vertices)
+    # Transform an (N,2) array of points in one pass.
+    # Returns the (N,2) transformed points (NaN where invalid) and the mask of points inside a calibration polygon.
+    def transform_points(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        transformed_points = np.full(points.shape, np.nan, dtype=np.float32)
+        is_valid = np.zeros(len(points), dtype=bool)
 
-    def transform_point(self, point):
-        p = (int(point[0]), int(point[1]))
-        is_inside = cv2.pointPolygonTest(self.pixel_vertices, p, False) >= 0
+        # Like cv2.pointPolygonTest on the int point, points on the edge are inside
+        is_finite = np.isfinite(points).all(axis=1)
+        int_points = np.trunc(np.where(is_finite[:, None], points, 0))
 
-        if not is_inside:
-            return None
-        
-        reshaped_point = point.reshape(-1, 1, 2).astype(np.float32)
-        transform_point = cv2.perspectiveTransform(reshaped_point, self.perspective_transformer)
+        for calibration in self.calibrations:
+            is_inside = is_finite & ~is_valid & points_in_polygon(int_points, calibration["pixel_vertices"])
+            if not is_inside.any():
+                continue
 
-        return transform_point.reshape(-1, 2)
+            transformed_points[is_inside] = apply_homography(points[is_inside], calibration["perspective_transformer"])
+            is_valid |= is_inside
+
+        return transformed_points, is_valid
 
     def add_transformed_position_to_tracks(self, tracks):
-        for object, object_tracks in tracks.items():
-            for frame_num, track in enumerate(object_tracks):
-                for track_id, track_info in track.items():
-                    position = track_info['position_adjusted']
-                    position = np.array(position)
-                    position_transformed = self.transform_point(position)
-                    if position_transformed is not None:
-                        position_transformed = position_transformed.squeeze().tolist()
-                    tracks[object][frame_num][track_id]['position_transformed'] = position_transformed
+        if isinstance(tracks, TrackTable):
+            transformed_points, is_valid = self.transform_points(tracks.rows['position_adjusted'])
+            tracks.rows['position_transformed'] = transformed_points
+            return
+
+        # Gather the positions of the whole video, transform them at once and write them back
+        track_infos = [track_info for object_tracks in tracks.values() for track in object_tracks for track_info in track.values()]
+        positions = np.array([track_info['position_adjusted'] for track_info in track_infos], dtype=np.float64).reshape(-1, 2)
+        transformed_points, is_valid = self.transform_points(positions)
+
+        for track_info, position_transformed, valid in zip(track_infos, transformed_points.tolist(), is_valid):
+            track_info['position_transformed'] = position_transformed if valid else None
+
+# Even-odd test of (N,2) points against a polygon, points on an edge count as inside
+def points_in_polygon(points, polygon):
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    x1, y1 = polygon[:, 0].astype(np.float64), polygon[:, 1].astype(np.float64)
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crosses_y = (y1 > y) != (y2 > y)
+        x_at_y = x1 + (x2 - x1) * (y - y1) / (y2 - y1)
+        crossings = crosses_y & (x < x_at_y)
+    is_inside = np.count_nonzero(crossings, axis=1) % 2 == 1
+
+    cross = (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
+    on_edge = (cross == 0) & (x >= np.minimum(x1, x2)) & (x <= np.maximum(x1, x2)) & (y >= np.minimum(y1, y2)) & (y <= np.maximum(y1, y2))
+
+    return is_inside | on_edge.any(axis=1)
+
+def apply_homography(points, homography):
+    homogeneous = points @ homography[:, :2].T + homography[:, 2]
+    return homogeneous[:, :2] / homogeneous[:, 2:3]